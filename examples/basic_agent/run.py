@@ -110,8 +110,10 @@ def main():
             my_run = next((r for r in pending if r['run_id'] == run_id), None)
             
             if my_run:
-                engine.execute_run(my_run)
-                print(f"✅  Run {run_id} executed.")
+                # Wait on the engine's completion notification instead of polling AGENT_RUNS
+                engine.submit_run(my_run)
+                status = engine.wait_for_run(run_id)
+                print(f"✅  Run {run_id} executed. Final status: {status}")
                 break
             
             # Check if run is already completed (in case it was picked up fast or something)
@@ -12,6 +12,8 @@ CREATE OR REPLACE TABLE agent_runs (
     agent_name VARCHAR(255),
     input VARIANT,
     status VARCHAR(50) DEFAULT 'PENDING', -- PENDING, RUNNING, COMPLETED, FAILED
+    claimed_by VARCHAR(255),  -- Worker identity that claimed the run
+    error_message VARCHAR,    -- "<ErrorClass>: <detail>" of the last failure (used by recovery filters)
     created_at TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP(),
     updated_at TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
 );
@@ -26,5 +28,6 @@ CREATE OR REPLACE TABLE agent_steps (
     model VARCHAR(255),       -- Added for Telemetry
     tokens_used INT,          -- Added for Telemetry
     latency_ms INT,
+    tokens_saved INT DEFAULT 0, -- Prompt tokens dropped by the context budget
     created_at TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
 );
@@ -26,8 +26,9 @@ CREATE TABLE IF NOT EXISTS AGENT_RUNS (
   run_id STRING NOT NULL PRIMARY KEY,
   agent_id STRING NOT NULL,
   agent_version STRING,
-  status STRING,               -- PENDING / RUNNING / COMPLETED / FAILED
+  status STRING,               -- PENDING / RUNNING / COMPLETED / FAILED / CANCELLED
   triggered_by STRING,         -- user / api / schedule
+  claimed_by STRING,           -- worker identity that claimed the run
   total_tokens NUMBER DEFAULT 0,
   total_cost NUMBER(10, 4) DEFAULT 0,
   error_message STRING,
@@ -48,7 +49,8 @@ CREATE TABLE IF NOT EXISTS AGENT_STEPS (
   model STRING,
   tokens_used NUMBER DEFAULT 0,
   latency_ms NUMBER DEFAULT 0,
-  status STRING,               -- SUCCESS / FAILED
+  tokens_saved NUMBER DEFAULT 0, -- prompt context tokens dropped by the token budget
+  status STRING,               -- SUCCESS / FAILED / SKIPPED
   error_message STRING,
   executed_at TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP(),
   FOREIGN KEY (run_id) REFERENCES AGENT_RUNS(run_id)
@@ -0,0 +1,15 @@
+-- 01_maintenance.sql
+-- Archive tables and clustering keys for long-running deployments.
+-- Finished runs past the retention window are moved here by
+-- cortex_runtime.db.maintenance so AGENT_RUNS / AGENT_STEPS stay small.
+
+USE SCHEMA CORTEX_AGENT_RUNTIME.CORE;
+
+CREATE TABLE IF NOT EXISTS AGENT_RUNS_ARCHIVE LIKE AGENT_RUNS;
+CREATE TABLE IF NOT EXISTS AGENT_STEPS_ARCHIVE LIKE AGENT_STEPS;
+
+-- Claims filter runs by status and age; step reads are always by run_id
+ALTER TABLE AGENT_RUNS CLUSTER BY (status, created_at);
+ALTER TABLE AGENT_STEPS CLUSTER BY (run_id);
+ALTER TABLE AGENT_RUNS_ARCHIVE CLUSTER BY (created_at);
+ALTER TABLE AGENT_STEPS_ARCHIVE CLUSTER BY (run_id);
@@ -0,0 +1,18 @@
+-- 02_upgrade.sql
+-- Columns added after the first release. Safe to re-run: every statement is a
+-- no-op on tables that already have the column. Run it on databases created from
+-- an older 00_setup.sql before starting a runtime that writes these columns.
+
+USE SCHEMA CORTEX_AGENT_RUNTIME.CORE;
+
+-- Prompt context tokens dropped by the token budget (written with every step)
+ALTER TABLE AGENT_STEPS ADD COLUMN IF NOT EXISTS tokens_saved NUMBER DEFAULT 0;
+ALTER TABLE IF EXISTS AGENT_STEPS_ARCHIVE ADD COLUMN IF NOT EXISTS tokens_saved NUMBER DEFAULT 0;
+
+-- "<ErrorClass>: <detail>" of a run's last failure (written by status updates, read by recovery)
+ALTER TABLE AGENT_RUNS ADD COLUMN IF NOT EXISTS error_message STRING;
+ALTER TABLE IF EXISTS AGENT_RUNS_ARCHIVE ADD COLUMN IF NOT EXISTS error_message STRING;
+
+-- Worker identity that claimed the run (set by the claim, cleared by recovery's requeue)
+ALTER TABLE AGENT_RUNS ADD COLUMN IF NOT EXISTS claimed_by STRING;
+ALTER TABLE IF EXISTS AGENT_RUNS_ARCHIVE ADD COLUMN IF NOT EXISTS claimed_by STRING;
@@ -0,0 +1,104 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from datetime import datetime
+from pathlib import Path
+import json
+import uuid
+import pyarrow as pa
+import pyarrow.parquet as pq
+from cortex_runtime.db.state import StateManager
+
+STEP_SCHEMA = pa.schema([
+    ("run_id", pa.string()),
+    ("step_index", pa.int64()),
+    ("step_name", pa.string()),
+    ("status", pa.string()),
+    ("model", pa.string()),
+    ("tokens_used", pa.int64()),
+    ("latency_ms", pa.float64()),
+    ("executed_at", pa.timestamp("us")),
+])
+
+RUN_SCHEMA = pa.schema([
+    ("run_id", pa.string()),
+    ("status", pa.string()),
+    ("created_at", pa.timestamp("us")),
+    ("updated_at", pa.timestamp("us")),
+])
+
+# Full-fidelity layouts for archived runs (outputs and inputs kept as JSON text)
+ARCHIVE_STEP_SCHEMA = STEP_SCHEMA.append(pa.field("output", pa.string()))
+ARCHIVE_RUN_SCHEMA = RUN_SCHEMA.append(pa.field("input", pa.string()))
+
+# Partition columns live in the directory names (hive layout), not in the files
+PARTITIONING = pa.schema([("date", pa.string()), ("agent_name", pa.string())])
+
+class ParquetExporter:
+    """
+    Streams step and run telemetry out of a StateManager (mock or Snowflake) into
+    Parquet files partitioned as <kind>/date=YYYY-MM-DD/agent_name=<agent>/part-*.parquet,
+    so performance analysis can run locally without warehouse credits.
+    """
+    def __init__(self, state_manager: StateManager, out_dir: str, batch_size: int = 50000):
+        self.state_manager = state_manager
+        self.out_dir = Path(out_dir)
+        self.batch_size = batch_size
+
+    def _write(self, kind: str, schema: pa.Schema, time_column: str, batches: Iterable[List[Dict]]) -> List[str]:
+        written = []
+        for batch in batches:
+            partitions: Dict[Tuple[str, str], List[Dict]] = {}
+            for record in batch:
+                ts = record.get(time_column)
+                date = ts.strftime("%Y-%m-%d") if isinstance(ts, datetime) else "unknown"
+                partitions.setdefault((date, record.get('agent_name') or "unknown"), []).append(record)
+
+            for (date, agent), records in partitions.items():
+                table = pa.Table.from_pylist(records, schema=schema)
+                path = self.out_dir / kind / f"date={date}" / f"agent_name={agent}" / f"part-{uuid.uuid4().hex}.parquet"
+                path.parent.mkdir(parents=True, exist_ok=True)
+                pq.write_table(table, path)
+                written.append(str(path))
+        return written
+
+    def export_steps(self, since: Optional[datetime] = None) -> List[str]:
+        """Export AGENT_STEPS telemetry. Returns the files written."""
+        batches = self.state_manager.iter_step_records(since=since, batch_size=self.batch_size)
+        return self._write("steps", STEP_SCHEMA, "executed_at", batches)
+
+    def export_runs(self, since: Optional[datetime] = None) -> List[str]:
+        """Export AGENT_RUNS rows. Returns the files written."""
+        batches = self.state_manager.iter_run_records(since=since, batch_size=self.batch_size)
+        return self._write("runs", RUN_SCHEMA, "created_at", batches)
+
+    def export_archive(self, run_ids: List[str]) -> Tuple[List[str], List[str]]:
+        """
+        Write complete records (inputs, step outputs) of the given runs under
+        archive/runs and archive/steps, so they can be dropped from the hot tables.
+        Read errors propagate. Returns (files written, ids of runs whose row and every
+        step were read back from those files): only those are safe to purge.
+        """
+        runs = self.state_manager.fetch_runs(run_ids, strict=True)
+        steps = self.state_manager.fetch_steps(list(runs), strict=True)
+        run_records = [dict(run, input=json.dumps(run.get('input'), default=str)) for run in runs.values()]
+        step_records = [
+            dict(step, agent_name=runs[run_id].get('agent_name'), output=json.dumps(step.get('output'), default=str))
+            for run_id, recorded in steps.items() for step in recorded
+        ]
+        run_files = self._write("archive/runs", ARCHIVE_RUN_SCHEMA, "created_at", [run_records])
+        step_files = self._write("archive/steps", ARCHIVE_STEP_SCHEMA, "executed_at", [step_records])
+
+        written_runs = self._count_run_ids(run_files)
+        written_steps = self._count_run_ids(step_files)
+        archived = [
+            run_id for run_id in run_ids
+            if written_runs.get(run_id) == 1 and written_steps.get(run_id, 0) == len(steps.get(run_id, []))
+        ]
+        return run_files + step_files, archived
+
+    @staticmethod
+    def _count_run_ids(files: List[str]) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for path in files:
+            for run_id in pq.read_table(path, columns=["run_id"]).column("run_id").to_pylist():
+                counts[run_id] = counts.get(run_id, 0) + 1
+        return counts
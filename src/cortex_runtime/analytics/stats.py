@@ -0,0 +1,50 @@
+from typing import Dict, Sequence, Union
+from pathlib import Path
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from cortex_runtime.analytics.export import PARTITIONING
+
+def load(out_dir: str, kind: str = "steps") -> pa.Table:
+    """Load exported telemetry ("steps" or "runs") back into one Arrow table, partition columns included"""
+    dataset = ds.dataset(Path(out_dir) / kind, format="parquet",
+                         partitioning=ds.partitioning(PARTITIONING, flavor="hive"))
+    return dataset.to_table()
+
+def with_cost(steps: pa.Table, cost_per_1k_tokens: Union[float, Dict[str, float]]) -> pa.Table:
+    """Add a cost column: tokens_used / 1000 * price, with a flat price or a per-model price map"""
+    tokens = pc.cast(steps["tokens_used"], pa.float64())
+    if isinstance(cost_per_1k_tokens, dict):
+        models = list(cost_per_1k_tokens)
+        prices = pa.array([cost_per_1k_tokens[m] for m in models], type=pa.float64())
+        # Vectorized lookup: position of each row's model in the price map (unknown models cost 0)
+        price = pc.fill_null(pc.take(prices, pc.index_in(steps["model"], value_set=pa.array(models))), 0.0)
+    else:
+        price = pa.scalar(float(cost_per_1k_tokens))
+    return steps.append_column("cost", pc.multiply(pc.divide(tokens, 1000.0), price))
+
+def step_stats(steps: pa.Table, by: Sequence[str] = ("agent_name", "step_name", "model"),
+               cost_per_1k_tokens: Union[float, Dict[str, float]] = 0.0) -> pa.Table:
+    """
+    Latency / token / cost aggregates per group (default: agent, step and model):
+    count, mean/p50/p95/max latency, total and mean tokens, total cost.
+    """
+    steps = with_cost(steps, cost_per_1k_tokens)
+    grouped = steps.group_by(list(by)).aggregate([
+        ("latency_ms", "count"),
+        ("latency_ms", "mean"),
+        ("latency_ms", "tdigest", pc.TDigestOptions(q=[0.5, 0.95])),
+        ("latency_ms", "max"),
+        ("tokens_used", "sum"),
+        ("tokens_used", "mean"),
+        ("cost", "sum"),
+    ])
+    quantiles = grouped["latency_ms_tdigest"]
+    grouped = grouped.drop_columns(["latency_ms_tdigest"])
+    grouped = grouped.append_column("latency_ms_p50", pc.list_element(quantiles, 0))
+    grouped = grouped.append_column("latency_ms_p95", pc.list_element(quantiles, 1))
+    return grouped.sort_by([(col, "ascending") for col in by])
+
+def run_status_counts(runs: pa.Table, by: Sequence[str] = ("agent_name", "status")) -> pa.Table:
+    """Number of runs per agent and status"""
+    return runs.group_by(list(by)).aggregate([("run_id", "count")]).sort_by([(col, "ascending") for col in by])
@@ -1,12 +1,29 @@
-from typing import Dict, Any, Optional, Protocol, runtime_checkable
+from typing import Dict, Any, List, Optional, Protocol, runtime_checkable
+from collections import deque
+from concurrent.futures import CancelledError, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait, FIRST_COMPLETED
 from pydantic import BaseModel
+import threading
 import time
+from cortex_runtime.core.logs import get_logger
+from cortex_runtime.core.resilience import Resilience
+
+log = get_logger("router")
 
 class LLMResult(BaseModel):
+    """
+    Provider result. Built-in providers create it with model_construct (fields are
+    already typed, so validation would only cost time on every call); validate
+    external input with LLMResult(...) / model_validate.
+    """
     text: str
     tokens_used: int
     latency_ms: float
     raw_response: Optional[Dict[str, Any]] = None
+    model: Optional[str] = None  # Model that actually served the call (set by routing providers)
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate used for budgeting and mock accounting (whitespace-separated words)"""
+    return len(text.split())
 
 @runtime_checkable
 class LLMProvider(Protocol):
@@ -27,36 +44,404 @@ class CortexProvider:
     def generate(self, prompt: str, model: str, config: Dict[str, Any]) -> LLMResult:
         start_time = time.time()
         
-        # In a real environment, we would use self.session.sql(...)
-        # For this skeletal implementation, we will mock the call if session is None
-        
         if self.session:
-            # Placeholder for actual Snowpark Cortex call
-            # result = self.session.sql(f"SELECT SNOWFLAKE.CORTEX.COMPLETE('{model}', '{prompt}')").collect()
-            # return parse_result(result)
-            pass
+            # Same SNOWFLAKE.CORTEX.COMPLETE call as generate_batch, one prompt per query
+            rows = self.session.sql(
+                "SELECT SNOWFLAKE.CORTEX.COMPLETE(?, ?) AS COMPLETION", params=[model, prompt]
+            ).collect()
+            text = (rows[0]['COMPLETION'] if rows else None) or ""
+            return LLMResult.model_construct(
+                text=text,
+                tokens_used=estimate_tokens(prompt) + estimate_tokens(text),
+                latency_ms=(time.time() - start_time) * 1000,
+                model=model
+            )
         
         # Fallback / Mock behavior if session is missing (for local testing)
         latency = (time.time() - start_time) * 1000
-        return LLMResult(
+        return LLMResult.model_construct(
             text=f"Mock response from {model} for prompt: {prompt[:50]}...",
-            tokens_used=len(prompt.split()) + 10,
+            tokens_used=estimate_tokens(prompt) + 10,
             latency_ms=latency,
             raw_response={"mock": True}
         )
 
+    def generate_batch(self, prompts: List[str], model: str, config: Dict[str, Any]) -> List[LLMResult]:
+        """
+        Set-based completion: all prompts go up as one DataFrame and come back from a single
+        SNOWFLAKE.CORTEX.COMPLETE query, instead of one round trip per prompt.
+        Latency is the query time amortized over the rows.
+        """
+        if not self.session:
+            return [self.generate(prompt, model, config) for prompt in prompts]
+        if not prompts:
+            return []
+
+        from snowflake.snowpark.functions import call_function, col, lit
+        start_time = time.time()
+        df = self.session.create_dataframe(list(enumerate(prompts)), schema=["IDX", "PROMPT"])
+        rows = df.select(
+            col("IDX"), call_function("SNOWFLAKE.CORTEX.COMPLETE", lit(model), col("PROMPT")).alias("COMPLETION")
+        ).collect()
+        latency = (time.time() - start_time) * 1000 / len(prompts)
+
+        completions = {row['IDX']: row['COMPLETION'] or "" for row in rows}
+        results = []
+        for i, prompt in enumerate(prompts):
+            text = completions.get(i, "")
+            results.append(LLMResult.model_construct(
+                text=text,
+                tokens_used=estimate_tokens(prompt) + estimate_tokens(text),
+                latency_ms=latency,
+                model=model
+            ))
+        return results
+
 class MockProvider:
     """
     Explicit Mock provider for testing.
     """
     def generate(self, prompt: str, model: str, config: Dict[str, Any]) -> LLMResult:
-        return LLMResult(
+        return LLMResult.model_construct(
             text="Explicit Mock Output",
             tokens_used=0,
             latency_ms=0,
             raw_response={}
         )
 
+class LatencyStats:
+    """
+    Rolling window of call latencies and outcomes for one model.
+    """
+    def __init__(self, window: int = 200):
+        self._latencies = deque(maxlen=window)
+        self._outcomes = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency_ms: float, ok: bool = True):
+        with self._lock:
+            self._outcomes.append(ok)
+            if ok:
+                self._latencies.append(latency_ms)
+
+    @property
+    def samples(self) -> int:
+        return len(self._outcomes)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Latency percentile over successful calls in the window (None if no data)"""
+        with self._lock:
+            values = sorted(self._latencies)
+        if not values:
+            return None
+        index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+        return values[index]
+
+    @property
+    def error_rate(self) -> float:
+        with self._lock:
+            if not self._outcomes:
+                return 0.0
+            return 1 - sum(self._outcomes) / len(self._outcomes)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "samples": self.samples,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "error_rate": self.error_rate
+        }
+
+class ModelRoute:
+    """One candidate for a RoutingProvider: an LLMProvider serving a specific model"""
+    def __init__(self, provider: LLMProvider, model: str, cost_per_1k_tokens: float = 0.0):
+        self.provider = provider
+        self.model = model
+        self.cost_per_1k_tokens = cost_per_1k_tokens
+        self.stats = LatencyStats()
+
+class RoutingProvider:
+    """
+    LLMProvider that picks a model per call from live latency/error stats and
+    falls back to the next candidate on errors or timeouts.
+
+    Policies:
+      - "fastest": lowest p50 latency first
+      - "cheapest_within_sla": cheapest model whose p95 is within sla_ms, then the rest by p95
+    Models without samples yet rank first so every route gets measured.
+
+    Calls for default_model are routed. A call naming another model (e.g. a hedge_model)
+    is served by that model first, with the ranked routes as fallback.
+    With resilience set, each attempt goes through the breaker and bulkhead of the model
+    it is sent to ("model:<name>"); a route whose circuit is open is skipped.
+    """
+    POLICIES = ("fastest", "cheapest_within_sla")
+
+    def __init__(self, routes: List[ModelRoute], policy: str = "fastest", sla_ms: Optional[float] = None,
+                 timeout_ms: Optional[float] = None, max_error_rate: float = 0.5, min_samples: int = 5,
+                 default_model: Optional[str] = None, max_workers: int = 10,
+                 resilience: Optional[Resilience] = None):
+        if not routes:
+            raise ValueError("RoutingProvider needs at least one route")
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown routing policy: {policy}")
+        self.routes = routes
+        self.policy = policy
+        self.sla_ms = sla_ms
+        self.timeout_ms = timeout_ms
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+        self.default_model = default_model
+        self.resilience = resilience
+        self._by_model = {route.model: route for route in routes}
+        self._lock = threading.Lock()
+        # Only needed to bound attempts with a timeout. Sized to the engine's concurrency:
+        # at most one attempt per worker runs at a time.
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cortex-route") if timeout_ms else None
+
+    def _healthy(self, route: ModelRoute) -> bool:
+        return route.stats.samples < self.min_samples or route.stats.error_rate < self.max_error_rate
+
+    def rank(self) -> List[ModelRoute]:
+        """Routes in the order they will be tried for the next call"""
+        healthy = [r for r in self.routes if self._healthy(r)]
+        unhealthy = [r for r in self.routes if not self._healthy(r)]
+
+        def latency(route: ModelRoute, p: float) -> float:
+            value = route.stats.percentile(p)
+            return -1.0 if value is None else value
+
+        if self.policy == "cheapest_within_sla" and self.sla_ms is not None:
+            within = [r for r in healthy if latency(r, 95) <= self.sla_ms]
+            outside = [r for r in healthy if latency(r, 95) > self.sla_ms]
+            ordered = sorted(within, key=lambda r: r.cost_per_1k_tokens) + sorted(outside, key=lambda r: latency(r, 95))
+        else:
+            ordered = sorted(healthy, key=lambda r: latency(r, 50))
+        # Unhealthy routes stay as a last resort
+        return ordered + sorted(unhealthy, key=lambda r: r.stats.error_rate)
+
+    def candidates(self, model: Optional[str]) -> List[ModelRoute]:
+        """Routes to try for a call asking for model"""
+        ranked = self.rank()
+        if self.default_model is None:
+            pinned = model in self._by_model
+        else:
+            pinned = model is not None and model != self.default_model
+        if not pinned:
+            return ranked
+        with self._lock:
+            route = self._by_model.get(model)
+            if route is None:
+                # Explicitly requested model outside the routes: same backend, own stats
+                route = self._by_model[model] = ModelRoute(self.routes[0].provider, model)
+        return [route] + [r for r in ranked if r is not route]
+
+    def _call(self, route: ModelRoute, prompt: str, config: Dict[str, Any],
+              started: Optional[threading.Event] = None) -> LLMResult:
+        # Latency is measured from when the call starts executing, not from when it was queued
+        start_time = time.time()
+        if started is not None:
+            started.set()
+        abandoned = config.get("cancel_event")
+        try:
+            result = route.provider.generate(prompt=prompt, model=route.model, config=config)
+        except Exception:
+            if abandoned is None or not abandoned.is_set():
+                route.stats.record((time.time() - start_time) * 1000, ok=False)
+            raise
+        if abandoned is None or not abandoned.is_set():
+            route.stats.record((time.time() - start_time) * 1000, ok=True)
+        return result
+
+    def _attempt(self, route: ModelRoute, prompt: str, config: Dict[str, Any]) -> LLMResult:
+        if self.resilience is None:
+            return self._run(route, prompt, config, self._call)
+        with self.resilience.guard(f"model:{route.model}", neutral=(CancelledError,)) as guard:
+            return self._run(route, prompt, config, guard.wrap(self._call))
+
+    def _run(self, route: ModelRoute, prompt: str, config: Dict[str, Any], call) -> LLMResult:
+        if self._executor is None:
+            return call(route, prompt, config)
+        started, cancel_event = threading.Event(), threading.Event()
+        future = self._executor.submit(call, route, prompt, dict(config, cancel_event=cancel_event), started)
+        # Waiting for a free thread doesn't count against the model's timeout
+        while not started.wait(0.05):
+            if future.done():
+                # Cancelled before it ran (shutdown); not the route's fault
+                return future.result()
+        try:
+            return future.result(timeout=self.timeout_ms / 1000)
+        except FutureTimeout:
+            # The call ran past timeout_ms: that is the route's error. Cooperative
+            # providers stop on cancel_event; its late outcome is not recorded again.
+            cancel_event.set()
+            route.stats.record(self.timeout_ms, ok=False)
+            raise TimeoutError(f"Model {route.model} timed out after {self.timeout_ms}ms")
+
+    def generate(self, prompt: str, model: str, config: Dict[str, Any]) -> LLMResult:
+        last_error: Optional[Exception] = None
+        for route in self.candidates(model):
+            try:
+                result = self._attempt(route, prompt, config)
+            except CancelledError:
+                raise
+            except Exception as e:
+                log.warning("%s failed, falling back: %s", route.model, e)
+                last_error = e
+                continue
+            result.model = route.model
+            return result
+        raise RuntimeError(f"All routed models failed. Last error: {last_error}")
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {route.model: route.stats.snapshot() for route in self.routes}
+
+    def close(self):
+        """Release the attempt threads (in-flight attempts finish in the background)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+class HedgedProvider:
+    """
+    LLMProvider wrapper that cuts tail latency by hedging slow calls.
+    If the primary call hasn't returned after the current p<percentile> latency, a duplicate
+    is sent (to hedge_model, or the same model). The first successful result wins and
+    the loser is cancelled; cooperative providers can watch config["cancel_event"].
+    Hedges are capped at max_hedge_ratio of calls to bound the extra spend.
+    With resilience set, the primary and the hedge each go through the breaker and
+    bulkhead of the model they are sent to.
+    """
+    def __init__(self, provider: LLMProvider, hedge_model: Optional[str] = None, percentile: float = 95.0,
+                 max_hedge_ratio: float = 0.1, min_samples: int = 20, min_delay_ms: float = 50.0,
+                 max_workers: int = 32, resilience: Optional[Resilience] = None):
+        self.provider = provider
+        self.resilience = resilience
+        self.hedge_model = hedge_model
+        self.percentile = percentile
+        self.max_hedge_ratio = max_hedge_ratio
+        self.min_samples = min_samples
+        self.min_delay_ms = min_delay_ms
+        self.stats = LatencyStats()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cortex-hedge")
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedges_fired = 0
+        self.hedges_won = 0
+        self.extra_tokens = 0
+
+    def threshold_ms(self) -> Optional[float]:
+        """Hedge delay, or None while there isn't enough latency data to pick one"""
+        if self.stats.samples < self.min_samples:
+            return None
+        return max(self.min_delay_ms, self.stats.percentile(self.percentile) or 0.0)
+
+    def _generate(self, prompt: str, model: str, config: Dict[str, Any]) -> LLMResult:
+        if self.resilience is None:
+            return self.provider.generate(prompt=prompt, model=model, config=config)
+        with self.resilience.guard(f"model:{model}", neutral=(CancelledError,)) as guard:
+            try:
+                return guard.wrap(self.provider.generate)(prompt=prompt, model=model, config=config)
+            except Exception as e:
+                if config["cancel_event"].is_set():
+                    # Stopped because the other call won: not the model's failure
+                    raise CancelledError() from e
+                raise
+
+    def _submit(self, prompt: str, model: str, config: Dict[str, Any], on_done=None):
+        cancel_event, started = threading.Event(), threading.Event()
+        call_config = dict(config, cancel_event=cancel_event)
+        started_at: List[float] = []
+
+        def call():
+            # Latency is measured from when the call starts executing, not from when it was queued
+            started_at.append(time.time())
+            started.set()
+            return self._generate(prompt=prompt, model=model, config=call_config)
+
+        future = self._executor.submit(call)
+        if on_done:
+            def done(f):
+                if started_at:
+                    on_done(f, (time.time() - started_at[0]) * 1000)
+            future.add_done_callback(done)
+        return future, cancel_event, started
+
+    def _record_primary(self, future, latency_ms: float):
+        # Primary latencies (even of calls that lost the race) drive the hedge threshold
+        self.stats.record(latency_ms, ok=not future.cancelled() and future.exception() is None)
+
+    def _count_extra(self, future):
+        # Tokens spent by the losing duplicate are the cost of hedging
+        if not future.cancelled() and future.exception() is None:
+            with self._lock:
+                self.extra_tokens += future.result().tokens_used
+
+    def generate(self, prompt: str, model: str, config: Dict[str, Any]) -> LLMResult:
+        with self._lock:
+            self.calls += 1
+        primary, primary_cancel, primary_started = self._submit(prompt, model, config, on_done=self._record_primary)
+
+        threshold = self.threshold_ms()
+        if threshold is None:
+            return primary.result()
+        # The hedge delay runs from when the primary starts, not from when it was queued
+        while not primary_started.wait(0.05):
+            if primary.done():
+                return primary.result()
+        if wait([primary], timeout=threshold / 1000).done:
+            return primary.result()
+
+        with self._lock:
+            allowed = self.hedges_fired < self.max_hedge_ratio * self.calls
+            if allowed:
+                self.hedges_fired += 1
+        if not allowed:
+            # Over the hedge budget: just keep waiting on the primary
+            return primary.result()
+
+        hedge, hedge_cancel, _ = self._submit(prompt, self.hedge_model or model, config)
+        pending = {primary, hedge}
+        winner = None
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    winner = future
+                    break
+
+        if winner is None:
+            # Both failed: surface the primary's error
+            return primary.result()
+
+        loser, loser_cancel = (hedge, hedge_cancel) if winner is primary else (primary, primary_cancel)
+        loser_cancel.set()
+        loser.cancel()
+        loser.add_done_callback(self._count_extra)
+        result = winner.result()
+        if winner is hedge:
+            with self._lock:
+                self.hedges_won += 1
+            # Record the model that actually answered (a router below may already have set it)
+            result.model = result.model or self.hedge_model or model
+        return result
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            calls, fired, won, extra = self.calls, self.hedges_fired, self.hedges_won, self.extra_tokens
+        return {
+            "calls": calls,
+            "hedges_fired": fired,
+            "hedges_won": won,
+            "hedge_rate": fired / calls if calls else 0.0,
+            "win_rate": won / fired if fired else 0.0,
+            "extra_tokens": extra,
+            "threshold_ms": self.threshold_ms()
+        }
+
+    def close(self):
+        """Release the hedge threads (in-flight calls finish in the background)"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
 # Factory to get provider
 def get_llm_provider(provider_type: str = "cortex", session=None) -> LLMProvider:
     if provider_type.lower() == "cortex":
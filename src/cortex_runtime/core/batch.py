@@ -0,0 +1,243 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import os
+import time
+import uuid
+from cortex_runtime.core.adapter import LLMProvider, LLMResult, RoutingProvider
+from cortex_runtime.core.conditions import evaluate
+from cortex_runtime.core.context import ContextAssembler
+from cortex_runtime.core.engine import error_message, initial_context
+from cortex_runtime.core.logs import get_logger
+from cortex_runtime.core.resilience import Resilience
+from cortex_runtime.db.blobs import BlobRef, BlobStore, LocalBlobStore, offload
+from cortex_runtime.db.state import StateManager
+from cortex_runtime.models.agent import AgentConfig
+from cortex_runtime.models.records import StepLogEntry
+from cortex_runtime.tools.registry import ToolRegistry
+
+log = get_logger("batch")
+
+class BatchRunner:
+    """
+    Runs one agent over a whole input set, step by step across all rows instead of
+    run by run. INSTRUCTION steps go out as one set-based completion per chunk
+    (provider.generate_batch, e.g. a single CORTEX.COMPLETE query), TOOL_USE steps run
+    locally in parallel chunks, and runs and step logs are written in bulk.
+
+    Each row still gets its own AGENT_RUNS row and step logs with per-run semantics:
+    when / stop_if guards, context assembly, SKIPPED steps, FAILED (with its error
+    class) on a step error, routing fallback, model/tool circuit breakers and
+    large-output offloading, as in the engine.
+    """
+    def __init__(self, state_manager: StateManager, provider: LLMProvider, tool_registry: Optional[ToolRegistry] = None,
+                 chunk_size: Optional[int] = None, max_workers: Optional[int] = None,
+                 context_assembler: Optional[ContextAssembler] = None, resilience: Optional[Resilience] = None,
+                 blob_store: Optional[BlobStore] = None, blob_threshold: Optional[int] = None,
+                 provider_for: Optional[Callable[[AgentConfig], LLMProvider]] = None):
+        self.state_manager = state_manager
+        self.provider = provider
+        self.tool_registry = tool_registry or ToolRegistry()
+        self.chunk_size = chunk_size or int(os.getenv('CR_BATCH_CHUNK_SIZE', 1000))
+        self.max_workers = max_workers or int(os.getenv('CR_BATCH_WORKERS', 8))
+        self.context_assembler = context_assembler or ContextAssembler(
+            default_budget=int(os.getenv('CR_CONTEXT_TOKEN_BUDGET', 4000)) or None
+        )
+        self.resilience = resilience or Resilience.from_env()
+        blob_dir = os.getenv('CR_BLOB_DIR')
+        if blob_store is None and blob_dir:
+            blob_store = LocalBlobStore(blob_dir)
+        self.blob_store = blob_store
+        self.blob_threshold = blob_threshold or int(os.getenv('CR_BLOB_THRESHOLD', 64 * 1024))
+        self.provider_for = provider_for
+
+    @classmethod
+    def from_engine(cls, engine, **kwargs) -> "BatchRunner":
+        """
+        Batch runner sharing an engine's state manager, provider, tools, context assembler,
+        breakers, blob store and routers
+        """
+        return cls(engine.state_manager, engine.provider, engine.tool_registry,
+                   context_assembler=engine.context_assembler, resilience=engine.resilience,
+                   blob_store=engine.blob_store, blob_threshold=engine.blob_threshold,
+                   provider_for=engine.provider_for, **kwargs)
+
+    def _rows(self, inputs: Any, where: Optional[str] = None, columns: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Input records from a table name, a Snowpark or pandas DataFrame, or an iterable of dicts.
+        For tables and Snowpark DataFrames, where (a SQL predicate) and columns are applied in
+        the warehouse, so only the matching rows and needed columns are fetched.
+        """
+        if isinstance(inputs, str):
+            inputs = self.state_manager.session.table(inputs)
+        if hasattr(inputs, "collect"):
+            if where:
+                inputs = inputs.filter(where)
+            if columns:
+                inputs = inputs.select(*columns)
+            # Snowpark returns unquoted column names upper-cased; templates and guards use lower case
+            return [{k.lower(): v for k, v in row.as_dict().items()} for row in inputs.collect()]
+        if where or columns:
+            raise ValueError("where / columns need a table name or a Snowpark DataFrame")
+        if hasattr(inputs, "to_dict"):
+            return inputs.to_dict("records")
+        return [dict(row) for row in inputs]
+
+    def _chunks(self, items: List[int]) -> List[List[int]]:
+        return [items[i:i + self.chunk_size] for i in range(0, len(items), self.chunk_size)]
+
+    def _candidates(self, agent_config: AgentConfig) -> List[Tuple[LLMProvider, str]]:
+        """(provider, model) pairs to try for an INSTRUCTION chunk, in order"""
+        provider = self.provider_for(agent_config) if self.provider_for else self.provider
+        if isinstance(provider, RoutingProvider):
+            # The router's live ranking; set-based latency isn't comparable to single calls,
+            # so chunks don't feed its stats
+            return [(route.provider, route.model) for route in provider.candidates(agent_config.model)]
+        if agent_config.routing and agent_config.routing.models:
+            return [(provider, route.model) for route in agent_config.routing.models]
+        return [(provider, agent_config.model)]
+
+    def _complete(self, prompts: List[str], agent_config: AgentConfig) -> List[LLMResult]:
+        last_error: Optional[Exception] = None
+        for provider, model in self._candidates(agent_config):
+            # Breaker only: a chunk would hold a bulkhead slot for its whole duration,
+            # and chunk concurrency is already capped at max_workers
+            try:
+                with self.resilience.breaker(f"model:{model}"):
+                    generate_batch = getattr(provider, "generate_batch", None)
+                    if generate_batch is not None:
+                        results = generate_batch(prompts, model, {})
+                    else:
+                        results = [provider.generate(prompt=prompt, model=model, config={}) for prompt in prompts]
+            except Exception as e:
+                log.warning("Batch completion on %s failed: %s", model, e)
+                last_error = e
+                continue
+            for result in results:
+                result.model = result.model or model
+            return results
+        raise last_error
+
+    def _run_instruction(self, step, rows: List[int], contexts: List[Dict], prior: List[str],
+                         agent_config: AgentConfig) -> Dict[int, Tuple]:
+        """row -> (output, tokens, latency, tokens_saved, model) or an Exception"""
+        assembled = {r: self.context_assembler.assemble(step, contexts[r], prior, budget=agent_config.context_token_budget)
+                     for r in rows}
+
+        def run_chunk(chunk: List[int]) -> Dict[int, Any]:
+            try:
+                results = self._complete([assembled[r].prompt for r in chunk], agent_config)
+            except Exception as e:
+                return {r: e for r in chunk}
+            return {
+                r: (res.text, res.tokens_used, res.latency_ms, assembled[r].tokens_saved, res.model or agent_config.model)
+                for r, res in zip(chunk, results)
+            }
+
+        outcomes: Dict[int, Any] = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for chunk_outcomes in executor.map(run_chunk, self._chunks(rows)):
+                outcomes.update(chunk_outcomes)
+        return outcomes
+
+    def _run_tool(self, step, rows: List[int], contexts: List[Dict], model: str) -> Dict[int, Tuple]:
+        def run_chunk(chunk: List[int]) -> Dict[int, Tuple]:
+            outcomes = {}
+            for r in chunk:
+                start_time = time.time()
+                try:
+                    with self.resilience.breaker(f"tool:{step.tool_name}"):
+                        output = str(self.tool_registry.execute(step.tool_name, contexts[r]))
+                except Exception as e:
+                    # Same contract as the engine: a tool error becomes the step output
+                    output = f"Error executing tool {step.tool_name}: {e}"
+                outcomes[r] = (output, 0, (time.time() - start_time) * 1000, 0, model)
+            return outcomes
+
+        outcomes: Dict[int, Tuple] = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for chunk_outcomes in executor.map(run_chunk, self._chunks(rows)):
+                outcomes.update(chunk_outcomes)
+        return outcomes
+
+    def run(self, agent_config: AgentConfig, inputs: Any, run_ids: Optional[List[str]] = None,
+            where: Optional[str] = None, columns: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Execute agent_config over every input record (see _rows for where / columns).
+        Returns one {"run_id", "status", "outputs"} per record, in input order.
+        Raises CircuitOpen if state writes fail fast; unfinished runs stay RUNNING for
+        stalled-run recovery.
+        """
+        rows = self._rows(inputs, where, columns)
+        run_ids = run_ids or [str(uuid.uuid4()) for _ in rows]
+        self.state_manager.create_runs([
+            {"run_id": run_id, "agent_name": agent_config.name, "input": row}
+            for run_id, row in zip(run_ids, rows)
+        ])
+        log.info("Batch of %d runs for Agent %s", len(rows), agent_config.name)
+
+        contexts = [initial_context(row) for row in rows]
+        statuses: List[Optional[str]] = [None] * len(rows)  # None while the run is still going
+        errors: Dict[int, BaseException] = {}
+        steps = agent_config.steps
+
+        for i, step in enumerate(steps):
+            active = [r for r, status in enumerate(statuses) if status is None]
+            if not active:
+                break
+            entries = []
+            runnable = []
+            for r in active:
+                try:
+                    skip = bool(step.when) and not evaluate(step.when, contexts[r])
+                except Exception as e:
+                    log.error("Guard failed for run %s: %s", run_ids[r], e)
+                    statuses[r], errors[r] = 'FAILED', e
+                    continue
+                if skip:
+                    contexts[r][step.name] = None
+                    entries.append(StepLogEntry(run_ids[r], i, step.name, "SKIPPED"))
+                else:
+                    runnable.append(r)
+
+            if step.type == "INSTRUCTION":
+                outcomes = self._run_instruction(step, runnable, contexts, [s.name for s in steps[:i]], agent_config)
+            else:
+                outcomes = self._run_tool(step, runnable, contexts, agent_config.model)
+
+            for r in runnable:
+                outcome = outcomes[r]
+                if isinstance(outcome, Exception):
+                    log.error("Step %s failed for run %s: %s", step.name, run_ids[r], outcome)
+                    statuses[r], errors[r] = 'FAILED', outcome
+                    continue
+                output, tokens, latency, tokens_saved, model = outcome
+                # Same offloading as the engine: large outputs are referenced by handle
+                output = offload(self.blob_store, output, self.blob_threshold)
+                contexts[r][step.name] = output
+                entries.append(StepLogEntry(run_ids[r], i, step.name, "SUCCESS",
+                                            output=output.to_log() if isinstance(output, BlobRef) else output,
+                                            model=model, tokens_used=tokens, latency_ms=latency, tokens_saved=tokens_saved))
+                try:
+                    if step.stop_if and evaluate(step.stop_if, contexts[r]):
+                        statuses[r] = step.stop_status
+                except Exception as e:
+                    log.error("Guard failed for run %s: %s", run_ids[r], e)
+                    statuses[r], errors[r] = 'FAILED', e
+
+            self.state_manager.log_steps(entries)
+
+        statuses = [status or 'COMPLETED' for status in statuses]
+        # Runs that failed on the same error (e.g. one chunk) share an UPDATE
+        by_status: Dict[Tuple[str, Optional[str]], List[str]] = {}
+        for r, (run_id, status) in enumerate(zip(run_ids, statuses)):
+            message = error_message(errors[r]) if r in errors else None
+            by_status.setdefault((status, message), []).append(run_id)
+        for (status, message), ids in by_status.items():
+            self.state_manager.update_runs_status(ids, status, error_message=message)
+
+        step_names = [s.name for s in steps]
+        return [
+            {"run_id": run_id, "status": status,
+             "outputs": {name: context[name] for name in step_names if name in context}}
+            for run_id, status, context in zip(run_ids, statuses, contexts)
+        ]
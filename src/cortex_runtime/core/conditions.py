@@ -0,0 +1,150 @@
+from typing import Any, Callable, Dict
+from functools import lru_cache
+import ast
+import json
+import operator
+from cortex_runtime.db.blobs import resolve
+
+class ConditionError(ValueError):
+    """A guard expression uses syntax or names outside the supported subset"""
+
+def _parse_json(value: Any) -> Any:
+    try:
+        return json.loads(value) if isinstance(value, str) else value
+    except ValueError:
+        return None
+
+# Functions callable from guard expressions
+FUNCTIONS: Dict[str, Callable] = {
+    "len": len, "int": int, "float": float, "str": str, "bool": bool,
+    "abs": abs, "min": min, "max": max, "json": _parse_json,
+}
+
+# String methods callable on values, e.g. validate_math.lower()
+METHODS = {"lower", "upper", "strip", "startswith", "endswith", "split", "get"}
+
+_BINARY = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+    ast.Div: operator.truediv, ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod,
+}
+_COMPARE = {
+    ast.Eq: operator.eq, ast.NotEq: operator.ne, ast.Lt: operator.lt, ast.LtE: operator.le,
+    ast.Gt: operator.gt, ast.GtE: operator.ge, ast.In: lambda a, b: a in b,
+    ast.NotIn: lambda a, b: a not in b, ast.Is: operator.is_, ast.IsNot: operator.is_not,
+}
+_UNARY = {ast.Not: operator.not_, ast.USub: operator.neg, ast.UAdd: operator.pos}
+
+Evaluator = Callable[[Dict[str, Any]], Any]
+
+def _compile(node: ast.AST) -> Evaluator:
+    """Turn an expression AST into nested closures, rejecting anything outside the subset"""
+    if isinstance(node, ast.Constant):
+        value = node.value
+        return lambda ctx: value
+
+    if isinstance(node, ast.Name):
+        name = node.id
+        if name in ("true", "True"):
+            return lambda ctx: True
+        if name in ("false", "False"):
+            return lambda ctx: False
+        if name in ("null", "None"):
+            return lambda ctx: None
+        # Unknown names (e.g. a step that has not run) are None rather than an error
+        return lambda ctx: resolve(ctx.get(name))
+
+    if isinstance(node, ast.BoolOp):
+        operands = [_compile(v) for v in node.values]
+        if isinstance(node.op, ast.And):
+            def evaluate_and(ctx):
+                result = True
+                for operand in operands:
+                    result = operand(ctx)
+                    if not result:
+                        return result
+                return result
+            return evaluate_and
+
+        def evaluate_or(ctx):
+            result = False
+            for operand in operands:
+                result = operand(ctx)
+                if result:
+                    return result
+            return result
+        return evaluate_or
+
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY:
+        op, operand = _UNARY[type(node.op)], _compile(node.operand)
+        return lambda ctx: op(operand(ctx))
+
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+        op, left, right = _BINARY[type(node.op)], _compile(node.left), _compile(node.right)
+        return lambda ctx: op(left(ctx), right(ctx))
+
+    if isinstance(node, ast.Compare) and all(type(op) in _COMPARE for op in node.ops):
+        left = _compile(node.left)
+        pairs = [(_COMPARE[type(op)], _compile(c)) for op, c in zip(node.ops, node.comparators)]
+
+        def evaluate_compare(ctx):
+            current = left(ctx)
+            for op, comparator in pairs:
+                value = comparator(ctx)
+                if not op(current, value):
+                    return False
+                current = value
+            return True
+        return evaluate_compare
+
+    if isinstance(node, ast.IfExp):
+        test, body, orelse = _compile(node.test), _compile(node.body), _compile(node.orelse)
+        return lambda ctx: body(ctx) if test(ctx) else orelse(ctx)
+
+    if isinstance(node, ast.Subscript):
+        value, key = _compile(node.value), _compile(node.slice)
+
+        def evaluate_subscript(ctx):
+            container = value(ctx)
+            try:
+                return container[key(ctx)]
+            except (KeyError, IndexError, TypeError):
+                return None
+        return evaluate_subscript
+
+    if isinstance(node, (ast.List, ast.Tuple)):
+        items = [_compile(e) for e in node.elts]
+        return lambda ctx: [item(ctx) for item in items]
+
+    if isinstance(node, ast.Call) and not node.keywords:
+        args = [_compile(a) for a in node.args]
+        if isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS:
+            fn = FUNCTIONS[node.func.id]
+            return lambda ctx: fn(*[a(ctx) for a in args])
+        if isinstance(node.func, ast.Attribute) and node.func.attr in METHODS:
+            target, method = _compile(node.func.value), node.func.attr
+
+            def evaluate_method(ctx):
+                obj = target(ctx)
+                bound = getattr(obj, method, None)
+                return bound(*[a(ctx) for a in args]) if bound is not None else None
+            return evaluate_method
+
+    raise ConditionError(f"Unsupported expression: {ast.dump(node)[:80]}")
+
+@lru_cache(maxsize=1024)
+def compile_condition(expression: str) -> Evaluator:
+    """
+    Compile a guard expression over the run context. Supports literals, context names,
+    subscripts, comparisons (incl. in / not in), and / or / not, arithmetic, conditional
+    expressions, a few builtins (len, int, float, str, bool, abs, min, max, json) and
+    string methods. Compiled once per distinct expression.
+    """
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ConditionError(f"Invalid expression {expression!r}: {e.msg}") from None
+    return _compile(tree.body)
+
+def evaluate(expression: str, context: Dict[str, Any]) -> bool:
+    """Truthiness of a guard expression against the run context"""
+    return bool(compile_condition(expression)(context))
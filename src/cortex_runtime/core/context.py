@@ -0,0 +1,109 @@
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+from functools import lru_cache
+import json
+import re
+from cortex_runtime.core.adapter import estimate_tokens
+from cortex_runtime.db.blobs import resolve
+
+_PLACEHOLDER = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+TRUNCATION_MARKER = "...[truncated]"
+
+# summarizer(text, max_tokens) -> shorter text
+Summarizer = Callable[[str, int], str]
+
+class AssembledPrompt(NamedTuple):
+    prompt: str
+    context_tokens: int  # Tokens of prior outputs actually included
+    tokens_saved: int  # Tokens of prior outputs dropped by truncation / summarization
+
+@lru_cache(maxsize=1024)
+def placeholders(instruction: str) -> Tuple[str, ...]:
+    """Context names referenced as {{ name }} in an instruction"""
+    return tuple(dict.fromkeys(_PLACEHOLDER.findall(instruction)))
+
+def _as_text(value: Any) -> str:
+    value = resolve(value)
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return str(value)
+
+def truncate(text: str, max_tokens: int) -> str:
+    """Keep the first max_tokens tokens (by the project's estimator), marking the cut"""
+    words = text.split()
+    if len(words) <= max_tokens:
+        return text
+    if max_tokens <= 1:
+        return TRUNCATION_MARKER if max_tokens == 1 else ""
+    return " ".join(words[:max_tokens - 1]) + " " + TRUNCATION_MARKER
+
+def allocate(sizes: List[int], budget: int) -> List[int]:
+    """
+    Split a token budget across items: items smaller than an even share keep
+    everything, the rest share what is left equally.
+    """
+    allocation = [0] * len(sizes)
+    remaining = budget
+    order = sorted(range(len(sizes)), key=lambda i: sizes[i])
+    for position, i in enumerate(order):
+        share = remaining // (len(order) - position)
+        allocation[i] = min(sizes[i], share)
+        remaining -= allocation[i]
+    return allocation
+
+class ContextAssembler:
+    """
+    Builds the prompt for an INSTRUCTION step from its instruction and selected
+    prior outputs, keeping the included context within a token budget.
+
+    Included: names referenced as {{ name }} in the instruction (substituted inline),
+    plus the step's context_steps (appended under "Context:"; ["*"] means every
+    earlier step). When the selection exceeds the budget, outputs that fit an even
+    share are kept whole and larger ones are summarized (if a summarizer is set)
+    or truncated to their share.
+    """
+    def __init__(self, default_budget: Optional[int] = None, summarizer: Optional[Summarizer] = None):
+        self.default_budget = default_budget
+        self.summarizer = summarizer
+
+    def _select(self, step_config, context: Dict[str, Any], prior_steps: List[str]) -> Tuple[List[str], List[str]]:
+        inline = [name for name in placeholders(step_config.instruction or "")]
+        selected = step_config.context_steps or []
+        if "*" in selected:
+            selected = prior_steps
+        appended = [name for name in selected if name not in inline]
+        return inline, [name for name in appended if context.get(name) is not None]
+
+    def _shrink(self, text: str, max_tokens: int) -> str:
+        if self.summarizer is not None and max_tokens > 0:
+            text = self.summarizer(text, max_tokens)
+        return truncate(text, max_tokens)
+
+    def assemble(self, step_config, context: Dict[str, Any], prior_steps: List[str],
+                 budget: Optional[int] = None) -> AssembledPrompt:
+        instruction = step_config.instruction or ""
+        inline, appended = self._select(step_config, context, prior_steps)
+        if not inline and not appended:
+            return AssembledPrompt(instruction, 0, 0)
+
+        names = inline + appended
+        texts = [_as_text(context.get(name)) if context.get(name) is not None else "" for name in names]
+        sizes = [estimate_tokens(text) for text in texts]
+        budget = step_config.max_context_tokens or budget or self.default_budget
+        total = sum(sizes)
+
+        if budget is not None and total > budget:
+            limits = allocate(sizes, budget)
+            texts = [text if size <= limit else self._shrink(text, limit)
+                     for text, size, limit in zip(texts, sizes, limits)]
+            used = sum(estimate_tokens(text) for text in texts)
+        else:
+            used = total
+        values = dict(zip(names, texts))
+
+        prompt = _PLACEHOLDER.sub(lambda m: values.get(m.group(1), ""), instruction) if inline else instruction
+        blocks = [f"[{name}]\n{values[name]}" for name in appended if values[name]]
+        if blocks:
+            prompt += "\n\nContext:\n" + "\n\n".join(blocks)
+        return AssembledPrompt(prompt, used, max(0, total - used))
@@ -0,0 +1,88 @@
+from typing import Any, Callable, Optional, Set
+from concurrent.futures import Executor
+import contextvars
+import threading
+import time
+
+class RunCancelled(Exception):
+    """Raised inside a run once it has been cancelled. reason is 'cancelled' or 'shutdown'."""
+    def __init__(self, run_id: str, reason: str):
+        super().__init__(f"Run {run_id} {reason}")
+        self.run_id = run_id
+        self.reason = reason
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a step or run outlives its deadline"""
+
+class RunControl:
+    """
+    Cooperative cancellation and deadline tracking for one in-flight run.
+    The engine checks it at step boundaries and waits on provider/tool calls through it,
+    so a cancel or an expired deadline releases the worker thread immediately.
+    """
+    def __init__(self, run_id: str, timeout: Optional[float] = None):
+        self.run_id = run_id
+        self.reason: Optional[str] = None
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        # Wake-up events of calls currently being waited on
+        self._wakers: Set[threading.Event] = set()
+        self.deadline: Optional[float] = None
+        self.set_timeout(timeout)
+
+    def set_timeout(self, timeout: Optional[float]):
+        """Bound the whole run to timeout seconds from now (None = unbounded)"""
+        self.deadline = time.monotonic() + timeout if timeout else None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self, reason: str = "cancelled"):
+        with self._lock:
+            if self.reason is None:
+                self.reason = reason
+            self._cancelled.set()
+            wakers = list(self._wakers)
+        for wake in wakers:
+            wake.set()
+
+    def check(self):
+        """Raise if the run was cancelled or its deadline has passed"""
+        if self._cancelled.is_set():
+            raise RunCancelled(self.run_id, self.reason or "cancelled")
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise DeadlineExceeded(f"Run {self.run_id} exceeded its deadline")
+
+    def call(self, executor: Executor, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Run fn on executor and wait for it, bounded by the step timeout, the run deadline
+        and cancellation. An interrupted call is abandoned: its thread finishes in the
+        background but its result is discarded.
+        """
+        self.check()
+        deadline = self.deadline
+        if timeout:
+            step_deadline = time.monotonic() + timeout
+            deadline = step_deadline if deadline is None else min(deadline, step_deadline)
+
+        wake = threading.Event()
+        with self._lock:
+            self._wakers.add(wake)
+            if self._cancelled.is_set():
+                wake.set()
+        try:
+            # Carry the caller's context (log correlation IDs) into the call thread
+            future = executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+            future.add_done_callback(lambda f: wake.set())
+            wake.wait(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        finally:
+            with self._lock:
+                self._wakers.discard(wake)
+
+        if future.done():
+            return future.result()
+
+        future.cancel()
+        self.check()
+        raise DeadlineExceeded(f"Step in run {self.run_id} exceeded its {timeout}s timeout")
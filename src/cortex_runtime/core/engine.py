@@ -1,16 +1,42 @@
 import os
 import time
 import signal
-import sys
-from typing import Dict, Any, Set, Callable, Optional
-from concurrent.futures import ThreadPoolExecutor, Future
+import threading
+from typing import Dict, Any, List, Callable, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, Future, wait
 from cortex_runtime.db.state import StateManager
-from cortex_runtime.core.adapter import LLMProvider
-from cortex_runtime.models.agent import AgentDefinition, AgentConfig
+from cortex_runtime.core.adapter import LLMProvider, ModelRoute, RoutingProvider, HedgedProvider
+from cortex_runtime.models.agent import AgentConfig, HedgingConfig
+from cortex_runtime.models.records import StepLogEntry, StepResult
 from cortex_runtime.tools.registry import ToolRegistry
+from cortex_runtime.core.events import RunEventBus, WebhookNotifier
+from cortex_runtime.db.blobs import BlobStore, BlobRef, LocalBlobStore, from_log, offload
+from cortex_runtime.core.control import RunControl, RunCancelled, DeadlineExceeded
+from cortex_runtime.core.profiling import Profiler
+from cortex_runtime.core.resilience import CircuitOpen, Resilience
+from cortex_runtime.core.conditions import evaluate
+from cortex_runtime.core.context import ContextAssembler, placeholders
+from cortex_runtime.core.logs import get_logger, bind
+
+log = get_logger("runtime")
+
+def error_message(error: BaseException) -> str:
+    """AGENT_RUNS.error_message for a failure: "<ErrorClass>: <detail>" (recovery filters on the class)"""
+    return f"{type(error).__name__}: {error}"
+
+def state_unavailable(error: BaseException) -> bool:
+    """True for a fail-fast rejection by one of the state store's (db:*) breakers"""
+    return isinstance(error, CircuitOpen) and error.name.startswith("db:")
+
+def initial_context(run_input: Any) -> Dict[str, Any]:
+    """Run context before the first step: the input, plus its fields spread for direct access"""
+    context = {"input": run_input}
+    if isinstance(run_input, dict):
+        context.update(run_input)
+    return context
 
 class ExecutionEngine:
-    def __init__(self, state_manager: StateManager, provider: LLMProvider, max_workers: int = 10, tools: Optional[Dict[str, Callable]] = None):
+    def __init__(self, state_manager: StateManager, provider: LLMProvider, max_workers: int = 10, tools: Optional[Dict[str, Callable]] = None, blob_store: Optional[BlobStore] = None):
         self.state_manager = state_manager
         self.provider = provider
         
@@ -18,10 +44,52 @@ class ExecutionEngine:
         env_workers = os.getenv('CR_MAX_WORKERS')
         if env_workers:
             max_workers = int(env_workers)
+        self.max_workers = max_workers
             
         self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        # Provider/tool calls run here so a worker can stop waiting on a stuck call.
+        # Abandoned calls keep their thread, so there is headroom beyond one bulkhead's worth.
+        self._call_executor = ThreadPoolExecutor(max_workers=max_workers * 2, thread_name_prefix="cortex-call")
+        # Per-model / per-tool circuit breakers and bulkheads: a failing dependency fails fast
+        # and can hold at most one bulkhead (max_workers by default) of call threads
+        self.resilience = Resilience.from_env(bulkhead_size=max_workers)
         self._running = True
-        self._active_futures: Set[Future] = set()
+        # Updated every loop iteration; a supervisor uses it as a liveness signal
+        self.last_heartbeat = time.time()
+        # Future -> run_id, so unfinished runs can be parked on shutdown
+        self._active_futures: Dict[Future, str] = {}
+        
+        # Cancellation and deadlines (agent/step timeout_seconds override these defaults)
+        self._controls: Dict[str, RunControl] = {}
+        self._controls_lock = threading.Lock()
+        self.run_timeout = float(os.getenv('CR_RUN_TIMEOUT', 0)) or None
+        self.step_timeout = float(os.getenv('CR_STEP_TIMEOUT', 0)) or None
+        self.drain_timeout = float(os.getenv('CR_DRAIN_TIMEOUT', 30))
+        
+        # Prompt assembly: prior outputs go into INSTRUCTION prompts within a token budget.
+        # Set context_assembler.summarizer to summarize instead of truncating.
+        self.context_assembler = ContextAssembler(default_budget=int(os.getenv('CR_CONTEXT_TOKEN_BUDGET', 4000)) or None)
+        
+        # Compiled agent definitions, reloaded after CR_DEFINITION_TTL seconds
+        self._agent_configs: Dict[str, Tuple[AgentConfig, float]] = {}
+        self._agent_configs_lock = threading.Lock()
+        self.definition_ttl = float(os.getenv('CR_DEFINITION_TTL', 300))
+        
+        # Readiness: the loop claims nothing until warm_up() has run
+        self.ready = threading.Event()
+        self.warmup_report: Dict[str, Any] = {}
+        
+        # On-demand profiling (per agent, per run or sampled); off unless enabled
+        self.profiler = Profiler.from_env()
+        
+        # Per-agent routing providers, so latency stats persist across runs
+        self._routers: Dict[str, RoutingProvider] = {}
+        self._hedgers: Dict[str, HedgedProvider] = {}
+        self._routers_lock = threading.Lock()
+        
+        # Per-agent memory (created on first use)
+        self._memories: Dict[str, Any] = {}
+        self._memories_lock = threading.Lock()
         
         # Tool Registry
         self.tool_registry = ToolRegistry()
@@ -29,27 +97,150 @@ class ExecutionEngine:
             for name, func in tools.items():
                 self.tool_registry.register(name, func)
 
+        # Large output offloading: outputs above the threshold live in the blob store
+        # and are referenced by handle in the context and step logs
+        blob_dir = os.getenv('CR_BLOB_DIR')
+        if blob_store is None and blob_dir:
+            blob_store = LocalBlobStore(blob_dir)
+        self.blob_store = blob_store
+        self.blob_threshold = int(os.getenv('CR_BLOB_THRESHOLD', 64 * 1024))
+
+        # Run state notifications (replaces client-side status polling)
+        self.events = RunEventBus()
+        self._notifier: Optional[WebhookNotifier] = None
+        webhook_url = os.getenv('CR_NOTIFY_WEBHOOK')
+        if webhook_url:
+            self._notifier = WebhookNotifier(webhook_url)
+            self.events.subscribe(self._notifier)
         
         # Signal handling
         signal.signal(signal.SIGINT, self._shutdown_handler)
         signal.signal(signal.SIGTERM, self._shutdown_handler)
 
+    def _compile_definition(self, definition: Dict[str, Any]) -> AgentConfig:
+        """Parse and validate a definition (guards compile in StepConfig) and warm the prompt template cache"""
+        agent_config = AgentConfig.from_definition(definition)
+        for step in agent_config.steps:
+            if step.instruction:
+                placeholders(step.instruction)
+        return agent_config
+
+    def agent_config_for(self, agent_name: str, run_row: Optional[Dict] = None) -> Optional[AgentConfig]:
+        """
+        Compiled AgentConfig for an agent: from the cache while it is younger than
+        CR_DEFINITION_TTL, otherwise fetched from AGENT_DEFINITIONS and compiled.
+        Falls back to a mock_config attached to the run row (tests / mock mode).
+        """
+        now = time.time()
+        with self._agent_configs_lock:
+            cached = self._agent_configs.get(agent_name)
+        if cached and now - cached[1] < self.definition_ttl:
+            return cached[0]
+
+        with Profiler.section("state"):
+            definition = self.state_manager.fetch_agent_definition(agent_name)
+        if definition:
+            agent_config = self._compile_definition(definition)
+            with self._agent_configs_lock:
+                self._agent_configs[agent_name] = (agent_config, now)
+            return agent_config
+        if run_row is not None and 'mock_config' in run_row:
+            return run_row['mock_config']  # Expecting an AgentConfig object
+        return None
+
+    def _probe_models(self, models: List[str], timeout: float) -> Dict[str, Any]:
+        """One tiny completion per model, in parallel: latency in ms, or the error"""
+        def probe(model: str) -> float:
+            start_time = time.time()
+            self.provider.generate(prompt="ping", model=model, config={"max_tokens": 1})
+            return round((time.time() - start_time) * 1000, 1)
+
+        futures = {model: self._call_executor.submit(probe, model) for model in models}
+        done, _ = wait(list(futures.values()), timeout=timeout)
+        results = {}
+        for model, future in futures.items():
+            if future not in done:
+                results[model] = f"timed out after {timeout:.0f}s"
+            elif future.exception() is not None:
+                error = future.exception()
+                results[model] = f"{type(error).__name__}: {error}"
+            else:
+                results[model] = future.result()
+        return results
+
+    def warm_up(self) -> Dict[str, Any]:
+        """
+        Pay start-up costs before claiming work: session round trip, load and compile
+        all active agent definitions, tool warm_up hooks, and (unless CR_WARMUP_PROBE=0)
+        a probe completion per configured model (plus CR_WARMUP_MODELS).
+        Failures are reported, not raised; the engine is marked ready afterwards.
+        """
+        start_time = time.time()
+        log.info("Warming up...")
+        report: Dict[str, Any] = {"session": self.state_manager.ping()}
+
+        compiled, invalid = {}, {}
+        for agent_name, definition in self.state_manager.fetch_active_definitions().items():
+            try:
+                compiled[agent_name] = self._compile_definition(definition)
+            except Exception as e:
+                invalid[agent_name] = f"{type(e).__name__}: {e}"
+                log.error("Invalid definition for %s: %s", agent_name, e)
+        with self._agent_configs_lock:
+            self._agent_configs.update((name, (config, start_time)) for name, config in compiled.items())
+        report["definitions"] = sorted(compiled)
+        if invalid:
+            report["invalid_definitions"] = invalid
+
+        report["tools"] = self.tool_registry.warm_up()
+
+        models = [m.strip() for m in os.getenv('CR_WARMUP_MODELS', '').split(',') if m.strip()]
+        for agent_config in compiled.values():
+            models.append(agent_config.model)
+            if agent_config.routing:
+                models.extend(route.model for route in agent_config.routing.models)
+            if agent_config.hedging and agent_config.hedging.hedge_model:
+                models.append(agent_config.hedging.hedge_model)
+        models = list(dict.fromkeys(models))
+        if os.getenv('CR_WARMUP_PROBE', '1').lower() not in ('0', 'false', 'no') and models:
+            report["probes"] = self._probe_models(models, float(os.getenv('CR_WARMUP_TIMEOUT', 30)))
+
+        report["duration_ms"] = round((time.time() - start_time) * 1000, 1)
+        self.warmup_report = report
+        self.ready.set()
+        log.info("Warm-up done in %.0f ms: %d definitions, %d tools, %d models probed",
+                 report["duration_ms"], len(compiled), len(report["tools"]), len(report.get("probes", {})))
+        return report
+
     def _shutdown_handler(self, signum, frame):
-        print("\n[Runtime] Shutdown signal received. Stopping loop...")
+        log.info("Shutdown signal received. Stopping loop...")
         self._running = False
 
     def run_agent_loop(self):
         """Main polling loop with parallel execution and graceful shutdown"""
-        print("[Runtime] Starting high-scale agent polling loop... (Ctrl+C to stop)")
+        readiness = None
+        port = os.getenv('CR_READINESS_PORT')
+        if port:
+            from cortex_runtime.core.readiness import ReadinessServer
+            try:
+                readiness = ReadinessServer(self, int(port)).start()
+            except OSError as e:
+                log.warning("Readiness endpoint not started on port %s: %s", port, e)
+        if not self.ready.is_set():
+            # Warm the session, definitions, tools and model path before taking any work
+            self.warm_up()
+        log.info("Starting high-scale agent polling loop... (Ctrl+C to stop)")
         while self._running:
+            self.last_heartbeat = time.time()
+            
             # 1. Clean up finished futures
-            done_futures = {f for f in self._active_futures if f.done()}
+            done_futures = [f for f in self._active_futures if f.done()]
             for f in done_futures:
+                del self._active_futures[f]
                 try:
                     f.result() # check for exceptions
                 except Exception as e:
-                    print(f"[Runtime] Error in worker thread: {e}")
-            self._active_futures -= done_futures
+                    log.error("Error in worker thread: %s", e)
 
             # 2. Poll for pending runs (Batch)
             pending_runs = self.state_manager.fetch_pending_runs(limit=10)
@@ -66,40 +257,212 @@ class ExecutionEngine:
             for run_row in pending_runs:
                 if not self._running:
                     break
-                future = self.executor.submit(self.execute_run, run_row)
-                self._active_futures.add(future)
+                self.submit_run(run_row)
                 
             time.sleep(1)
             
-        print("[Runtime] Loop stopped. Waiting for active workers to finish...")
+        log.info("Loop stopped. Draining active workers (up to %.0fs)...", self.drain_timeout)
+        _, not_done = wait(list(self._active_futures), timeout=self.drain_timeout)
+        if not_done:
+            log.warning("Drain timeout reached. Parking %d unfinished runs back to PENDING.", len(not_done))
+            self._park_unfinished_runs()
         self.executor.shutdown(wait=True)
-        print("[Runtime] Shutdown complete. Goodbye.")
+        self._call_executor.shutdown(wait=False, cancel_futures=True)
+        for provider in list(self._hedgers.values()) + list(self._routers.values()):
+            provider.close()
+        for memory in self._memories.values():
+            memory.flush()
+        if self._notifier is not None:
+            # Flush terminal notifications of the runs that just drained
+            self._notifier.close(timeout=self._notifier.timeout * 5)
+        if readiness is not None:
+            readiness.stop()
+        log.info("Shutdown complete. Goodbye.")
+
+    def _park_unfinished_runs(self):
+        """
+        Hand unfinished runs back to the queue. Queued runs are released directly;
+        running ones stop at their next step boundary (or abandon their in-flight call)
+        and resume later from their last logged step.
+        """
+        for future, run_id in list(self._active_futures.items()):
+            if future.cancel():
+                try:
+                    self._set_status(run_id, 'PENDING')
+                except CircuitOpen as e:
+                    log.error("Run %s not parked: %s", run_id, e)
+        with self._controls_lock:
+            controls = list(self._controls.values())
+        for control in controls:
+            control.cancel("shutdown")
+
+    def cancel_run(self, run_id: str) -> bool:
+        """
+        Cancel an in-flight run. It stops at the next step boundary, or immediately if it is
+        waiting on a provider/tool call, and ends as CANCELLED. Returns False if not running here.
+        """
+        with self._controls_lock:
+            control = self._controls.get(run_id)
+        if control:
+            control.cancel("cancelled")
+            return True
+        for future, active_run_id in list(self._active_futures.items()):
+            if active_run_id == run_id and future.cancel():
+                self._set_status(run_id, 'CANCELLED')
+                return True
+        return False
+
+    def get_memory(self, agent_name: str):
+        """
+        Shared AgentMemory for an agent: keyed get/put plus similarity search over
+        AGENT_MEMORY. The local index is loaded on first access.
+        """
+        with self._memories_lock:
+            memory = self._memories.get(agent_name)
+            if memory is None:
+                # Imported here so NumPy is only loaded by agents that use memory
+                from cortex_runtime.db.memory import AgentMemory
+                memory = AgentMemory(
+                    self.state_manager,
+                    agent_name,
+                    cache_size=int(os.getenv('CR_MEMORY_CACHE_SIZE', 1024)),
+                    index=os.getenv('CR_MEMORY_INDEX', 'brute')
+                )
+                memory.load()
+                self._memories[agent_name] = memory
+            return memory
+
+    def provider_for(self, agent_config: AgentConfig) -> LLMProvider:
+        """Provider used for an agent's INSTRUCTION steps: a shared router if it declares routing"""
+        if not agent_config.routing:
+            return self.provider
+        with self._routers_lock:
+            router = self._routers.get(agent_config.name)
+            if router is None:
+                routing = agent_config.routing
+                router = RoutingProvider(
+                    [ModelRoute(self.provider, m.model, m.cost_per_1k_tokens) for m in routing.models],
+                    policy=routing.policy,
+                    sla_ms=routing.sla_ms,
+                    timeout_ms=routing.timeout_ms,
+                    default_model=agent_config.model,
+                    max_workers=self.max_workers,
+                    resilience=self.resilience
+                )
+                self._routers[agent_config.name] = router
+            return router
+
+    def hedged_provider_for(self, agent_config: AgentConfig) -> HedgedProvider:
+        """Shared hedging wrapper around the agent's provider"""
+        base = self.provider_for(agent_config)
+        with self._routers_lock:
+            hedger = self._hedgers.get(agent_config.name)
+            if hedger is None:
+                hedging = agent_config.hedging or HedgingConfig()
+                hedger = HedgedProvider(
+                    base,
+                    hedge_model=hedging.hedge_model,
+                    percentile=hedging.percentile,
+                    max_hedge_ratio=hedging.max_hedge_ratio,
+                    min_samples=hedging.min_samples,
+                    # Each hedged call can hold two threads (primary and hedge)
+                    max_workers=2 * self.max_workers,
+                    # A router already guards each model it calls
+                    resilience=None if isinstance(base, RoutingProvider) else self.resilience
+                )
+                self._hedgers[agent_config.name] = hedger
+            return hedger
+
+    def hedge_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """How often hedges fire and win, per agent"""
+        return {name: hedger.metrics() for name, hedger in self._hedgers.items()}
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Breaker states and bulkhead usage per dependency (model:, tool:, db:), plus hedging and tool cache stats"""
+        metrics = self.resilience.snapshot()
+        state_resilience = getattr(self.state_manager, 'resilience', None)
+        if isinstance(state_resilience, Resilience):
+            metrics["breakers"].update(state_resilience.snapshot()["breakers"])
+        metrics["active_runs"] = len(self._active_futures)
+        metrics["hedging"] = self.hedge_metrics()
+        metrics["tool_cache"] = self.tool_registry.cache_stats()
+        metrics["ready"] = self.ready.is_set()
+        return metrics
+
+    def _set_status(self, run_id: str, status: str, error: Optional[BaseException] = None):
+        """Persist a run status (with the error class for failures) and notify in-process listeners"""
+        with Profiler.section("state"):
+            if error is None:
+                self.state_manager.update_run_status(run_id, status)
+            else:
+                self.state_manager.update_run_status(run_id, status, error_message=error_message(error))
+        self.events.publish(run_id, status)
+
+    def on_run_event(self, callback: Callable[[str, str], None]) -> Callable[[], None]:
+        """Subscribe callback(run_id, status) to run state transitions. Returns an unsubscribe function."""
+        return self.events.subscribe(callback)
+
+    def run_future(self, run_id: str) -> Future:
+        """Future that resolves with the terminal status (COMPLETED / FAILED / CANCELLED) of a run"""
+        return self.events.wait_for(run_id)
+
+    def wait_for_run(self, run_id: str, timeout: Optional[float] = None) -> str:
+        """Block until the run reaches a terminal status, without polling the database"""
+        return self.run_future(run_id).result(timeout=timeout)
+
+    def submit_run(self, run_row: Dict) -> Future:
+        """Execute a claimed run on the worker pool. The returned future completes with the run."""
+        future = self.executor.submit(self.execute_run, run_row)
+        self._active_futures[future] = run_row['run_id']
+        return future
 
     def execute_run(self, run_row: Dict):
         """Execute a single agent run"""
         run_id = run_row['run_id']
         agent_name = run_row['agent_name']
         
-        self.state_manager.update_run_status(run_id, 'RUNNING')
+        control = RunControl(run_id, self.run_timeout)
+        with self._controls_lock:
+            self._controls[run_id] = control
+        profile = self.profiler.start(run_id, agent_name)
+        try:
+            with bind(run_id=run_id):
+                self._execute_run(run_row, control)
+        except CircuitOpen as e:
+            if not state_unavailable(e):
+                raise
+            # Results can't be recorded, so stop calling models for this run. It stays RUNNING with
+            # its logged steps and resumes after stalled-run recovery (core.recovery --stalled).
+            log.error("Run %s stopped, state store unavailable: %s", run_id, e)
+        finally:
+            with self._controls_lock:
+                self._controls.pop(run_id, None)
+            if profile:
+                log.info("Profile for run %s written: %s", run_id, ", ".join(profile.stop()))
+
+    def _execute_run(self, run_row: Dict, control: RunControl):
+        run_id = run_row['run_id']
+        agent_name = run_row['agent_name']
         
-        # 2. Load Definition
-        # In mock mode, we try to fetch, if None, we assume it's attached to the run_row for testing
-        # or we error out.
-        defn_yaml = self.state_manager.fetch_agent_definition(agent_name)
+        self._set_status(run_id, 'RUNNING')
         
-        agent_config = None
-        if not defn_yaml and 'mock_config' in run_row:
-             agent_config = run_row['mock_config'] # Expecting an AgentConfig object
-        elif defn_yaml:
-             # Parse yaml... (Skipping parsing logic for prototype simplicity, assume pre-parsed object)
-             pass 
+        # 2. Load Definition (compiled once and cached; see agent_config_for)
+        try:
+            agent_config = self.agent_config_for(agent_name, run_row)
+        except Exception as e:
+            log.error("Invalid definition for %s: %s", agent_name, e)
+            self._set_status(run_id, 'FAILED', error=e)
+            return
              
         if not agent_config:
-             print(f"[Runtime] Error: No definition found for {agent_name}")
-             self.state_manager.update_run_status(run_id, 'FAILED')
+             log.error("No definition found for %s", agent_name)
+             self._set_status(run_id, 'FAILED', error=LookupError(f"No definition found for {agent_name}"))
              return
 
-        print(f"[Runtime] Executing Run {run_id} for Agent {agent_name}")
+        if agent_config.timeout_seconds:
+            control.set_timeout(agent_config.timeout_seconds)
+
+        log.info("Executing Run %s for Agent %s", run_id, agent_name)
         
                 # 3. Resume / Start
         # The fetch query now returns 'completed_steps' count
@@ -110,57 +473,120 @@ class ExecutionEngine:
         steps = agent_config.steps
         
         # Initialize context with input AND spread input fields for direct access
-        run_input = run_row.get('input', {})
-        context = {"input": run_input}
-        if isinstance(run_input, dict):
-             context.update(run_input)
+        context = initial_context(run_row.get('input', {}))
+        final_status = 'COMPLETED'
         
         try:
+            # Inside the try so a provider setup error fails the run instead of stranding it RUNNING
+            provider = self.provider_for(agent_config)
+            if current_step_index:
+                # Guards and later steps read earlier outputs, so bring them back on resume
+                self._restore_context(run_id, context, current_step_index)
             for i in range(current_step_index, len(steps)):
                 step = steps[i]
-                print(f"[Runtime] --> Executing Step {i}: {step.name} ({step.type})")
+                # Step boundary: honour cancellation and the run deadline
+                control.check()
+                
+                if step.when and not evaluate(step.when, context):
+                    # Logged so the resume checkpoint counts it; no provider/tool call is made
+                    log.info("--> Skipping Step %d: %s (when: %s)", i, step.name, step.when, extra={"sampled": True})
+                    with Profiler.section("state"):
+                        self.state_manager.log_step(run_id, StepLogEntry(run_id, i, step.name, "SKIPPED"))
+                    context[step.name] = None
+                    continue
                 
-                # result is now an LLMResult object or dict with metrics
-                result_obj = self.run_single_step(step, context, agent_config.model)
+                log.info("--> Executing Step %d: %s (%s)", i, step.name, step.type, extra={"sampled": True})
                 
-                # Extract text for context linkage
-                output_text = result_obj.text if hasattr(result_obj, 'text') else result_obj.get('tool_output', '')
+                # Hedging is opt-in per agent and can be overridden per step
+                hedge = step.hedge if step.hedge is not None else agent_config.hedging is not None
+                step_provider = self.hedged_provider_for(agent_config) if hedge else provider
+                prompt, tokens_saved = None, 0
+                if step.type == "INSTRUCTION":
+                    with Profiler.section("prompt"):
+                        assembled = self.context_assembler.assemble(
+                            step, context, [s.name for s in steps[:i]], budget=agent_config.context_token_budget
+                        )
+                    prompt, tokens_saved = assembled.prompt, assembled.tokens_saved
+                    if tokens_saved:
+                        log.info("Context budget saved %d tokens", tokens_saved, extra={"sampled": True, "step": step.name})
+                with Profiler.section("step"), bind(step=step.name):
+                    result_obj = self.run_single_step(step, context, agent_config.model, control=control,
+                                                      provider=step_provider, prompt=prompt)
                 
-                # Metrics
-                tokens = result_obj.tokens_used if hasattr(result_obj, 'tokens_used') else 0
-                latency = result_obj.latency_ms if hasattr(result_obj, 'latency_ms') else 0
+                # LLMResult and StepResult expose the same fields (text, tokens_used, latency_ms, model)
+                # Offload large outputs once; the context and log only carry the handle
+                output_value = offload(self.blob_store, result_obj.text, self.blob_threshold)
                 
                 # Log step with full fidelity
-                self.state_manager.log_step(run_id, {
-                    "step_index": i,
-                    "step_name": step.name,
-                    "status": "SUCCESS",
-                    "output": output_text,
-                    "model": agent_config.model,
-                    "tokens_used": tokens,
-                    "latency_ms": latency
-                })
+                with Profiler.section("state"):
+                    self.state_manager.log_step(run_id, StepLogEntry(
+                        run_id, i, step.name, "SUCCESS",
+                        output=output_value.to_log() if isinstance(output_value, BlobRef) else output_value,
+                        model=result_obj.model or agent_config.model,
+                        tokens_used=result_obj.tokens_used,
+                        latency_ms=result_obj.latency_ms,
+                        tokens_saved=tokens_saved
+                    ))
                 
                 # Update context
-                context[step.name] = output_text
+                context[step.name] = output_value
+                
+                if step.stop_if and evaluate(step.stop_if, context):
+                    log.info("Run %s stopped after step %s (stop_if: %s) -> %s", run_id, step.name, step.stop_if, step.stop_status)
+                    final_status = step.stop_status
+                    break
                 
-            self.state_manager.update_run_status(run_id, 'COMPLETED')
+            self._set_status(run_id, final_status)
             
+        except RunCancelled as e:
+            if e.reason == "shutdown":
+                # Completed steps are already logged, so the run resumes from its checkpoint
+                log.info("Run %s parked for shutdown.", run_id)
+                self._set_status(run_id, 'PENDING')
+            else:
+                log.info("Run %s cancelled.", run_id)
+                self._set_status(run_id, 'CANCELLED')
         except Exception as e:
-            print(f"[Runtime] Step failed: {e}")
-            self.state_manager.update_run_status(run_id, 'FAILED')
+            if state_unavailable(e):
+                raise
+            log.error("Step failed: %s", e)
+            self._set_status(run_id, 'FAILED', error=e)
 
-    def run_single_step(self, step_config, context, model):
-        """Execute a single step deterministically"""
+    def _restore_context(self, run_id: str, context: Dict[str, Any], upto: int):
+        """Reload outputs of steps logged before the resume point into the context"""
+        with Profiler.section("state"):
+            recorded = self.state_manager.fetch_steps([run_id]).get(run_id, [])
+        for step in recorded:
+            if step.get('step_index', 0) >= upto or step.get('status') not in ('SUCCESS', 'SKIPPED'):
+                continue
+            context[step['step_name']] = from_log(self.blob_store, step.get('output'))
+
+    def _call(self, control: Optional[RunControl], step_config, fn: Callable, *args, **kwargs):
+        """Invoke a provider/tool call, bounded by the run's control when there is one"""
+        profile = Profiler.current()
+        if profile is not None:
+            # The call may run on another thread; profile it there too
+            fn = profile.wrap(fn)
+        if control is None:
+            return fn(*args, **kwargs)
+        timeout = step_config.timeout_seconds or self.step_timeout
+        return control.call(self._call_executor, fn, *args, timeout=timeout, **kwargs)
+
+    def run_single_step(self, step_config, context, model, control: Optional[RunControl] = None,
+                        provider: Optional[LLMProvider] = None, prompt: Optional[str] = None):
+        """Execute a single step deterministically. prompt overrides the raw instruction (see ContextAssembler)."""
         # Resolve inputs (simple Jinja-like replacement would go here)
         
         if step_config.type == "INSTRUCTION":
-            # Return the full LLMResult object
-            return self.provider.generate(
-                prompt=step_config.instruction,
-                model=model,
-                config={}
-            )
+            # Return the provider's LLMResult as is
+            prompt = prompt if prompt is not None else step_config.instruction
+            if provider is not None and provider is not self.provider:
+                # Routing and hedging providers guard each call under the model that actually serves it
+                with Profiler.section("provider"):
+                    return self._call(control, step_config, provider.generate, prompt=prompt, model=model, config={})
+            with Profiler.section("provider"), self.resilience.guard(f"model:{model}", neutral=(RunCancelled,)) as guard:
+                return self._call(control, step_config, guard.wrap(self.provider.generate),
+                                  prompt=prompt, model=model, config={})
             
         elif step_config.type == "TOOL_USE":
             # Dynamic Tool Execution
@@ -170,20 +596,16 @@ class ExecutionEngine:
                 # for prototype we assume the step has a 'tool_input' or we pass full context
                 # Ideally step_config has 'tool_input' map.
                 # Here we pass full context for simplicity + flexibility
-                output = self.tool_registry.execute(step_config.tool_name, context)
+                with Profiler.section("tool"), self.resilience.guard(f"tool:{step_config.tool_name}", neutral=(RunCancelled,)) as guard:
+                    output = self._call(control, step_config, guard.wrap(self.tool_registry.execute), step_config.tool_name, context)
                 
-                latency = (time.time() - start_time) * 1000
-                return {
-                    "tool_output": str(output), # conversion to string for safety
-                    "tokens_used": 0, 
-                    "latency_ms": latency
-                }
+                # conversion to string for safety
+                return StepResult(str(output), latency_ms=(time.time() - start_time) * 1000)
+            except (RunCancelled, DeadlineExceeded):
+                raise
             except Exception as e:
-                return {
-                    "tool_output": f"Error executing tool {step_config.tool_name}: {e}",
-                    "tokens_used": 0,
-                    "latency_ms": (time.time() - start_time) * 1000
-                }
+                return StepResult(f"Error executing tool {step_config.tool_name}: {e}",
+                                  latency_ms=(time.time() - start_time) * 1000)
             
         return None
 
@@ -192,23 +614,16 @@ class ExecutionEngine:
         Resume a FAILED or STOPPED run from the last successful step.
         This enables deterministic replay and failure recovery.
         """
-        print(f"[Runtime] Resuming Run {run_id}...")
-        
-        # 1. Fetch run details
-        # In a real implementation, we'd query AGENT_RUNS for the run_row
-        pending = self.state_manager.fetch_pending_runs()
-        # For prototype simplicity, we just look in pending or assume it's there
-        # but technically a failed run isn't PENDING.
-        # We would need fetch_run(run_id) on StateManager.
-        
-        # Simulating recovery by just setting it back to PENDING if we can find it
-        if not self.state_manager.session:
-            if run_id in self.state_manager._mock_runs:
-                 self.state_manager._mock_runs[run_id]['status'] = 'PENDING'
-                 print(f"[Runtime] Run {run_id} status reset to PENDING for retry.")
-        else:
-             self.state_manager.update_run_status(run_id, 'PENDING')
-             print(f"[Runtime] Run {run_id} status reset to PENDING in DB.")
+        log.info("Resuming Run %s...", run_id)
+        
+        # Read the run directly; claiming pending runs here would steal other work
+        if not self.state_manager.fetch_run(run_id):
+            log.warning("Run %s not found.", run_id)
+            return
+        
+        # Back to PENDING: the next claim resumes after the last logged step
+        self._set_status(run_id, 'PENDING')
+        log.info("Run %s status reset to PENDING for retry.", run_id)
 
     def get_run_summary(self, run_id: str) -> Dict[str, Any]:
         """
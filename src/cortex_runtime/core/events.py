@@ -0,0 +1,132 @@
+from typing import Dict, List, Callable, Optional
+from collections import OrderedDict
+from concurrent.futures import Future
+import queue
+import threading
+import json
+from cortex_runtime.core.logs import get_logger
+
+log = get_logger("events")
+
+# Statuses after which a run will not transition again without a resume
+TERMINAL_STATUSES = {"COMPLETED", "FAILED", "CANCELLED"}
+
+RunCallback = Callable[[str, str], None]
+
+class RunEventBus:
+    """
+    In-process pub/sub for run state transitions.
+    Callers can subscribe to every transition or wait on a Future that
+    resolves with the terminal status of a single run, instead of polling AGENT_RUNS.
+    """
+    def __init__(self, max_remembered: int = 10000):
+        self._lock = threading.Lock()
+        self._subscribers: List[RunCallback] = []
+        self._waiters: Dict[str, List[Future]] = {}
+        # Terminal statuses of recent runs, so late waiters resolve immediately
+        self._finished: "OrderedDict[str, str]" = OrderedDict()
+        self._max_remembered = max_remembered
+
+    def subscribe(self, callback: RunCallback) -> Callable[[], None]:
+        """Register callback(run_id, status). Returns a function that unsubscribes it."""
+        with self._lock:
+            self._subscribers.append(callback)
+        return lambda: self.unsubscribe(callback)
+
+    def unsubscribe(self, callback: RunCallback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def wait_for(self, run_id: str) -> Future:
+        """Future resolving with the terminal status of run_id."""
+        future: Future = Future()
+        with self._lock:
+            if run_id in self._finished:
+                future.set_result(self._finished[run_id])
+                return future
+            self._waiters.setdefault(run_id, []).append(future)
+        return future
+
+    def publish(self, run_id: str, status: str):
+        """Notify subscribers of a transition and resolve waiters on terminal statuses."""
+        waiters: List[Future] = []
+        with self._lock:
+            subscribers = list(self._subscribers)
+            if status in TERMINAL_STATUSES:
+                self._finished[run_id] = status
+                self._finished.move_to_end(run_id)
+                while len(self._finished) > self._max_remembered:
+                    self._finished.popitem(last=False)
+                waiters = self._waiters.pop(run_id, [])
+            else:
+                # A resumed run is no longer finished
+                self._finished.pop(run_id, None)
+
+        for future in waiters:
+            if not future.done():
+                future.set_result(status)
+
+        for callback in subscribers:
+            try:
+                callback(run_id, status)
+            except Exception as e:
+                log.error("Subscriber error for run %s: %s", run_id, e)
+
+class WebhookNotifier:
+    """
+    Minimal webhook channel: POSTs {"run_id", "status"} as JSON on each transition.
+    Subscribe an instance to a RunEventBus. Delivery is best-effort and happens on a
+    background thread, so a slow endpoint never holds up the worker that published;
+    when more than max_pending notifications are queued, new ones are dropped.
+    """
+    def __init__(self, url: str, timeout: float = 2.0, statuses: Optional[set] = None, max_pending: int = 1000):
+        self.url = url
+        self.timeout = timeout
+        # Only notify on these statuses (defaults to terminal ones)
+        self.statuses = statuses if statuses is not None else TERMINAL_STATUSES
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=max_pending)
+        self._sender: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def __call__(self, run_id: str, status: str):
+        if status not in self.statuses:
+            return
+        with self._lock:
+            if self._sender is None:
+                self._sender = threading.Thread(target=self._deliver_loop, name="cortex-webhook", daemon=True)
+                self._sender.start()
+        try:
+            self._queue.put_nowait((run_id, status))
+        except queue.Full:
+            self.dropped += 1
+            log.warning("Webhook queue full, dropping notification for run %s", run_id)
+
+    def _deliver_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            self._deliver(*item)
+
+    def _deliver(self, run_id: str, status: str):
+        # Imported lazily: urllib.request pulls in http.client/ssl, which most runtimes never need
+        import urllib.request
+        body = json.dumps({"run_id": run_id, "status": status}).encode("utf-8")
+        request = urllib.request.Request(
+            self.url, data=body, headers={"Content-Type": "application/json"}, method="POST"
+        )
+        try:
+            urllib.request.urlopen(request, timeout=self.timeout).close()
+        except Exception as e:
+            log.warning("Webhook delivery failed for run %s: %s", run_id, e)
+
+    def close(self, timeout: Optional[float] = None):
+        """Deliver what is already queued, then stop the sender (waits up to timeout seconds)"""
+        with self._lock:
+            sender, self._sender = self._sender, None
+        if sender is None:
+            return
+        self._queue.put(None)
+        sender.join(timeout)
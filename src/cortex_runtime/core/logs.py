@@ -0,0 +1,166 @@
+from typing import Dict, Optional
+from contextlib import contextmanager
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+
+# Correlation IDs, set by the engine for the duration of a run / step
+_run_id: contextvars.ContextVar = contextvars.ContextVar("cortex_run_id", default=None)
+_step: contextvars.ContextVar = contextvars.ContextVar("cortex_step", default=None)
+
+ROOT = "cortex"
+_lock = threading.Lock()
+_listener: Optional[logging.handlers.QueueListener] = None
+
+@contextmanager
+def bind(run_id: Optional[str] = None, step: Optional[str] = None):
+    """Attach run/step correlation IDs to every log record emitted inside the block"""
+    tokens = []
+    if run_id is not None:
+        tokens.append((_run_id, _run_id.set(run_id)))
+    if step is not None:
+        tokens.append((_step, _step.set(step)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+class CorrelationFilter(logging.Filter):
+    """Stamps records with component and correlation IDs in the emitting thread"""
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.component = record.name[len(ROOT) + 1:] if record.name.startswith(ROOT + ".") else record.name
+        record.run_id = getattr(record, "run_id", None) or _run_id.get()
+        record.step = getattr(record, "step", None) or _step.get()
+        return True
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps only a fraction of high-volume records (logged with extra={"sampled": True}).
+    Warnings and errors always pass.
+    """
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not getattr(record, "sampled", False):
+            return True
+        return random.random() < self.rate
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "component": getattr(record, "component", record.name),
+            "msg": record.getMessage(),
+        }
+        for key in ("run_id", "step"):
+            value = getattr(record, key, None)
+            if value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        run = f" run={record.run_id}" if getattr(record, "run_id", None) else ""
+        step = f" step={record.step}" if getattr(record, "step", None) else ""
+        line = f"{self.formatTime(record, '%H:%M:%S')} {record.levelname:<7} [{getattr(record, 'component', record.name)}]{run}{step} {record.getMessage()}"
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+class _StdoutHandler(logging.StreamHandler):
+    """Writes to whatever sys.stdout currently is (survives stream swaps by test runners)"""
+    def emit(self, record: logging.LogRecord):
+        self.stream = sys.stdout
+        super().emit(record)
+
+def _parse_levels(spec: str) -> Dict[str, str]:
+    levels = {}
+    for item in spec.split(","):
+        if "=" in item:
+            component, level = item.split("=", 1)
+            levels[component.strip()] = level.strip().upper()
+    return levels
+
+def configure(level: Optional[str] = None, fmt: Optional[str] = None, production: Optional[bool] = None,
+              component_levels: Optional[Dict[str, str]] = None, sample_rate: Optional[float] = None,
+              force: bool = False):
+    """
+    Set up the non-blocking logging pipeline. Callers log into a queue; a single
+    background listener formats and writes. Defaults come from the environment:
+      CR_LOG_LEVEL (INFO), CR_LOG_LEVELS ("db=WARNING,runtime=DEBUG"),
+      CR_LOG_FORMAT (text | json), CR_ENV=production (json + sampling),
+      CR_LOG_SAMPLE_RATE (0.01 in production).
+    """
+    global _listener
+    with _lock:
+        if _listener is not None and not force:
+            return
+        if _listener is not None:
+            _listener.stop()
+
+        if production is None:
+            production = os.getenv('CR_ENV', '').lower() == 'production'
+        fmt = fmt or os.getenv('CR_LOG_FORMAT', 'json' if production else 'text')
+        level = level or os.getenv('CR_LOG_LEVEL', 'INFO')
+        if component_levels is None:
+            component_levels = _parse_levels(os.getenv('CR_LOG_LEVELS', ''))
+        if sample_rate is None:
+            sample_rate = float(os.getenv('CR_LOG_SAMPLE_RATE', 0.01 if production else 1.0))
+
+        output = _StdoutHandler()
+        output.setFormatter(JsonFormatter() if fmt == 'json' else TextFormatter())
+
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        # Filters run in the caller's thread so context vars are still visible
+        queue_handler.addFilter(CorrelationFilter())
+        if sample_rate < 1.0:
+            queue_handler.addFilter(SamplingFilter(sample_rate))
+
+        root = logging.getLogger(ROOT)
+        root.handlers = [queue_handler]
+        root.setLevel(level.upper())
+        root.propagate = False
+        for component, component_level in component_levels.items():
+            logging.getLogger(f"{ROOT}.{component}").setLevel(component_level)
+
+        _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+        _listener.start()
+
+def shutdown():
+    """Flush queued records and stop the background writer"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+def _reinit_after_fork():
+    # The writer thread does not survive fork; give the child its own pipeline
+    global _listener, _lock
+    _lock = threading.Lock()
+    if _listener is not None:
+        _listener = None
+        configure()
+
+atexit.register(shutdown)
+os.register_at_fork(after_in_child=_reinit_after_fork)
+
+def get_logger(component: str) -> logging.Logger:
+    """Logger for a runtime component (e.g. "runtime", "db"), configuring the pipeline on first use"""
+    if _listener is None:
+        configure()
+    return logging.getLogger(f"{ROOT}.{component}")
@@ -0,0 +1,219 @@
+from typing import Callable, Dict, List, Optional, Set
+from collections import Counter
+from contextlib import nullcontext
+from pathlib import Path
+import cProfile
+import json
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+
+_NULL_SECTION = nullcontext()
+_local = threading.local()
+
+class _Section:
+    __slots__ = ("profile", "name", "start")
+
+    def __init__(self, profile: "RunProfile", name: str):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.profile.add_section(self.name, time.perf_counter() - self.start)
+
+class RunProfile:
+    """
+    Profile of a single run. Collects per-section wall time plus either cProfile stats
+    ("cprofile") or sampled stacks ("sample") for the worker thread and any call threads
+    the run hands work to.
+    """
+    def __init__(self, run_id: str, agent_name: str, output_dir: Path, mode: str = "cprofile", interval: float = 0.005):
+        self.run_id = run_id
+        self.agent_name = agent_name
+        self.output_dir = output_dir
+        self.mode = mode
+        self.interval = interval
+        self.sections: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        self._profiles: List[cProfile.Profile] = []
+        self._threads: Set[int] = set()
+        self._stacks: Counter = Counter()
+        self._sampler: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def add_section(self, name: str, seconds: float):
+        with self._lock:
+            totals = self.sections.setdefault(name, [0, 0.0])
+            totals[0] += 1
+            totals[1] += seconds
+
+    def _attach(self):
+        """Start collecting for the calling thread. Returns a token for _detach."""
+        if self.mode == "cprofile":
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Python 3.12+ allows only one active cProfile per process; skip this thread
+                return None
+            return profile
+        with self._lock:
+            self._threads.add(threading.get_ident())
+        return None
+
+    def _detach(self, token):
+        if self.mode == "cprofile":
+            if token is None:
+                return
+            token.disable()
+            with self._lock:
+                self._profiles.append(token)
+        else:
+            with self._lock:
+                self._threads.discard(threading.get_ident())
+
+    def wrap(self, fn: Callable) -> Callable:
+        """Profile fn in whichever thread ends up running it (e.g. the call executor)"""
+        def profiled(*args, **kwargs):
+            token = self._attach()
+            previous = getattr(_local, "profile", None)
+            _local.profile = self
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _local.profile = previous
+                self._detach(token)
+        return profiled
+
+    def _sample(self):
+        while not self._stopped.wait(self.interval):
+            with self._lock:
+                threads = set(self._threads)
+            frames = sys._current_frames()
+            for ident in threads:
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if stack:
+                    self._stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._token = self._attach()
+        _local.profile = self
+        if self.mode == "sample":
+            self._sampler = threading.Thread(target=self._sample, name=f"profiler-{self.run_id}", daemon=True)
+            self._sampler.start()
+
+    def stop(self) -> List[str]:
+        """Stop collecting and dump the profile. Returns the files written."""
+        _local.profile = None
+        self._detach(self._token)
+        self._stopped.set()
+        if self._sampler:
+            self._sampler.join()
+        return self.dump()
+
+    def dump(self) -> List[str]:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        base = f"{self.agent_name}-{self.run_id}"
+        written = []
+
+        sections_path = self.output_dir / f"{base}.sections.json"
+        sections_path.write_text(json.dumps({
+            name: {"count": count, "total_ms": seconds * 1000}
+            for name, (count, seconds) in sorted(self.sections.items())
+        }, indent=2))
+        written.append(str(sections_path))
+
+        if self.mode == "cprofile" and self._profiles:
+            stats = pstats.Stats(*self._profiles)
+            stats_path = self.output_dir / f"{base}.pstats"
+            stats.dump_stats(stats_path)
+            written.append(str(stats_path))
+        elif self.mode == "sample":
+            # Collapsed-stack format, ready for flamegraph.pl / speedscope
+            folded_path = self.output_dir / f"{base}.folded"
+            folded_path.write_text("".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common()))
+            written.append(str(folded_path))
+        return written
+
+class Profiler:
+    """
+    On-demand profiling switch for the engine. Profiling can be enabled per agent,
+    per run id or for a random sample of runs, and toggled at runtime.
+    When nothing is enabled the per-run check is a few attribute reads and
+    section() returns a shared no-op context manager.
+    """
+    def __init__(self, output_dir: str = "profiles", sample_rate: float = 0.0, mode: str = "cprofile",
+                 interval: float = 0.005):
+        if mode not in ("cprofile", "sample"):
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        self.output_dir = Path(output_dir)
+        self.sample_rate = sample_rate
+        self.mode = mode
+        self.interval = interval
+        self.agents: Set[str] = set()
+        self.runs: Set[str] = set()
+
+    @classmethod
+    def from_env(cls) -> "Profiler":
+        profiler = cls(
+            output_dir=os.getenv('CR_PROFILE_DIR', 'profiles'),
+            sample_rate=float(os.getenv('CR_PROFILE_SAMPLE_RATE', 0)),
+            mode=os.getenv('CR_PROFILE_MODE', 'cprofile')
+        )
+        agents = os.getenv('CR_PROFILE_AGENTS')
+        if agents:
+            profiler.agents.update(a.strip() for a in agents.split(",") if a.strip())
+        return profiler
+
+    def enable_agent(self, agent_name: str):
+        self.agents.add(agent_name)
+
+    def disable_agent(self, agent_name: str):
+        self.agents.discard(agent_name)
+
+    def enable_run(self, run_id: str):
+        self.runs.add(run_id)
+
+    def disable_run(self, run_id: str):
+        self.runs.discard(run_id)
+
+    def set_sample_rate(self, rate: float):
+        self.sample_rate = rate
+
+    def should_profile(self, run_id: str, agent_name: str) -> bool:
+        if not (self.agents or self.runs or self.sample_rate):
+            return False
+        return (agent_name in self.agents or run_id in self.runs
+                or (self.sample_rate > 0 and random.random() < self.sample_rate))
+
+    def start(self, run_id: str, agent_name: str) -> Optional[RunProfile]:
+        """Start profiling the run in the calling thread if it is selected, else None"""
+        if not self.should_profile(run_id, agent_name):
+            return None
+        profile = RunProfile(run_id, agent_name, self.output_dir, self.mode, self.interval)
+        profile.start()
+        return profile
+
+    @staticmethod
+    def current() -> Optional[RunProfile]:
+        """Profile active in the calling thread, if any"""
+        return getattr(_local, "profile", None)
+
+    @staticmethod
+    def section(name: str):
+        """Time a block under name when the current thread is being profiled"""
+        profile = getattr(_local, "profile", None)
+        if profile is None:
+            return _NULL_SECTION
+        return _Section(profile, name)
@@ -0,0 +1,56 @@
+from typing import Any, Optional
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+from cortex_runtime.core.logs import get_logger
+
+log = get_logger("readiness")
+
+class ReadinessServer:
+    """
+    Minimal HTTP probe endpoint for orchestrators (e.g. Kubernetes):
+    GET /ready returns 200 once the engine finished warm_up() and 503 before,
+    GET /live returns 200 while the process serves requests.
+    """
+    def __init__(self, engine: Any, port: int, host: str = "0.0.0.0"):
+        self.engine = engine
+        self.port = port
+        self.host = host
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def _handler(self):
+        engine = self.engine
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") == "/ready":
+                    ready = engine.ready.is_set()
+                    status, body = (200 if ready else 503), {"ready": ready, "warmup": engine.warmup_report}
+                elif self.path.rstrip("/") == "/live":
+                    status, body = 200, {"live": True}
+                else:
+                    status, body = 404, {"error": "not found"}
+                payload = json.dumps(body, default=str).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                log.debug("readiness %s", format % args)
+
+        return Handler
+
+    def start(self) -> "ReadinessServer":
+        self._server = ThreadingHTTPServer((self.host, self.port), self._handler())
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name="cortex-readiness", daemon=True).start()
+        log.info("Readiness endpoint on :%d (/ready, /live)", self.port)
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,121 @@
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+import argparse
+import os
+import threading
+from cortex_runtime.core.logs import get_logger
+from cortex_runtime.core.resilience import CircuitOpen
+from cortex_runtime.db.state import StateManager
+
+log = get_logger("recovery")
+
+class RecoveryManager:
+    """
+    Bulk recovery after an incident: select FAILED (or CANCELLED, or stalled RUNNING)
+    runs by agent, time window and error class, and requeue them to PENDING with
+    their logged steps intact, so each resumes from its checkpoint.
+
+    Requeueing happens in waves of wave_size runs, wave_interval seconds apart, and
+    a wave waits while more than max_pending runs are already queued, so the
+    recovered backlog doesn't hit the providers all at once.
+    """
+    def __init__(self, state_manager: StateManager, wave_size: Optional[int] = None,
+                 wave_interval: Optional[float] = None, max_pending: Optional[int] = None):
+        self.state_manager = state_manager
+        self.wave_size = wave_size or int(os.getenv('CR_RECOVERY_WAVE_SIZE', 500))
+        self.wave_interval = wave_interval if wave_interval is not None else float(os.getenv('CR_RECOVERY_WAVE_INTERVAL', 30))
+        self.max_pending = max_pending if max_pending is not None else int(os.getenv('CR_RECOVERY_MAX_PENDING', 0)) or None
+        self._stop = threading.Event()
+
+    def stop(self):
+        """Stop before the next wave (already requeued runs stay queued)"""
+        self._stop.set()
+
+    def select(self, statuses: Optional[List[str]] = None, stalled_for: Optional[float] = None,
+               agent_name: Optional[str] = None, since: Optional[datetime] = None, until: Optional[datetime] = None,
+               error_class: Optional[str] = None, limit: int = 100000) -> List[str]:
+        """Run ids matching the filters; stalled_for (seconds) adds RUNNING runs idle that long"""
+        return self.state_manager.recoverable_run_ids(
+            statuses=list(statuses) if statuses is not None else ['FAILED'],
+            stalled_for=stalled_for,
+            agent_name=agent_name, since=since, until=until, error_class=error_class, limit=limit
+        )
+
+    def _wait_for_capacity(self, agent_name: Optional[str]):
+        if not self.max_pending:
+            return
+        while not self._stop.is_set():
+            pending = self.state_manager.count_runs(['PENDING'], agent_name=agent_name)
+            if pending < self.max_pending:
+                return
+            log.info("Recovery waiting: %d runs already pending (max %d)", pending, self.max_pending)
+            self._stop.wait(self.wave_interval or 1)
+
+    def recover(self, statuses: Optional[List[str]] = None, stalled_for: Optional[float] = None,
+                agent_name: Optional[str] = None, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                error_class: Optional[str] = None, limit: int = 100000, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Select and requeue matching runs in throttled waves, stopping early if the state
+        store's writes fail fast. Returns {"selected", "requeued", "waves", "run_ids"};
+        dry_run only selects.
+        """
+        statuses = list(statuses) if statuses is not None else ['FAILED']
+        run_ids = self.select(statuses, stalled_for, agent_name, since, until, error_class, limit)
+        summary = {"selected": len(run_ids), "requeued": 0, "waves": 0, "run_ids": run_ids}
+        log.info("Recovery selected %d runs%s", len(run_ids), " (dry run)" if dry_run else "")
+        if dry_run:
+            return summary
+
+        for start in range(0, len(run_ids), self.wave_size):
+            if start and self._stop.wait(self.wave_interval):
+                break
+            self._wait_for_capacity(agent_name)
+            if self._stop.is_set():
+                break
+            wave = run_ids[start:start + self.wave_size]
+            try:
+                requeued = self.state_manager.requeue_runs(wave, statuses, stalled_for=stalled_for)
+            except CircuitOpen as e:
+                # Writes are failing fast; the remaining runs stay selectable for a later pass
+                log.error("Recovery stopped after %d waves: %s", summary["waves"], e)
+                break
+            summary["requeued"] += requeued
+            summary["waves"] += 1
+            log.info("Recovery wave %d: requeued %d/%d runs", summary["waves"], requeued, len(wave))
+        return summary
+
+def _timestamp(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(
+        prog="python -m cortex_runtime.core.recovery",
+        description="Requeue failed or stalled agent runs so they resume from their last logged step."
+    )
+    parser.add_argument("--status", action="append", dest="statuses", metavar="STATUS",
+                        help="Run status to recover (repeatable, default FAILED)")
+    parser.add_argument("--stalled", type=float, metavar="SECONDS",
+                        help="Also recover RUNNING runs with no activity for this long")
+    parser.add_argument("--agent", dest="agent_name", help="Only runs of this agent")
+    parser.add_argument("--since", type=_timestamp, help="Last updated at or after (ISO timestamp, warehouse session timezone)")
+    parser.add_argument("--until", type=_timestamp, help="Last updated before (ISO timestamp, warehouse session timezone)")
+    parser.add_argument("--error-class", help="Only runs that failed with this error class, e.g. DeadlineExceeded")
+    parser.add_argument("--limit", type=int, default=100000)
+    parser.add_argument("--wave-size", type=int)
+    parser.add_argument("--wave-interval", type=float, metavar="SECONDS")
+    parser.add_argument("--max-pending", type=int, help="Hold waves while more runs than this are pending")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be requeued")
+    args = parser.parse_args(argv)
+
+    from cortex_runtime.db.client import DBClient
+    manager = RecoveryManager(StateManager(DBClient().connect()), wave_size=args.wave_size,
+                              wave_interval=args.wave_interval, max_pending=args.max_pending)
+    summary = manager.recover(
+        statuses=args.statuses, stalled_for=args.stalled, agent_name=args.agent_name, since=args.since,
+        until=args.until, error_class=args.error_class, limit=args.limit, dry_run=args.dry_run
+    )
+    print(f"Selected {summary['selected']} runs, requeued {summary['requeued']} in {summary['waves']} waves.")
+    return summary
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+from typing import Any, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+import os
+from cortex_runtime.core.adapter import LLMProvider
+from cortex_runtime.core.conditions import evaluate
+from cortex_runtime.core.context import ContextAssembler
+from cortex_runtime.core.engine import initial_context
+from cortex_runtime.db.blobs import BlobStore, LocalBlobStore, from_log, resolve
+from cortex_runtime.db.state import StateManager
+from cortex_runtime.models.agent import AgentConfig
+from cortex_runtime.tools.registry import ToolRegistry
+
+class ReplayEngine:
+    """
+    Offline, deterministic replay of recorded runs from AGENT_STEPS.
+
+    INSTRUCTION steps reuse their recorded LLM output instead of calling a provider.
+    TOOL_USE steps reuse recorded output too, or re-execute against the registry
+    when execute_tools=True. Passing a changed agent_config replays history against
+    the new definition; steps with no recording (new steps) go to the optional
+    fallback provider, or are reported as missing. Step guards (when / stop_if) are
+    re-evaluated against the replayed context; skipped steps report source "skipped".
+    Offloaded outputs are read from blob_store (CR_BLOB_DIR by default), so guards,
+    prompts and diffs see the full text. Nothing is written back to the state store.
+    """
+    def __init__(self, state_manager: StateManager, tool_registry: Optional[ToolRegistry] = None,
+                 provider: Optional[LLMProvider] = None, max_workers: Optional[int] = None,
+                 blob_store: Optional[BlobStore] = None, context_assembler: Optional[ContextAssembler] = None):
+        self.state_manager = state_manager
+        self.tool_registry = tool_registry or ToolRegistry()
+        self.provider = provider
+        self.max_workers = max_workers or int(os.getenv('CR_REPLAY_WORKERS', 16))
+        blob_dir = os.getenv('CR_BLOB_DIR')
+        if blob_store is None and blob_dir:
+            blob_store = LocalBlobStore(blob_dir)
+        self.blob_store = blob_store
+        # Same prompt assembly as the engine, for steps generated live
+        self.context_assembler = context_assembler or ContextAssembler(
+            default_budget=int(os.getenv('CR_CONTEXT_TOKEN_BUDGET', 4000)) or None
+        )
+
+    def _load_config(self, run_row: Dict) -> Optional[AgentConfig]:
+        if 'mock_config' in run_row:
+            return run_row['mock_config']
+        definition = self.state_manager.fetch_agent_definition(run_row['agent_name'])
+        return AgentConfig.from_definition(definition) if definition else None
+
+    def _replay_step(self, step, context: Dict[str, Any], recorded: Optional[Dict], config: AgentConfig,
+                     prior_steps: List[str], execute_tools: bool):
+        """Returns (output, source)"""
+        if step.type == "TOOL_USE" and execute_tools:
+            try:
+                return str(self.tool_registry.execute(step.tool_name, context)), "tool"
+            except Exception as e:
+                return f"Error executing tool {step.tool_name}: {e}", "tool"
+        if recorded is not None:
+            return from_log(self.blob_store, recorded.get('output')), "recorded"
+        if step.type == "INSTRUCTION" and self.provider is not None:
+            prompt = self.context_assembler.assemble(step, context, prior_steps, budget=config.context_token_budget).prompt
+            return self.provider.generate(prompt=prompt, model=config.model, config={}).text, "provider"
+        return None, "missing"
+
+    def replay_run(self, run_id: str, agent_config: Optional[AgentConfig] = None, execute_tools: bool = False,
+                   run_row: Optional[Dict] = None, recorded_steps: Optional[List[Dict]] = None) -> Dict[str, Any]:
+        """Rebuild one run from its recorded steps and diff each step's output against the recording"""
+        run_row = run_row or self.state_manager.fetch_run(run_id)
+        if run_row is None:
+            return {"run_id": run_id, "error": "run not found", "diverged": True, "steps": []}
+        if recorded_steps is None:
+            recorded_steps = self.state_manager.fetch_steps([run_id])[run_id]
+
+        config = agent_config or self._load_config(run_row)
+        if config is None:
+            return {"run_id": run_id, "error": "no agent definition", "diverged": True, "steps": []}
+
+        recorded_by_name = {s['step_name']: s for s in recorded_steps if s.get('status') in ('SUCCESS', 'SKIPPED')}
+        context = initial_context(run_row.get('input', {}))
+        steps = []
+        for i, step in enumerate(config.steps):
+            recorded = recorded_by_name.get(step.name)
+            recorded_skipped = recorded is not None and recorded.get('status') == 'SKIPPED'
+            if step.when and not evaluate(step.when, context):
+                # Guards are re-evaluated, so a changed guard or upstream output shows up as a diff
+                output, source, changed = None, "skipped", not recorded_skipped
+            else:
+                if recorded_skipped:
+                    recorded = None
+                output, source = self._replay_step(step, context, recorded, config,
+                                                   [s.name for s in config.steps[:i]], execute_tools)
+            # Compare materialized text, not blob handles
+            recorded_output = resolve(from_log(self.blob_store, recorded.get('output'))) if recorded else None
+            if source != "skipped":
+                changed = recorded is None or resolve(output) != recorded_output
+            steps.append({
+                "step_index": i,
+                "step_name": step.name,
+                "source": source,
+                "recorded": recorded_output,
+                "replayed": resolve(output),
+                "changed": changed
+            })
+            context[step.name] = output
+            if step.stop_if and source != "skipped" and evaluate(step.stop_if, context):
+                break
+
+        return {
+            "run_id": run_id,
+            "agent_name": run_row.get('agent_name'),
+            "diverged": any(s["changed"] for s in steps),
+            "steps": steps
+        }
+
+    def replay_many(self, run_ids: List[str], agent_config: Optional[AgentConfig] = None,
+                    execute_tools: bool = False) -> List[Dict[str, Any]]:
+        """Replay many runs in parallel. Runs and steps are fetched in bulk up front."""
+        runs = self.state_manager.fetch_runs(run_ids)
+        recorded = self.state_manager.fetch_steps(run_ids)
+
+        def replay(run_id: str) -> Dict[str, Any]:
+            return self.replay_run(run_id, agent_config, execute_tools,
+                                   run_row=runs.get(run_id), recorded_steps=recorded.get(run_id, []))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(replay, run_ids))
+
+    @staticmethod
+    def summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Aggregate diff of a replay batch: diverged runs and changed outputs per step"""
+        changed_by_step: Dict[str, int] = {}
+        for result in results:
+            for step in result["steps"]:
+                if step["changed"]:
+                    changed_by_step[step["step_name"]] = changed_by_step.get(step["step_name"], 0) + 1
+        diverged = [r["run_id"] for r in results if r["diverged"]]
+        return {
+            "runs": len(results),
+            "diverged": len(diverged),
+            "diverged_run_ids": diverged,
+            "changed_by_step": changed_by_step
+        }
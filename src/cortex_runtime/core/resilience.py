@@ -0,0 +1,265 @@
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+import os
+import threading
+import time
+from cortex_runtime.core.logs import get_logger
+
+log = get_logger("resilience")
+
+CLOSED = "CLOSED"
+OPEN = "OPEN"
+HALF_OPEN = "HALF_OPEN"
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a dependency whose breaker is open"""
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit {name} is open (retry in {retry_after:.1f}s)")
+        self.name = name
+        self.retry_after = retry_after
+
+class BulkheadFull(Exception):
+    """Raised when a dependency already has its maximum number of calls in flight"""
+    def __init__(self, name: str, limit: int):
+        super().__init__(f"Bulkhead {name} is full ({limit} calls in flight)")
+        self.name = name
+        self.limit = limit
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker. After failure_threshold failures in a row the
+    circuit opens and calls fail fast; after reset_timeout it lets up to half_open_calls
+    probe calls through. A successful probe closes it, a failed one re-opens it.
+
+    Usable as a context manager around a call (raises CircuitOpen on entry, records
+    the outcome on exit), or via allow() / record_success() / record_failure().
+    """
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0, half_open_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probes = 0
+
+    def allow(self) -> bool:
+        """Whether a call may proceed now. In HALF_OPEN this takes one of the probe slots."""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes < self.half_open_calls:
+                self._probes += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def healthy(self) -> bool:
+        """Closed with no failures since the last success"""
+        with self._lock:
+            return self._state == CLOSED and self._failures == 0
+
+    def retry_after(self) -> float:
+        with self._lock:
+            return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                log.info("Circuit %s closed", self.name)
+            self._state = CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or (self._state == CLOSED and self._failures >= self.failure_threshold):
+                log.warning("Circuit %s opened after %d consecutive failures", self.name, self._failures)
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    def release(self):
+        """Give back a probe slot for a call that ended without a verdict (e.g. cancelled)"""
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def __enter__(self):
+        if not self.allow():
+            raise CircuitOpen(self.name, self.retry_after())
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.record_success()
+        else:
+            self.record_failure()
+        return False
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            self._maybe_half_open()
+            return {"state": self._state, "consecutive_failures": self._failures, "rejected": self.rejected}
+
+class Bulkhead:
+    """
+    Caps concurrent calls into one dependency so it cannot take every call thread.
+    acquire() waits up to max_wait for a slot, and keeps waiting for as long as
+    wait_while() holds (the engine passes the breaker's health check, so a slow but
+    healthy dependency queues callers and only a degraded one rejects them).
+    """
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, name: str, limit: int, max_wait: float = 0.0):
+        self.name = name
+        self.limit = limit
+        self.max_wait = max_wait
+        self._semaphore = threading.BoundedSemaphore(limit)
+        self._in_use = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, wait_while: Optional[Callable[[], bool]] = None):
+        deadline = time.monotonic() + self.max_wait
+        acquired = self._semaphore.acquire(blocking=False)
+        while not acquired and (time.monotonic() < deadline or (wait_while is not None and wait_while())):
+            acquired = self._semaphore.acquire(timeout=self.POLL_INTERVAL)
+        if not acquired:
+            with self._lock:
+                self.rejected += 1
+            raise BulkheadFull(self.name, self.limit)
+        with self._lock:
+            self._in_use += 1
+
+    def release(self):
+        with self._lock:
+            self._in_use -= 1
+        self._semaphore.release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"limit": self.limit, "in_use": self._in_use, "rejected": self.rejected}
+
+class _Guard:
+    """One guarded call: holds the breaker verdict and a bulkhead permit (see Resilience.guard)"""
+    def __init__(self, breaker: CircuitBreaker, bulkhead: Bulkhead, neutral: Tuple[Type[BaseException], ...]):
+        self.breaker = breaker
+        self.bulkhead = bulkhead
+        self.neutral = neutral
+        self._started = False
+        self._released = False
+        self._lock = threading.Lock()
+
+    def _release_permit(self):
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self.bulkhead.release()
+
+    def wrap(self, fn: Callable) -> Callable:
+        """
+        fn with the permit released when it returns, in whichever thread runs it.
+        A call abandoned on timeout keeps its slot until it actually finishes.
+        """
+        def guarded(*args, **kwargs):
+            self._started = True
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._release_permit()
+        return guarded
+
+    def __enter__(self):
+        if not self.breaker.allow():
+            raise CircuitOpen(self.breaker.name, self.breaker.retry_after())
+        try:
+            self.bulkhead.acquire(wait_while=self.breaker.healthy)
+        except BulkheadFull:
+            self.breaker.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self._started:
+            self._release_permit()
+        if exc_type is None:
+            self.breaker.record_success()
+        elif issubclass(exc_type, self.neutral):
+            self.breaker.release()
+        else:
+            self.breaker.record_failure()
+        return False
+
+class Resilience:
+    """
+    Breakers and bulkheads per dependency, created on first use. Keys name the
+    dependency: "model:<name>", "tool:<name>", "db:<operation class>".
+    """
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 bulkhead_size: int = 10, bulkhead_wait: float = 0.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.bulkhead_size = bulkhead_size
+        self.bulkhead_wait = bulkhead_wait
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._bulkheads: Dict[str, Bulkhead] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, bulkhead_size: int = 10) -> "Resilience":
+        return cls(
+            failure_threshold=int(os.getenv('CR_BREAKER_FAILURES', 5)),
+            reset_timeout=float(os.getenv('CR_BREAKER_RESET', 30)),
+            bulkhead_size=int(os.getenv('CR_BULKHEAD_SIZE', bulkhead_size)),
+            bulkhead_wait=float(os.getenv('CR_BULKHEAD_WAIT', 0))
+        )
+
+    def breaker(self, key: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = CircuitBreaker(key, self.failure_threshold, self.reset_timeout)
+                self._breakers[key] = breaker
+            return breaker
+
+    def bulkhead(self, key: str) -> Bulkhead:
+        with self._lock:
+            bulkhead = self._bulkheads.get(key)
+            if bulkhead is None:
+                bulkhead = Bulkhead(key, self.bulkhead_size, self.bulkhead_wait)
+                self._bulkheads[key] = bulkhead
+            return bulkhead
+
+    def guard(self, key: str, neutral: Tuple[Type[BaseException], ...] = ()) -> _Guard:
+        """
+        Context manager for one call into a dependency. Fails fast with CircuitOpen, or
+        with BulkheadFull once the bulkhead is full and the breaker has seen failures
+        (while the dependency is healthy, callers queue for a slot); otherwise records the outcome on the breaker (exceptions in
+        neutral, e.g. cancellation, count as neither success nor failure).
+        Run the call through guard.wrap(fn) so the bulkhead slot follows the call.
+        """
+        return _Guard(self.breaker(key), self.bulkhead(key), neutral)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            breakers = dict(self._breakers)
+            bulkheads = dict(self._bulkheads)
+        return {
+            "breakers": {key: b.snapshot() for key, b in breakers.items()},
+            "bulkheads": {key: b.snapshot() for key, b in bulkheads.items()}
+        }
@@ -0,0 +1,104 @@
+from typing import Dict, Any, Optional, Protocol, runtime_checkable
+from pathlib import Path
+import hashlib
+import mmap
+import os
+import tempfile
+
+@runtime_checkable
+class BlobStore(Protocol):
+    """
+    Protocol for storing large step outputs outside the run context.
+    Handles are opaque strings; the same content always maps to the same handle.
+    """
+    def put(self, data: str) -> str:
+        ...
+
+    def get(self, handle: str) -> str:
+        ...
+
+class LocalBlobStore:
+    """
+    Content-addressed blob store on the local filesystem.
+    Blobs are written once (keyed by sha256) and read back through mmap.
+    """
+    def __init__(self, root_dir: str):
+        self.root = Path(root_dir)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, handle: str) -> Path:
+        # Fan out into subdirectories to keep directory listings small
+        return self.root / handle[:2] / handle
+
+    def put(self, data: str) -> str:
+        raw = data.encode("utf-8")
+        handle = hashlib.sha256(raw).hexdigest()
+        path = self._path(handle)
+        if path.exists():
+            return handle
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temp file and rename so concurrent readers never see partial blobs
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent)
+        with os.fdopen(fd, "wb") as f:
+            f.write(raw)
+        os.replace(tmp_path, path)
+        return handle
+
+    def get(self, handle: str) -> str:
+        path = self._path(handle)
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return ""
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                return m[:].decode("utf-8")
+
+class BlobRef:
+    """
+    Lazy reference to an offloaded output.
+    Lives in the run context in place of the full string and is only
+    materialized when a later step actually reads it.
+    """
+    __slots__ = ("store", "handle", "size")
+
+    def __init__(self, store: BlobStore, handle: str, size: int):
+        self.store = store
+        self.handle = handle
+        self.size = size
+
+    def read(self) -> str:
+        return self.store.get(self.handle)
+
+    def to_log(self) -> Dict[str, Any]:
+        """Representation written to AGENT_STEPS instead of the full output"""
+        return {"blob_ref": self.handle, "size": self.size}
+
+    def __str__(self) -> str:
+        return self.read()
+
+    def __repr__(self) -> str:
+        return f"BlobRef({self.handle[:12]}, size={self.size})"
+
+def resolve(value: Any) -> Any:
+    """Materialize a BlobRef, pass anything else through unchanged"""
+    if isinstance(value, BlobRef):
+        return value.read()
+    return value
+
+def from_log(store: Optional[BlobStore], value: Any) -> Any:
+    """Turn a logged {"blob_ref": ...} output back into a BlobRef (needs the store that holds it)"""
+    if store is not None and isinstance(value, dict) and 'blob_ref' in value:
+        return BlobRef(store, value['blob_ref'], value.get('size', 0))
+    return value
+
+def offload(store: Optional[BlobStore], value: Any, threshold: int) -> Any:
+    """Replace string outputs larger than threshold bytes with a BlobRef"""
+    if store is None or not isinstance(value, str):
+        return value
+    # Cheap reject before encoding: a char is at most 4 UTF-8 bytes
+    if len(value) * 4 <= threshold:
+        return value
+    size = len(value.encode("utf-8"))
+    if size <= threshold:
+        return value
+    return BlobRef(store, store.put(value), size)
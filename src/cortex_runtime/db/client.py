@@ -1,5 +1,7 @@
-from snowflake.snowpark import Session
 import os
+from cortex_runtime.core.logs import get_logger
+
+log = get_logger("db")
 
 class DBClient:
     def __init__(self, connection_params=None):
@@ -9,6 +11,9 @@ class DBClient:
     def connect(self):
         if self.session:
             return self.session
+        
+        # Snowpark takes ~1s to import, so only pay for it when a connection is actually made
+        from snowflake.snowpark import Session
             
         # If no params provided, try to create from environment or default config
         if not self._connection_params:
@@ -17,7 +22,7 @@ class DBClient:
             try:
                 self.session = Session.builder.configs(os.environ).create()
             except Exception as e:
-                print(f"Warning: Could not connect to Snowflake: {e}")
+                log.warning("Could not connect to Snowflake: %s", e)
                 self.session = None # Proceed in mock mode if needed
         else:
              self.session = Session.builder.configs(self._connection_params).create()
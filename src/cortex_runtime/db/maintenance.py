@@ -0,0 +1,105 @@
+from typing import Any, Dict, List, Optional
+import os
+import signal
+import threading
+from cortex_runtime.core.logs import get_logger
+from cortex_runtime.db.state import StateManager
+
+log = get_logger("maintenance")
+
+# Clustering keys: claims filter AGENT_RUNS on status/created_at, everything else
+# looks steps up by run_id. Mirrors schemas/01_maintenance.sql.
+CLUSTERING = {
+    "agent_runs": ("status", "created_at"),
+    "agent_steps": ("run_id",),
+    "agent_runs_archive": ("created_at",),
+    "agent_steps_archive": ("run_id",),
+}
+
+class Maintenance:
+    """
+    Keeps AGENT_RUNS / AGENT_STEPS small and hot. Finished runs older than the
+    retention window are moved out in batches, either to the *_ARCHIVE tables
+    ("table") or to local Parquet files ("parquet"), so the claim query and
+    run lookups stay flat as history grows.
+    """
+    def __init__(self, state_manager: StateManager, retention_days: Optional[float] = None,
+                 target: Optional[str] = None, out_dir: Optional[str] = None, batch_size: Optional[int] = None):
+        self.state_manager = state_manager
+        self.retention_days = retention_days if retention_days is not None else float(os.getenv('CR_RETENTION_DAYS', 30))
+        self.target = target or os.getenv('CR_ARCHIVE_TARGET', 'table')
+        if self.target not in ("table", "parquet"):
+            raise ValueError(f"Unknown archive target: {self.target}")
+        self.out_dir = out_dir or os.getenv('CR_ARCHIVE_DIR', 'archive')
+        self.batch_size = batch_size or int(os.getenv('CR_ARCHIVE_BATCH_SIZE', 10000))
+        self._exporter = None
+
+    def apply_clustering(self) -> List[str]:
+        """Set clustering keys on the runtime tables. Returns the statements run."""
+        statements = [f"ALTER TABLE {table} CLUSTER BY ({', '.join(keys)})" for table, keys in CLUSTERING.items()]
+        if not self.state_manager.session:
+            return statements
+        for statement in statements:
+            try:
+                self.state_manager.session.sql(statement).collect()
+            except Exception as e:
+                log.error("Error applying clustering (%s): %s", statement, e)
+        return statements
+
+    def _archive_batch(self, run_ids: List[str]) -> int:
+        if self.target == "table":
+            return self.state_manager.archive_runs(run_ids)
+        if self._exporter is None:
+            # pyarrow is only needed for Parquet archival
+            from cortex_runtime.analytics.export import ParquetExporter
+            self._exporter = ParquetExporter(self.state_manager, self.out_dir)
+        try:
+            files, archived = self._exporter.export_archive(run_ids)
+        except Exception as e:
+            log.error("Parquet archival failed, nothing purged: %s", e)
+            return 0
+        if len(archived) < len(run_ids):
+            log.warning("%d of %d runs were not fully archived and stay in the hot tables",
+                        len(run_ids) - len(archived), len(run_ids))
+        log.info("Archived %d runs to %d Parquet files", len(archived), len(files))
+        # Only runs verified in the written files are deleted
+        return self.state_manager.purge_runs(archived) if archived else 0
+
+    def archive(self) -> int:
+        """Move every finished run older than the retention window out of the hot tables"""
+        total = 0
+        while True:
+            run_ids = self.state_manager.finished_run_ids(older_than_days=self.retention_days, limit=self.batch_size)
+            if not run_ids:
+                break
+            moved = self._archive_batch(run_ids)
+            total += moved
+            if moved < len(run_ids):
+                # Partial failure (already logged); retry on the next pass
+                break
+        return total
+
+    def run_once(self) -> Dict[str, Any]:
+        archived = self.archive()
+        log.info("Maintenance pass done: %d runs archived (%s)", archived, self.target)
+        return {"archived": archived, "target": self.target}
+
+def main():
+    """Maintenance job: one pass with CR_MAINTENANCE_INTERVAL=0, otherwise a pass every interval seconds"""
+    from cortex_runtime.db.client import DBClient
+    session = DBClient().connect()
+    maintenance = Maintenance(StateManager(session))
+    if os.getenv('CR_APPLY_CLUSTERING', '').lower() in ('1', 'true', 'yes'):
+        maintenance.apply_clustering()
+
+    interval = float(os.getenv('CR_MAINTENANCE_INTERVAL', 3600))
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    while True:
+        maintenance.run_once()
+        if not interval or stop.wait(interval):
+            break
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from collections import OrderedDict
+import threading
+import numpy as np
+from cortex_runtime.db.state import StateManager
+
+class VectorIndex:
+    """
+    In-process brute-force cosine similarity index.
+    Vectors are normalized once on insert and kept in one contiguous float32 matrix,
+    so a search is a single matrix-vector product.
+    """
+    def __init__(self, dim: Optional[int] = None):
+        self.dim = dim
+        self._keys: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._matrix = np.zeros((0, dim or 0), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _normalize(self, vector: Sequence[float]) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        if self.dim is None:
+            self.dim = v.shape[0]
+            self._matrix = np.zeros((0, self.dim), dtype=np.float32)
+        if v.shape != (self.dim,):
+            raise ValueError(f"Embedding has dimension {v.shape[0]}, index expects {self.dim}")
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def add(self, key: str, vector: Sequence[float]) -> int:
+        v = self._normalize(vector)
+        pos = self._positions.get(key)
+        if pos is not None:
+            self._matrix[pos] = v
+            return pos
+
+        pos = len(self._keys)
+        if pos >= self._matrix.shape[0]:
+            # Grow geometrically so repeated adds stay amortized O(1)
+            grown = np.zeros((max(16, pos * 2), self.dim), dtype=np.float32)
+            grown[:pos] = self._matrix[:pos]
+            self._matrix = grown
+        self._matrix[pos] = v
+        self._keys.append(key)
+        self._positions[key] = pos
+        return pos
+
+    def _top_k(self, query: np.ndarray, rows: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        scores = self._matrix[rows] @ query
+        k = min(k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self._keys[rows[i]], float(scores[i])) for i in top]
+
+    def search(self, vector: Sequence[float], k: int = 5) -> List[Tuple[str, float]]:
+        """Return the k most similar keys as (key, cosine similarity)"""
+        if not self._keys or k <= 0:
+            return []
+        return self._top_k(self._normalize(vector), np.arange(len(self._keys)), k)
+
+class LSHIndex(VectorIndex):
+    """
+    Approximate index: random-hyperplane LSH buckets in front of the brute-force matrix.
+    Only vectors sharing a bucket with the query are scored; falls back to a full scan
+    when the buckets hold fewer than k candidates.
+    """
+    def __init__(self, dim: Optional[int] = None, n_bits: int = 12, n_tables: int = 4, seed: int = 0):
+        super().__init__(dim)
+        self.n_bits = n_bits
+        self.n_tables = n_tables
+        self._rng = np.random.default_rng(seed)
+        self._planes: Optional[np.ndarray] = None
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in range(n_tables)]
+        self._bit_weights = 1 << np.arange(n_bits)
+
+    def _hashes(self, v: np.ndarray) -> np.ndarray:
+        if self._planes is None:
+            self._planes = self._rng.standard_normal((self.n_tables, self.n_bits, self.dim)).astype(np.float32)
+        bits = (self._planes @ v) > 0
+        return bits.astype(np.int64) @ self._bit_weights
+
+    def add(self, key: str, vector: Sequence[float]) -> int:
+        is_new = key not in self._positions
+        pos = super().add(key, vector)
+        if is_new:
+            for table, h in zip(self._tables, self._hashes(self._matrix[pos])):
+                table.setdefault(int(h), []).append(pos)
+        return pos
+
+    def search(self, vector: Sequence[float], k: int = 5) -> List[Tuple[str, float]]:
+        if not self._keys or k <= 0:
+            return []
+        query = self._normalize(vector)
+        candidates = set()
+        for table, h in zip(self._tables, self._hashes(query)):
+            candidates.update(table.get(int(h), ()))
+        if len(candidates) < k:
+            return super().search(vector, k)
+        return self._top_k(query, np.fromiter(candidates, dtype=np.int64), k)
+
+class AgentMemory:
+    """
+    Keyed and semantic memory for one agent, backed by AGENT_MEMORY.
+    Reads go through an LRU cache, writes are buffered and flushed in batches,
+    and similarity search runs against a local vector index.
+    Buffered entries are read before the cache and stay buffered until a flush succeeds.
+    """
+    def __init__(self, state_manager: StateManager, agent_id: str, cache_size: int = 1024,
+                 batch_size: int = 50, index: str = "brute"):
+        self.state_manager = state_manager
+        self.agent_id = agent_id
+        self.cache_size = cache_size
+        self.batch_size = batch_size
+        self.index: VectorIndex = LSHIndex() if index == "lsh" else VectorIndex()
+        self._cache: "OrderedDict[str, Any]" = OrderedDict()
+        self._pending: List[Dict] = []
+        self._lock = threading.RLock()
+        # One flush at a time, so a flush can drop exactly the entries it wrote
+        self._flush_lock = threading.Lock()
+
+    def _remember(self, key: str, value: Any):
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def load(self):
+        """Populate the vector index (and warm the cache) from stored entries"""
+        entries = self.state_manager.fetch_memories(self.agent_id)
+        with self._lock:
+            for entry in entries:
+                if entry.get('embedding') is not None:
+                    self.index.add(entry['key'], entry['embedding'])
+                self._remember(entry['key'], entry.get('value'))
+
+    def _pending_entry(self, key: str) -> Optional[Dict]:
+        # Latest unsaved write for key; the store doesn't have it yet
+        for entry in reversed(self._pending):
+            if entry["key"] == key:
+                return entry
+        return None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._pending_entry(key)
+            if entry is not None:
+                return entry["value"]
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        entry = self.state_manager.fetch_memory(self.agent_id, key)
+        if entry is None:
+            return default
+        with self._lock:
+            self._remember(key, entry.get('value'))
+        return entry.get('value')
+
+    def put(self, run_id: str, key: str, value: Any, embedding: Optional[Sequence[float]] = None,
+            memory_type: str = "SCRATCHPAD"):
+        with self._lock:
+            self._remember(key, value)
+            if embedding is not None:
+                self.index.add(key, embedding)
+            self._pending.append({
+                "run_id": run_id,
+                "agent_id": self.agent_id,
+                "key": key,
+                "value": value,
+                "memory_type": memory_type,
+                "embedding": list(embedding) if embedding is not None else None
+            })
+            should_flush = len(self._pending) >= self.batch_size
+        if should_flush:
+            self.flush()
+
+    def flush(self) -> bool:
+        """
+        Write buffered entries to AGENT_MEMORY in one batch. On failure they stay
+        buffered and go out with the next flush; returns whether the write succeeded.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._pending)
+            if not batch:
+                return True
+            if not self.state_manager.save_memories(batch):
+                return False
+            with self._lock:
+                # put() only appends, so the written batch is still the head of the buffer
+                del self._pending[:len(batch)]
+            return True
+
+    def search(self, embedding: Sequence[float], k: int = 5) -> List[Dict]:
+        """Most similar stored entries: [{"key", "score", "value"}]"""
+        with self._lock:
+            hits = self.index.search(embedding, k)
+        return [{"key": key, "score": score, "value": self.get(key)} for key, score in hits]
@@ -1,41 +1,135 @@
-from typing import Optional, Dict, List, Any
-from datetime import datetime
+from typing import Optional, Dict, List, Any, Iterator, Union
+from collections import deque
+from datetime import datetime, timedelta
 import json
+import os
+import uuid
+import yaml
+from cortex_runtime.core.events import TERMINAL_STATUSES
+from cortex_runtime.core.logs import get_logger
+from cortex_runtime.core.resilience import Resilience, CircuitOpen
+from cortex_runtime.models.records import RunRecord, StepLogEntry
+
+log = get_logger("db")
 
 class StateManager:
-    def __init__(self, session):
+    def __init__(self, session, worker_id: Optional[str] = None, resilience: Optional[Resilience] = None):
         self.session = session
+        # Claim identity: when set, it prefixes the per-poll token claimed runs are
+        # stamped with, so claimed_by shows which worker holds a run.
+        self.worker_id = worker_id
+        # Circuit breakers per operation class (db:claim, db:read, db:write) so a
+        # degraded warehouse fails fast instead of tying up every worker
+        self.resilience = resilience or Resilience.from_env()
         # Mock storage for prototype
         self._mock_runs = {}
-        self._mock_steps = []
+        self._mock_steps = deque()
+        # SUCCESS/SKIPPED step counts per run_id: the claim's resume checkpoint
+        self._mock_checkpoints: Dict[str, int] = {}
+        # Bounded so long mock / local runs don't grow without limit: past the retention
+        # (in runs or in steps), whole finished runs are evicted, oldest first. Live runs
+        # are never evicted, so a resumed run always sees its full step history.
+        self.mock_retention = int(os.getenv('CR_MOCK_STEP_RETENTION', 100000)) or None
+        self._mock_finished: Dict[str, None] = {}  # finished run ids, in finishing order
         self._mock_memory = {}
+        self._mock_definitions = {}
+        self._mock_archive = {"runs": {}, "steps": []}
+
+    def _breaker(self, operation: str):
+        return self.resilience.breaker(f"db:{operation}")
+
+    def _mock_append_step(self, entry: StepLogEntry):
+        self._mock_steps.append(entry)
+        if entry.get('status') in ('SUCCESS', 'SKIPPED'):
+            self._mock_checkpoints[entry.run_id] = self._mock_checkpoints.get(entry.run_id, 0) + 1
+
+    def _mock_set_status(self, run_id: str, **fields):
+        run = self._mock_runs.get(run_id)
+        if run is None:
+            return
+        run.update(updated_at=datetime.utcnow(), **fields)
+        self._mock_finished.pop(run_id, None)
+        if run.get('status') in TERMINAL_STATUSES:
+            self._mock_finished[run_id] = None
+
+    def _mock_evict(self):
+        """Drop the oldest finished runs (row, steps, checkpoint) while the mock store is over its retention"""
+        limit = self.mock_retention
+        if not limit or (len(self._mock_steps) <= limit and len(self._mock_runs) <= limit):
+            return
+        # Evict down to three quarters of the limit, so the pass over the steps is amortized
+        low_water = limit * 3 // 4
+        evicted, steps, runs = [], len(self._mock_steps), len(self._mock_runs)
+        counts: Dict[str, int] = {}
+        for step in self._mock_steps:
+            counts[step.run_id] = counts.get(step.run_id, 0) + 1
+        while self._mock_finished and (steps > low_water or runs > low_water):
+            run_id = next(iter(self._mock_finished))
+            del self._mock_finished[run_id]
+            evicted.append(run_id)
+            steps -= counts.get(run_id, 0)
+            runs -= 1
+        if evicted:
+            self._move_runs(evicted, archive=False, chunk_size=len(evicted))
 
     def fetch_agent_definition(self, agent_name: str) -> Optional[Dict]:
         """Fetch the latest active agent definition"""
         if not self.session:
-            # In mock mode, we expect the definitions to be pre-loaded or passed
-            # For simplicity, we return None and let the Engine handle config loading separately
-            # or we could stick a mock definition here.
-            return None
+            # In mock mode, definitions are injected with mock_add_definition (or attached
+            # to the run row as mock_config)
+            return self._mock_definitions.get(agent_name)
             
         # SQL: SELECT definition_yaml FROM AGENT_DEFINITIONS WHERE agent_name = ? AND status = 'active'
         try:
-            rows = self.session.sql(
-                "SELECT definition_yaml FROM agent_definitions WHERE agent_name = ? AND status = 'active' ORDER BY created_at DESC LIMIT 1",
-                params=[agent_name]
-            ).collect()
+            with self._breaker("read"):
+                rows = self.session.sql(
+                    "SELECT definition_yaml FROM agent_definitions WHERE agent_name = ? AND status = 'active' ORDER BY created_at DESC LIMIT 1",
+                    params=[agent_name]
+                ).collect()
             
             if rows:
-                import yaml
                 return yaml.safe_load(rows[0]['DEFINITION_YAML'])
         except Exception as e:
-            print(f"[DB] Error fetching definition: {e}")
+            log.error("Error fetching definition: %s", e)
             
         return None
 
+    def mock_add_definition(self, agent_name: str, definition: Dict):
+        """Helper to inject a parsed agent definition for testing"""
+        self._mock_definitions[agent_name] = definition
+
+    def fetch_active_definitions(self) -> Dict[str, Dict]:
+        """Latest active definition of every agent in one query, keyed by agent_name (used for warm-up)"""
+        if not self.session:
+            return dict(self._mock_definitions)
+
+        definitions = {}
+        try:
+            with self._breaker("read"):
+                rows = self.session.sql(
+                    """SELECT agent_name, definition_yaml FROM agent_definitions WHERE status = 'active'
+                       QUALIFY ROW_NUMBER() OVER (PARTITION BY agent_name ORDER BY created_at DESC) = 1"""
+                ).collect()
+            for row in rows:
+                definitions[row['AGENT_NAME']] = yaml.safe_load(row['DEFINITION_YAML'])
+        except Exception as e:
+            log.error("Error fetching active definitions: %s", e)
+        return definitions
+
+    def ping(self) -> bool:
+        """Round trip to the warehouse (opens the connection and resumes the warehouse)"""
+        if not self.session:
+            return True
+        try:
+            with self._breaker("read"):
+                self.session.sql("SELECT 1").collect()
+            return True
+        except Exception as e:
+            log.error("Session ping failed: %s", e)
+            return False
+
     def fetch_pending_runs(self, limit: int = 10) -> List[Dict]:
         # Allow env override if default value is passed
-        import os
         if limit == 10: # Only override default
              limit = int(os.getenv('CR_FETCH_LIMIT', 10))
 
@@ -43,13 +137,12 @@ class StateManager:
         Poll for PENDING runs with safer claiming logic.
         Strategy: UPDATE status='RUNNING' for next N rows, returning the modified rows if possible.
         Since Snowpark SELECT returning modified rows is tricky, we do:
-        1. UPDATE top N pending -> RUNNING
-        2. SELECT those we just updated (approximate match by time/status)
+        1. UPDATE top N pending -> RUNNING, stamping claimed_by with a fresh token for this poll
+        2. SELECT the rows carrying exactly that token
         
-        *Note*: In a multi-worker cluster without unique 'claimed_by' ID, this has a small race condition
-        where two workers might update overlapping sets. 
-        For this 'hardened' version without schema changes, we rely on the fact that
-        updating 'PENDING' -> 'RUNNING' is atomic per row, so double-execution is minimized.
+        The token is "<worker_id>:<uuid>" (just the uuid without a worker_id), so a poll never
+        reads back runs claimed by another worker or by an earlier poll of this one, even
+        though execution bumps updated_at on the runs it is already working on.
         """
         if not self.session:
             # Return any mock runs that are 'PENDING', up to limit
@@ -57,107 +150,704 @@ class StateManager:
             batch = all_pending[:limit]
             # Mock the state transition immediately to simulate claiming
             for r in batch:
+                # Resume checkpoint, as counted by the SQL claim
+                done = self._mock_checkpoints.get(r['run_id'], 0)
+                if done:
+                    r['completed_steps'] = done
                 r['status'] = 'RUNNING' 
+                r['claimed_by'] = self._claim_token()
             return batch
 
         try:
-            # 1. Atomic UPDATE first (The "Claim")
-            # We target the oldest PENDING rows. 
-            # Note: This is an "optimistic claim".
-            self.session.sql(
-                f"""
-                UPDATE agent_runs 
-                SET status = 'RUNNING', updated_at = CURRENT_TIMESTAMP()
-                WHERE run_id IN (
-                    SELECT run_id FROM agent_runs 
-                    WHERE status = 'PENDING' 
-                    ORDER BY created_at ASC 
-                    LIMIT {limit}
-                )
-                """
-            ).collect()
+            with self._breaker("claim"):
+                # 1. Atomic UPDATE first (The "Claim")
+                # We target the oldest PENDING rows. 
+                # Note: This is an "optimistic claim".
+                # The per-poll token means the SELECT below only sees rows this UPDATE stamped.
+                claim_params = [self._claim_token()]
+                self.session.sql(
+                    f"""
+                    UPDATE agent_runs 
+                    SET status = 'RUNNING', updated_at = CURRENT_TIMESTAMP(), claimed_by = ?
+                    WHERE run_id IN (
+                        SELECT run_id FROM agent_runs 
+                        WHERE status = 'PENDING' 
+                        ORDER BY created_at ASC 
+                        LIMIT {limit}
+                    )
+                    """,
+                    params=claim_params
+                ).collect()
             
-            # 2. SELECT what we (likely) just claimed
-            # We fetch 'RUNNING' jobs that were updated very recently.
-            rows = self.session.sql(
-                f"""
-                SELECT r.run_id, r.agent_name, r.input, r.status, COUNT(s.step_id) as completed_steps
-                FROM agent_runs r
-                LEFT JOIN agent_steps s ON r.run_id = s.run_id AND s.status = 'SUCCESS'
-                WHERE r.status = 'RUNNING' 
-                AND r.updated_at >= TIMEADD('second', -5, CURRENT_TIMESTAMP())
-                GROUP BY r.run_id, r.agent_name, r.input, r.status
-                LIMIT {limit}
-                """
-            ).collect()
+                # 2. SELECT what we just claimed
+                # We fetch the 'RUNNING' rows carrying this poll's token. Steps are only
+                # aggregated for those ids, so the cost does not grow with AGENT_STEPS history
+                # (AGENT_STEPS is clustered by run_id, see schemas/01_maintenance.sql).
+                rows = self.session.sql(
+                    """
+                    WITH claimed AS (
+                        SELECT run_id, agent_name, input, status FROM agent_runs
+                        WHERE status = 'RUNNING' AND claimed_by = ?
+                    ),
+                    done AS (
+                        SELECT s.run_id, COUNT(*) AS completed_steps
+                        FROM agent_steps s JOIN claimed c ON s.run_id = c.run_id
+                        WHERE s.status IN ('SUCCESS', 'SKIPPED')
+                        GROUP BY s.run_id
+                    )
+                    SELECT c.run_id, c.agent_name, c.input, c.status, COALESCE(d.completed_steps, 0) AS completed_steps
+                    FROM claimed c LEFT JOIN done d ON d.run_id = c.run_id
+                    """,
+                    params=claim_params
+                ).collect()
             
-            runs = []
-            for row in rows:
-                runs.append({
-                    'run_id': row['RUN_ID'],
-                    'agent_name': row['AGENT_NAME'],
-                    'input': json.loads(row['INPUT']) if row['INPUT'] else {},
-                    'status': row['STATUS'],
-                    'completed_steps': row['COMPLETED_STEPS'] if row['COMPLETED_STEPS'] else 0
-                })
-            return runs
+            return [
+                RunRecord(
+                    run_id=row['RUN_ID'],
+                    agent_name=row['AGENT_NAME'],
+                    input=json.loads(row['INPUT']) if row['INPUT'] else {},
+                    status=row['STATUS'],
+                    completed_steps=row['COMPLETED_STEPS'] if row['COMPLETED_STEPS'] else 0
+                )
+                for row in rows
+            ]
+        except CircuitOpen as e:
+            # Warehouse is degraded: claim nothing rather than take work we cannot record
+            log.debug("Skipping claim: %s", e)
+            return []
         except Exception as e:
-            print(f"[DB] Error fetching runs: {e}")
+            log.error("Error fetching runs: %s", e)
             return []
 
+    def _claim_token(self) -> str:
+        token = uuid.uuid4().hex
+        return f"{self.worker_id}:{token}" if self.worker_id else token
+
     def mock_add_run(self, run_dict: Dict):
         """Helper to inject a run for testing"""
-        self._mock_runs[run_dict['run_id']] = run_dict
+        run_id = run_dict['run_id']
+        self._mock_runs[run_id] = run_dict
+        self._mock_finished.pop(run_id, None)
+        if run_dict.get('status') in TERMINAL_STATUSES:
+            self._mock_finished[run_id] = None
+        self._mock_evict()
+
+    def fetch_run(self, run_id: str) -> Optional[Dict]:
+        """Read a single AGENT_RUNS row without claiming it"""
+        return self.fetch_runs([run_id]).get(run_id)
+
+    def fetch_runs(self, run_ids: List[str], chunk_size: int = 1000, strict: bool = False) -> Dict[str, Dict]:
+        """Read AGENT_RUNS rows by id (no side effects), keyed by run_id. strict re-raises read errors."""
+        if not self.session:
+            return {rid: self._mock_runs[rid] for rid in run_ids if rid in self._mock_runs}
+
+        runs = {}
+        try:
+            with self._breaker("read"):
+                for start in range(0, len(run_ids), chunk_size):
+                    chunk = run_ids[start:start + chunk_size]
+                    rows = self.session.sql(
+                        f"SELECT run_id, agent_name, input, status, created_at, updated_at FROM agent_runs WHERE run_id IN ({', '.join(['?'] * len(chunk))})",
+                        params=chunk
+                    ).collect()
+                    for row in rows:
+                        runs[row['RUN_ID']] = {
+                            'run_id': row['RUN_ID'],
+                            'agent_name': row['AGENT_NAME'],
+                            'input': json.loads(row['INPUT']) if row['INPUT'] else {},
+                            'status': row['STATUS'],
+                            'created_at': row['CREATED_AT'],
+                            'updated_at': row['UPDATED_AT']
+                        }
+        except Exception as e:
+            if strict:
+                raise
+            log.error("Error fetching runs by id: %s", e)
+        return runs
+
+    def fetch_steps(self, run_ids: List[str], chunk_size: int = 1000, strict: bool = False) -> Dict[str, List[Dict]]:
+        """Recorded AGENT_STEPS for the given runs, ordered by step_index, keyed by run_id. strict re-raises read errors."""
+        steps: Dict[str, List[Dict]] = {rid: [] for rid in run_ids}
+        if not self.session:
+            for step in self._mock_steps:
+                if step.get('run_id') in steps:
+                    steps[step['run_id']].append(step)
+            for recorded in steps.values():
+                recorded.sort(key=lambda s: s.get('step_index', 0))
+            return steps
+
+        try:
+            with self._breaker("read"):
+                for start in range(0, len(run_ids), chunk_size):
+                    chunk = run_ids[start:start + chunk_size]
+                    rows = self.session.sql(
+                        f"""SELECT run_id, step_index, step_name, status, output, model, tokens_used, latency_ms, created_at
+                            FROM agent_steps WHERE run_id IN ({', '.join(['?'] * len(chunk))})
+                            ORDER BY run_id, step_index""",
+                        params=chunk
+                    ).collect()
+                    for row in rows:
+                        steps[row['RUN_ID']].append({
+                            'run_id': row['RUN_ID'],
+                            'step_index': row['STEP_INDEX'],
+                            'step_name': row['STEP_NAME'],
+                            'status': row['STATUS'],
+                            'output': json.loads(row['OUTPUT']) if row['OUTPUT'] else None,
+                            'model': row['MODEL'],
+                            'tokens_used': row['TOKENS_USED'],
+                            'latency_ms': row['LATENCY_MS'],
+                            'executed_at': row['CREATED_AT']
+                        })
+        except Exception as e:
+            if strict:
+                raise
+            log.error("Error fetching steps: %s", e)
+        return steps
 
-    def log_step(self, run_id: str, step_data: Dict):
-        """Write a step result to AGENT_STEPS"""
+    def finished_run_ids(self, older_than_days: float, limit: int = 10000) -> List[str]:
+        """Ids of terminal runs last updated more than older_than_days ago (candidates for archival)"""
         if not self.session:
-            self._mock_steps.append(step_data)
-            print(f"[MockDB] Run {run_id} | Step {step_data.get('step_name')} | Status: {step_data.get('status')}")
+            older_than = datetime.utcnow() - timedelta(days=older_than_days)
+            return [
+                rid for rid, r in self._mock_runs.items()
+                if r.get('status') in ('COMPLETED', 'FAILED', 'CANCELLED')
+                and (r.get('updated_at') or r.get('created_at') or datetime.utcnow()) < older_than
+            ][:limit]
+
+        try:
+            with self._breaker("read"):
+                rows = self.session.sql(
+                    f"""SELECT run_id FROM agent_runs
+                        WHERE status IN ('COMPLETED', 'FAILED', 'CANCELLED')
+                        AND updated_at < TIMEADD('second', -?, CURRENT_TIMESTAMP())
+                        ORDER BY updated_at LIMIT {int(limit)}""",
+                    # Cutoff computed on the server: updated_at is session-timezone NTZ, not client UTC
+                    params=[float(older_than_days) * 86400]
+                ).collect()
+            return [row['RUN_ID'] for row in rows]
+        except Exception as e:
+            log.error("Error fetching finished runs: %s", e)
+            return []
+
+    def _move_runs(self, run_ids: List[str], archive: bool, chunk_size: int) -> int:
+        """Delete runs and their steps from the hot tables, copying them to *_ARCHIVE first if archive"""
+        if not self.session:
+            ids = set(run_ids)
+            moved = [self._mock_runs.pop(rid) for rid in run_ids if rid in self._mock_runs]
+            steps = [s for s in self._mock_steps if s.get('run_id') in ids]
+            kept = [s for s in self._mock_steps if s.get('run_id') not in ids]
+            self._mock_steps.clear()
+            self._mock_steps.extend(kept)
+            for rid in ids:
+                self._mock_checkpoints.pop(rid, None)
+                self._mock_finished.pop(rid, None)
+            if archive:
+                self._mock_archive["runs"].update((r['run_id'], r) for r in moved)
+                self._mock_archive["steps"].extend(steps)
+            return len(moved)
+
+        statements = ["DELETE FROM agent_steps WHERE run_id IN ({ids})", "DELETE FROM agent_runs WHERE run_id IN ({ids})"]
+        if archive:
+            statements = [
+                "INSERT INTO agent_steps_archive SELECT * FROM agent_steps WHERE run_id IN ({ids})",
+                "INSERT INTO agent_runs_archive SELECT * FROM agent_runs WHERE run_id IN ({ids})",
+            ] + statements
+        moved = 0
+        try:
+            with self._breaker("write"):
+                for start in range(0, len(run_ids), chunk_size):
+                    chunk = run_ids[start:start + chunk_size]
+                    ids = ", ".join(["?"] * len(chunk))
+                    # Copy and delete atomically so a run is never lost or in both places
+                    self.session.sql("BEGIN").collect()
+                    try:
+                        for statement in statements:
+                            self.session.sql(statement.format(ids=ids), params=chunk).collect()
+                        self.session.sql("COMMIT").collect()
+                    except Exception:
+                        self.session.sql("ROLLBACK").collect()
+                        raise
+                    moved += len(chunk)
+        except Exception as e:
+            log.error("Error moving runs out of the hot tables: %s", e)
+        return moved
+
+    def archive_runs(self, run_ids: List[str], chunk_size: int = 1000) -> int:
+        """Move runs and their steps to AGENT_RUNS_ARCHIVE / AGENT_STEPS_ARCHIVE. Returns runs moved."""
+        return self._move_runs(run_ids, archive=True, chunk_size=chunk_size)
+
+    def purge_runs(self, run_ids: List[str], chunk_size: int = 1000) -> int:
+        """Delete runs and their steps (after they were archived elsewhere). Returns runs deleted."""
+        return self._move_runs(run_ids, archive=False, chunk_size=chunk_size)
+
+    def iter_step_records(self, since: Optional[datetime] = None, batch_size: int = 10000) -> Iterator[List[Dict]]:
+        """
+        Stream step telemetry (no outputs) in batches, joined with the run's agent_name.
+        Used by exporters so the whole AGENT_STEPS table is never held in memory.
+        """
+        if not self.session:
+            batch = []
+            for step in self._mock_steps:
+                if since and step.get('executed_at') and step['executed_at'] < since:
+                    continue
+                run = self._mock_runs.get(step.get('run_id'), {})
+                batch.append({
+                    'run_id': step.get('run_id'),
+                    'agent_name': run.get('agent_name'),
+                    'step_index': step.get('step_index'),
+                    'step_name': step.get('step_name'),
+                    'status': step.get('status'),
+                    'model': step.get('model'),
+                    'tokens_used': step.get('tokens_used', 0),
+                    'latency_ms': step.get('latency_ms', 0),
+                    'executed_at': step.get('executed_at')
+                })
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+            return
+
+        query = """SELECT s.run_id, r.agent_name, s.step_index, s.step_name, s.status, s.model,
+                          s.tokens_used, s.latency_ms, s.created_at AS executed_at
+                   FROM agent_steps s JOIN agent_runs r ON r.run_id = s.run_id"""
+        params = None
+        if since:
+            query += " WHERE s.created_at >= ?"
+            params = [since]
+        yield from self._iter_rows(query, params, batch_size)
+
+    def iter_run_records(self, since: Optional[datetime] = None, batch_size: int = 10000) -> Iterator[List[Dict]]:
+        """Stream AGENT_RUNS rows (without input) in batches"""
+        if not self.session:
+            batch = [
+                {
+                    'run_id': r['run_id'],
+                    'agent_name': r.get('agent_name'),
+                    'status': r.get('status'),
+                    'created_at': r.get('created_at'),
+                    'updated_at': r.get('updated_at')
+                }
+                for r in self._mock_runs.values()
+                if not since or not r.get('created_at') or r['created_at'] >= since
+            ]
+            for start in range(0, len(batch), batch_size):
+                yield batch[start:start + batch_size]
+            return
+
+        query = "SELECT run_id, agent_name, status, created_at, updated_at FROM agent_runs"
+        params = None
+        if since:
+            query += " WHERE created_at >= ?"
+            params = [since]
+        yield from self._iter_rows(query, params, batch_size)
+
+    def _iter_rows(self, query: str, params: Optional[List], batch_size: int) -> Iterator[List[Dict]]:
+        # to_local_iterator streams result partitions instead of collecting everything
+        batch = []
+        for row in self.session.sql(query, params=params).to_local_iterator():
+            batch.append({k.lower(): v for k, v in row.as_dict().items()})
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def log_step(self, run_id: str, step_data: Union[StepLogEntry, Dict]):
+        """
+        Write a step result (a StepLogEntry or a dict with the same fields) to AGENT_STEPS.
+        Raises CircuitOpen while db:write is open, so the caller stops instead of running unrecorded steps.
+        """
+        if not self.session:
+            entry = step_data if isinstance(step_data, StepLogEntry) else StepLogEntry.from_dict(run_id, step_data)
+            entry.executed_at = entry.executed_at or datetime.utcnow()
+            self._mock_append_step(entry)
+            log.info("[Mock] Run %s | Step %s | Status: %s", run_id, step_data.get('step_name'), step_data.get('status'),
+                     extra={"sampled": True})
+            self._mock_evict()
             return
 
         # INSERT INTO AGENT_STEPS
         try:
-             import json
-             self.session.sql(
-                 """INSERT INTO agent_steps (run_id, step_index, step_name, status, output, model, tokens_used, latency_ms) 
-                    VALUES (?, ?, ?, ?, parse_json(?), ?, ?, ?)""",
-                 params=[
-                     run_id, 
-                     step_data.get('step_index', 0),
-                     step_data.get('step_name'), 
-                     step_data.get('status'), 
-                     json.dumps(step_data.get('output')), 
-                     step_data.get('model', 'unknown'),
-                     step_data.get('tokens_used', 0),
-                     step_data.get('latency_ms', 0)
-                 ]
-             ).collect()
-             print(f"[DB] Logging step for run {run_id}: {step_data.get('step_name')}")
-        except Exception as e:
-            print(f"[DB] Error logging step: {e}")
-
-    def update_run_status(self, run_id: str, status: str, cost: float = 0.0):
-        """Update AGENT_RUNS status"""
+             with self._breaker("write"):
+                 self.session.sql(
+                     """INSERT INTO agent_steps (run_id, step_index, step_name, status, output, model, tokens_used, latency_ms, tokens_saved) 
+                        VALUES (?, ?, ?, ?, parse_json(?), ?, ?, ?, ?)""",
+                     params=[
+                         run_id, 
+                         step_data.get('step_index', 0),
+                         step_data.get('step_name'), 
+                         step_data.get('status'), 
+                         json.dumps(step_data.get('output')), 
+                         step_data.get('model', 'unknown'),
+                         step_data.get('tokens_used', 0),
+                         step_data.get('latency_ms', 0),
+                         step_data.get('tokens_saved', 0)
+                     ]
+                 ).collect()
+             log.debug("Logged step for run %s: %s", run_id, step_data.get('step_name'))
+        except CircuitOpen:
+            raise
+        except Exception as e:
+            log.error("Error logging step: %s", e)
+
+    def log_steps(self, entries: List[Union[StepLogEntry, Dict]], chunk_size: int = 500):
+        """
+        Bulk write to AGENT_STEPS: one INSERT per chunk of entries.
+        Each entry is a StepLogEntry or step_data (as for log_step) plus its run_id.
+        Raises CircuitOpen while db:write is open (see log_step).
+        """
+        if not entries:
+            return
+
+        if not self.session:
+            now = datetime.utcnow()
+            for entry in entries:
+                if not isinstance(entry, StepLogEntry):
+                    entry = StepLogEntry.from_dict(entry['run_id'], entry)
+                entry.executed_at = entry.executed_at or now
+                self._mock_append_step(entry)
+            log.debug("[Mock] Logged %d steps", len(entries))
+            self._mock_evict()
+            return
+
+        try:
+            with self._breaker("write"):
+                for start in range(0, len(entries), chunk_size):
+                    chunk = entries[start:start + chunk_size]
+                    params = []
+                    for entry in chunk:
+                        params.extend([
+                            entry['run_id'],
+                            entry.get('step_index', 0),
+                            entry.get('step_name'),
+                            entry.get('status'),
+                            json.dumps(entry.get('output')),
+                            entry.get('model', 'unknown'),
+                            entry.get('tokens_used', 0),
+                            entry.get('latency_ms', 0),
+                            entry.get('tokens_saved', 0)
+                        ])
+                    self.session.sql(
+                        f"""INSERT INTO agent_steps (run_id, step_index, step_name, status, output, model, tokens_used, latency_ms, tokens_saved)
+                            SELECT column1, column2, column3, column4, parse_json(column5), column6, column7, column8, column9
+                            FROM VALUES {", ".join(["(?, ?, ?, ?, ?, ?, ?, ?, ?)"] * len(chunk))}""",
+                        params=params
+                    ).collect()
+            log.debug("Logged %d steps", len(entries))
+        except CircuitOpen:
+            raise
+        except Exception as e:
+            log.error("Error logging steps: %s", e)
+
+    def create_runs(self, runs: List[Dict], status: str = 'RUNNING', chunk_size: int = 1000):
+        """
+        Bulk insert AGENT_RUNS rows ({"run_id", "agent_name", "input"}). Batch jobs create
+        them as RUNNING so pollers never claim them. Raises CircuitOpen while db:write is open.
+        """
+        if not runs:
+            return
+
+        if not self.session:
+            for run in runs:
+                self.mock_add_run(dict(run, status=status))
+            return
+
+        try:
+            with self._breaker("write"):
+                for start in range(0, len(runs), chunk_size):
+                    chunk = runs[start:start + chunk_size]
+                    params = []
+                    for run in chunk:
+                        params.extend([run['run_id'], run['agent_name'], json.dumps(run.get('input', {}), default=str), status])
+                    self.session.sql(
+                        f"""INSERT INTO agent_runs (run_id, agent_name, input, status)
+                            SELECT column1, column2, parse_json(column3), column4
+                            FROM VALUES {", ".join(["(?, ?, ?, ?)"] * len(chunk))}""",
+                        params=params
+                    ).collect()
+        except CircuitOpen:
+            raise
+        except Exception as e:
+            log.error("Error creating runs: %s", e)
+
+    def update_runs_status(self, run_ids: List[str], status: str, chunk_size: int = 1000,
+                           error_message: Optional[str] = None):
+        """
+        Set-based status update for many runs (error_message as in update_run_status).
+        Raises CircuitOpen while db:write is open.
+        """
+        if not self.session:
+            for run_id in run_ids:
+                self._mock_set_status(run_id, status=status, error_message=error_message)
+            self._mock_evict()
+            return
+
+        try:
+            with self._breaker("write"):
+                for start in range(0, len(run_ids), chunk_size):
+                    chunk = run_ids[start:start + chunk_size]
+                    self.session.sql(
+                        f"""UPDATE agent_runs SET status = ?, error_message = ?, updated_at = CURRENT_TIMESTAMP()
+                            WHERE run_id IN ({', '.join(['?'] * len(chunk))})""",
+                        params=[status, error_message] + chunk
+                    ).collect()
+        except CircuitOpen:
+            raise
+        except Exception as e:
+            log.error("Error updating run statuses: %s", e)
+
+    def update_run_status(self, run_id: str, status: str, cost: float = 0.0, error_message: Optional[str] = None):
+        """
+        Update AGENT_RUNS status. error_message ("<ErrorClass>: <detail>") is cleared by any later update.
+        Raises CircuitOpen while db:write is open (see log_step).
+        """
         if not self.session:
             if run_id in self._mock_runs:
-                self._mock_runs[run_id]['status'] = status
-                print(f"[MockDB] Run {run_id} status updated to {status}")
+                self._mock_set_status(run_id, status=status, error_message=error_message)
+                log.info("[Mock] Run %s status updated to %s", run_id, status, extra={"sampled": True})
+                self._mock_evict()
             return
             
-        print(f"[DB] Updating run {run_id} status to {status}")
+        log.info("Updating run %s status to %s", run_id, status, extra={"sampled": True})
         try:
-            self.session.sql(
-                "UPDATE agent_runs SET status = ?, updated_at = CURRENT_TIMESTAMP() WHERE run_id = ?",
-                params=[status, run_id]
-            ).collect()
+            with self._breaker("write"):
+                self.session.sql(
+                    "UPDATE agent_runs SET status = ?, error_message = ?, updated_at = CURRENT_TIMESTAMP() WHERE run_id = ?",
+                    params=[status, error_message, run_id]
+                ).collect()
+        except CircuitOpen:
+            raise
         except Exception as e:
-            print(f"[DB] Error updating run status: {e}")
+            log.error("Error updating run status: %s", e)
+
+    def _recovery_filter(self, statuses: List[str], stalled_for: Optional[float], agent_name: Optional[str],
+                         since: Optional[datetime], until: Optional[datetime], error_class: Optional[str]):
+        """WHERE clause (over agent_runs r) and params selecting runs to recover"""
+        matches = []
+        params: List[Any] = []
+        if statuses:
+            matches.append(f"r.status IN ({', '.join(['?'] * len(statuses))})")
+            params.extend(statuses)
+        if stalled_for:
+            # Stalled: still RUNNING, but neither the run nor any of its steps changed since the cutoff.
+            # The cutoff is computed on the server: updated_at / created_at are CURRENT_TIMESTAMP()
+            # values in the session timezone, not client UTC.
+            matches.append("""(r.status = 'RUNNING' AND r.updated_at < TIMEADD('second', -?, CURRENT_TIMESTAMP())
+                AND NOT EXISTS (SELECT 1 FROM agent_steps s WHERE s.run_id = r.run_id
+                                AND s.created_at >= TIMEADD('second', -?, CURRENT_TIMESTAMP())))""")
+            params.extend([float(stalled_for), float(stalled_for)])
+        clauses = [f"({' OR '.join(matches) or 'FALSE'})"]
+        if agent_name:
+            clauses.append("r.agent_name = ?")
+            params.append(agent_name)
+        if since:
+            clauses.append("r.updated_at >= ?")
+            params.append(since)
+        if until:
+            clauses.append("r.updated_at < ?")
+            params.append(until)
+        if error_class:
+            clauses.append("r.error_message LIKE ?")
+            params.append(f"{error_class}:%")
+        return " AND ".join(clauses), params
+
+    def _mock_recoverable(self, run: Dict, statuses: List[str], stalled_for: Optional[float], agent_name: Optional[str],
+                          since: Optional[datetime], until: Optional[datetime], error_class: Optional[str]) -> bool:
+        # Mock timestamps are all written with utcnow(), so a client-side cutoff is consistent here
+        updated_at = run.get('updated_at') or run.get('created_at') or datetime.utcnow()
+        stalled_before = datetime.utcnow() - timedelta(seconds=stalled_for) if stalled_for else None
+        stalled = (stalled_before is not None and run.get('status') == 'RUNNING' and updated_at < stalled_before
+                   and not any(s.get('run_id') == run['run_id'] and (s.get('executed_at') or stalled_before) >= stalled_before
+                               for s in self._mock_steps))
+        if run.get('status') not in statuses and not stalled:
+            return False
+        return ((not agent_name or run.get('agent_name') == agent_name)
+                and (not since or updated_at >= since)
+                and (not until or updated_at < until)
+                and (not error_class or (run.get('error_message') or '').startswith(f"{error_class}:")))
+
+    def recoverable_run_ids(self, statuses: List[str], stalled_for: Optional[float] = None,
+                            agent_name: Optional[str] = None, since: Optional[datetime] = None,
+                            until: Optional[datetime] = None, error_class: Optional[str] = None,
+                            limit: int = 100000) -> List[str]:
+        """
+        Ids of runs to requeue, oldest first: runs in one of statuses (e.g. FAILED) plus,
+        with stalled_for (seconds), RUNNING runs with no activity for that long. Optionally narrowed
+        by agent, a time window on the last update, and error class (see update_run_status).
+        """
+        if not self.session:
+            runs = [r for r in self._mock_runs.values()
+                    if self._mock_recoverable(r, statuses, stalled_for, agent_name, since, until, error_class)]
+            runs.sort(key=lambda r: r.get('updated_at') or r.get('created_at') or datetime.utcnow())
+            return [r['run_id'] for r in runs[:limit]]
+
+        where, params = self._recovery_filter(statuses, stalled_for, agent_name, since, until, error_class)
+        try:
+            with self._breaker("read"):
+                rows = self.session.sql(
+                    f"SELECT r.run_id FROM agent_runs r WHERE {where} ORDER BY r.updated_at LIMIT {int(limit)}",
+                    params=params
+                ).collect()
+            return [row['RUN_ID'] for row in rows]
+        except Exception as e:
+            log.error("Error selecting runs to recover: %s", e)
+            return []
 
-    def save_memory(self, run_id: str, key: str, value: Any):
+    def requeue_runs(self, run_ids: List[str], statuses: List[str], stalled_for: Optional[float] = None,
+                     chunk_size: int = 1000) -> int:
+        """
+        Set-based requeue: one UPDATE back to PENDING per chunk. Logged steps are kept, so
+        each run resumes from its checkpoint. The selection filter is re-checked in the
+        UPDATE, so runs that moved on since they were selected are left alone.
+        Returns the number of runs requeued. Raises CircuitOpen while db:write is open.
+        """
+        if not run_ids:
+            return 0
+
+        if not self.session:
+            requeued = 0
+            for run_id in run_ids:
+                run = self._mock_runs.get(run_id)
+                if run and self._mock_recoverable(run, statuses, stalled_for, None, None, None, None):
+                    self._mock_set_status(run_id, status='PENDING', claimed_by=None, error_message=None)
+                    requeued += 1
+            return requeued
+
+        where, filter_params = self._recovery_filter(statuses, stalled_for, None, None, None, None)
+        requeued = 0
+        try:
+            with self._breaker("write"):
+                for start in range(0, len(run_ids), chunk_size):
+                    chunk = run_ids[start:start + chunk_size]
+                    rows = self.session.sql(
+                        f"""UPDATE agent_runs r
+                            SET status = 'PENDING', claimed_by = NULL, error_message = NULL, updated_at = CURRENT_TIMESTAMP()
+                            WHERE r.run_id IN ({', '.join(['?'] * len(chunk))}) AND {where}""",
+                        params=chunk + filter_params
+                    ).collect()
+                    # UPDATE returns a single row with the number of rows updated
+                    requeued += rows[0][0] if rows else 0
+        except CircuitOpen:
+            raise
+        except Exception as e:
+            log.error("Error requeueing runs: %s", e)
+        return requeued
+
+    def count_runs(self, statuses: List[str], agent_name: Optional[str] = None) -> int:
+        """Number of runs in the given statuses (optionally for one agent)"""
+        if not self.session:
+            return sum(1 for r in self._mock_runs.values()
+                       if r.get('status') in statuses and (not agent_name or r.get('agent_name') == agent_name))
+
+        params: List[Any] = list(statuses)
+        query = f"SELECT COUNT(*) AS n FROM agent_runs WHERE status IN ({', '.join(['?'] * len(statuses))})"
+        if agent_name:
+            query += " AND agent_name = ?"
+            params.append(agent_name)
+        try:
+            with self._breaker("read"):
+                rows = self.session.sql(query, params=params).collect()
+            return rows[0]['N'] if rows else 0
+        except Exception as e:
+            log.error("Error counting runs: %s", e)
+            return 0
+
+    def save_memory(self, run_id: str, key: str, value: Any, agent_id: Optional[str] = None,
+                    memory_type: str = "SCRATCHPAD", embedding: Optional[List[float]] = None) -> bool:
         """Save to AGENT_MEMORY"""
+        return self.save_memories([{
+            "run_id": run_id,
+            "agent_id": agent_id,
+            "key": key,
+            "value": value,
+            "memory_type": memory_type,
+            "embedding": embedding
+        }])
+
+    def save_memories(self, entries: List[Dict]) -> bool:
+        """
+        Batched write to AGENT_MEMORY: one INSERT for all entries.
+        Each entry has run_id, agent_id, key, value and optionally memory_type / embedding.
+        Returns False if the write failed, so the caller can keep the batch.
+        """
+        if not entries:
+            return True
+
         if not self.session:
-             self._mock_memory[(run_id, key)] = value
-             print(f"[MockDB] Memory saved: {key}")
-             return
-        pass
+            for entry in entries:
+                self._mock_memory[(entry.get('agent_id'), entry['key'])] = dict(entry)
+            log.debug("[Mock] Memory saved: %d entries", len(entries))
+            return True
+
+        placeholders = ", ".join(["(?, ?, ?, ?, ?, ?)"] * len(entries))
+        params = []
+        for entry in entries:
+            content = {"value": entry.get('value')}
+            if entry.get('embedding') is not None:
+                content["embedding"] = [float(x) for x in entry['embedding']]
+            params.extend([
+                str(uuid.uuid4()),
+                entry['run_id'],
+                entry.get('agent_id'),
+                entry.get('memory_type', 'SCRATCHPAD'),
+                entry['key'],
+                json.dumps(content)
+            ])
+        try:
+            with self._breaker("write"):
+                self.session.sql(
+                    f"""INSERT INTO agent_memory (memory_id, run_id, agent_id, memory_type, key, content)
+                        SELECT column1, column2, column3, column4, column5, parse_json(column6)
+                        FROM VALUES {placeholders}""",
+                    params=params
+                ).collect()
+            log.debug("Saved %d memory entries", len(entries))
+            return True
+        except Exception as e:
+            log.error("Error saving memory: %s", e)
+            return False
+
+    def fetch_memory(self, agent_id: str, key: str) -> Optional[Dict]:
+        """Latest AGENT_MEMORY entry for a key: {"key", "value", "embedding"}"""
+        if not self.session:
+            entry = self._mock_memory.get((agent_id, key))
+            return dict(entry) if entry else None
+
+        try:
+            with self._breaker("read"):
+                rows = self.session.sql(
+                    "SELECT key, content FROM agent_memory WHERE agent_id = ? AND key = ? ORDER BY created_at DESC LIMIT 1",
+                    params=[agent_id, key]
+                ).collect()
+            if rows:
+                return self._memory_row(rows[0])
+        except Exception as e:
+            log.error("Error fetching memory: %s", e)
+        return None
+
+    def fetch_memories(self, agent_id: str) -> List[Dict]:
+        """All current entries (latest per key) for an agent, used to build the local index"""
+        if not self.session:
+            return [dict(e) for (a, _), e in self._mock_memory.items() if a == agent_id]
+
+        try:
+            with self._breaker("read"):
+                rows = self.session.sql(
+                    """SELECT key, content FROM agent_memory WHERE agent_id = ?
+                       QUALIFY ROW_NUMBER() OVER (PARTITION BY key ORDER BY created_at DESC) = 1""",
+                    params=[agent_id]
+                ).collect()
+            return [self._memory_row(row) for row in rows]
+        except Exception as e:
+            log.error("Error fetching memories: %s", e)
+            return []
+
+    def _memory_row(self, row) -> Dict:
+        content = json.loads(row['CONTENT']) if row['CONTENT'] else {}
+        return {
+            "key": row['KEY'],
+            "value": content.get("value"),
+            "embedding": content.get("embedding")
+        }
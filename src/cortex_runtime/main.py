@@ -4,6 +4,9 @@ from cortex_runtime.db.client import DBClient
 from cortex_runtime.db.state import StateManager
 from cortex_runtime.core.adapter import get_llm_provider
 from cortex_runtime.core.engine import ExecutionEngine
+from cortex_runtime.core.logs import get_logger
+
+log = get_logger("init")
 
 def main():
     print("="*60)
@@ -16,9 +19,9 @@ def main():
     session = db_client.connect()
     
     if session:
-        print("[Init] Connected to Snowflake.")
+        log.info("Connected to Snowflake.")
     else:
-        print("[Init] Running in MOCK mode (No Snowflake connection).")
+        log.info("Running in MOCK mode (No Snowflake connection).")
 
     # 2. Components
     state_manager = StateManager(session)
@@ -30,7 +33,7 @@ def main():
     try:
         engine.run_agent_loop()
     except KeyboardInterrupt:
-        print("\n[Runtime] Shutting down.")
+        log.info("Shutting down.")
 
 if __name__ == "__main__":
     main()
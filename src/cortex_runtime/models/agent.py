@@ -1,17 +1,49 @@
-from typing import List, Optional, Dict, Any, Union
-from pydantic import BaseModel, Field
+from typing import List, Literal, Optional, Dict, Any, Union
+from pydantic import BaseModel, Field, field_validator
 from datetime import datetime
+from cortex_runtime.core.conditions import compile_condition
 
 class RetryPolicy(BaseModel):
     max_retries: int = 3
     retry_on_status: List[str] = Field(default_factory=lambda: ["FAILED"])
 
+class ModelRouteConfig(BaseModel):
+    model: str
+    cost_per_1k_tokens: float = 0.0
+
+class RoutingConfig(BaseModel):
+    models: List[ModelRouteConfig]
+    policy: Literal["fastest", "cheapest_within_sla"] = "fastest"
+    sla_ms: Optional[float] = None
+    timeout_ms: Optional[float] = None  # Per-attempt timeout before falling back
+
+class HedgingConfig(BaseModel):
+    percentile: float = 95.0  # Hedge when the call outlives this latency percentile
+    hedge_model: Optional[str] = None  # Model for the duplicate (defaults to the same model)
+    max_hedge_ratio: float = 0.1  # At most this fraction of calls may be hedged
+    min_samples: int = 20  # Latency samples needed before hedging starts
+
 class StepConfig(BaseModel):
     name: str
     type: str = "INSTRUCTION"  # INSTRUCTION, TOOL_USE
     instruction: Optional[str] = None
     tool_name: Optional[str] = None
     inputs: Dict[str, Any] = Field(default_factory=dict)
+    timeout_seconds: Optional[float] = None  # Per-step deadline for the provider/tool call
+    hedge: Optional[bool] = None  # Override the agent's hedging setting for this step
+    when: Optional[str] = None  # Guard over the run context; the step is SKIPPED when it is false
+    stop_if: Optional[str] = None  # Checked after the step; ends the run early when true
+    stop_status: Literal["COMPLETED", "FAILED"] = "COMPLETED"  # Final status of a run ended by stop_if
+    context_steps: List[str] = Field(default_factory=list)  # Prior outputs appended to the prompt ("*" = all)
+    max_context_tokens: Optional[int] = None  # Token budget for prior outputs in this step's prompt
+
+    @field_validator("when", "stop_if")
+    @classmethod
+    def _compile_guard(cls, expression: Optional[str]) -> Optional[str]:
+        # Reject bad guards when the definition is loaded, not mid-run
+        if expression is not None:
+            compile_condition(expression)
+        return expression
     
 class AgentConfig(BaseModel):
     name: str
@@ -19,6 +51,15 @@ class AgentConfig(BaseModel):
     steps: List[StepConfig]
     tools: List[str] = Field(default_factory=list)
     retry_policy: RetryPolicy = Field(default_factory=RetryPolicy)
+    timeout_seconds: Optional[float] = None  # Deadline for the whole run
+    routing: Optional[RoutingConfig] = None  # Route INSTRUCTION steps across several models
+    hedging: Optional[HedgingConfig] = None  # Opt-in hedged requests for INSTRUCTION steps
+    context_token_budget: Optional[int] = None  # Default max_context_tokens for the agent's steps
+
+    @classmethod
+    def from_definition(cls, definition: Dict[str, Any]) -> "AgentConfig":
+        """Build from a parsed definition YAML (either top-level fields or nested under 'agent')"""
+        return cls(**definition.get('agent', definition))
     
 class AgentDefinition(BaseModel):
     id: str
@@ -0,0 +1,100 @@
+from typing import Any, Dict, Iterator, Optional, Tuple
+from datetime import datetime
+
+class _Record:
+    """
+    Slotted record with read-only mapping access (record['field'], .get, 'field' in
+    record, dict(record)), so hot-path rows can stand in for the dicts they replace
+    without a per-instance __dict__.
+    """
+    __slots__ = ()
+    _fields: Tuple[str, ...] = ()
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._fields:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self._fields else default
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._fields
+
+    def keys(self) -> Tuple[str, ...]:
+        return self._fields
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._fields)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in self._fields}
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, _Record):
+            return type(self) is type(other) and self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({', '.join(f'{k}={getattr(self, k)!r}' for k in self._fields)})"
+
+class RunRecord(_Record):
+    """A claimed AGENT_RUNS row"""
+    __slots__ = _fields = ("run_id", "agent_name", "input", "status", "completed_steps")
+
+    def __init__(self, run_id: str, agent_name: str, input: Any = None, status: Optional[str] = None,
+                 completed_steps: int = 0):
+        self.run_id = run_id
+        self.agent_name = agent_name
+        self.input = input if input is not None else {}
+        self.status = status
+        self.completed_steps = completed_steps
+
+class StepResult(_Record):
+    """
+    Outcome of a TOOL_USE step. Has the same attributes as LLMResult
+    (text, tokens_used, latency_ms, model), so the engine reads both alike.
+    """
+    __slots__ = _fields = ("text", "tokens_used", "latency_ms", "model")
+
+    def __init__(self, text: str, tokens_used: int = 0, latency_ms: float = 0.0, model: Optional[str] = None):
+        self.text = text
+        self.tokens_used = tokens_used
+        self.latency_ms = latency_ms
+        self.model = model
+
+class StepLogEntry(_Record):
+    """One AGENT_STEPS row as written by the engine and held by the mock store"""
+    __slots__ = _fields = ("run_id", "step_index", "step_name", "status", "output", "model",
+                           "tokens_used", "latency_ms", "tokens_saved", "executed_at")
+
+    def __init__(self, run_id: str, step_index: int, step_name: str, status: str, output: Any = None,
+                 model: Optional[str] = None, tokens_used: int = 0, latency_ms: float = 0.0,
+                 tokens_saved: int = 0, executed_at: Optional[datetime] = None):
+        self.run_id = run_id
+        self.step_index = step_index
+        self.step_name = step_name
+        self.status = status
+        self.output = output
+        self.model = model
+        self.tokens_used = tokens_used
+        self.latency_ms = latency_ms
+        self.tokens_saved = tokens_saved
+        self.executed_at = executed_at
+
+    @classmethod
+    def from_dict(cls, run_id: str, step_data: Dict[str, Any]) -> "StepLogEntry":
+        return cls(
+            run_id=run_id,
+            step_index=step_data.get('step_index', 0),
+            step_name=step_data.get('step_name'),
+            status=step_data.get('status'),
+            output=step_data.get('output'),
+            model=step_data.get('model'),
+            tokens_used=step_data.get('tokens_used', 0),
+            latency_ms=step_data.get('latency_ms', 0),
+            tokens_saved=step_data.get('tokens_saved', 0),
+            executed_at=step_data.get('executed_at')
+        )
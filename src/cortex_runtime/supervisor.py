@@ -0,0 +1,189 @@
+import os
+import time
+import uuid
+import signal
+import socket
+import threading
+import multiprocessing
+from typing import Callable, Dict, List, Optional
+from cortex_runtime.db.client import DBClient
+from cortex_runtime.db.state import StateManager
+from cortex_runtime.core.adapter import get_llm_provider
+from cortex_runtime.core.engine import ExecutionEngine
+from cortex_runtime.core.logs import get_logger
+
+log = get_logger("supervisor")
+
+# Time a worker needs after its drain timeout to park unfinished runs, flush and exit
+PARK_MARGIN = 15.0
+
+def default_shutdown_timeout() -> float:
+    """Supervisor grace period: the engine's drain timeout (CR_DRAIN_TIMEOUT) plus PARK_MARGIN"""
+    return float(os.getenv('CR_DRAIN_TIMEOUT', 30)) + PARK_MARGIN
+
+def split_workers(total: int, processes: int) -> List[int]:
+    """Distribute a total thread budget across processes (every process gets at least 1)"""
+    base, extra = divmod(max(total, processes), processes)
+    return [base + (1 if i < extra else 0) for i in range(processes)]
+
+def run_worker(worker_id: str, max_workers: int, heartbeat, readiness_port: Optional[int] = None):
+    """
+    Entry point of a single engine worker process.
+    Each worker opens its own Snowflake session and claims runs under its own identity.
+    """
+    # The engine reads CR_MAX_WORKERS, so pin this process's share of the budget
+    os.environ['CR_MAX_WORKERS'] = str(max_workers)
+    if readiness_port is not None:
+        # Likewise CR_READINESS_PORT: each worker serves /ready on its own port
+        os.environ['CR_READINESS_PORT'] = str(readiness_port)
+
+    db_client = DBClient()
+    session = db_client.connect()
+
+    state_manager = StateManager(session, worker_id=worker_id)
+    provider = get_llm_provider("cortex", session)
+    engine = ExecutionEngine(state_manager, provider, max_workers=max_workers)
+
+    def report_heartbeat():
+        while True:
+            heartbeat.value = engine.last_heartbeat
+            time.sleep(1)
+
+    threading.Thread(target=report_heartbeat, daemon=True).start()
+    log.info("Worker %s started with %d threads (pid %d).", worker_id, max_workers, os.getpid())
+    engine.run_agent_loop()
+
+class Supervisor:
+    """
+    Runs N ExecutionEngine worker processes on one box.
+    Restarts workers that crash or stop heartbeating and shuts them down together.
+    """
+    def __init__(
+        self,
+        num_processes: Optional[int] = None,
+        total_workers: Optional[int] = None,
+        target: Callable = run_worker,
+        heartbeat_timeout: Optional[float] = None,
+        shutdown_timeout: Optional[float] = None,
+        start_method: str = "spawn",
+    ):
+        self.num_processes = num_processes or int(os.getenv('CR_WORKER_PROCESSES', os.cpu_count() or 1))
+        # CR_MAX_WORKERS is the thread budget for the whole box, split across processes
+        env_workers = os.getenv('CR_MAX_WORKERS')
+        if total_workers is None:
+            total_workers = int(env_workers) if env_workers else 10 * self.num_processes
+        self.worker_shares = split_workers(total_workers, self.num_processes)
+
+        self.target = target
+        self.heartbeat_timeout = heartbeat_timeout or float(os.getenv('CR_WORKER_HEARTBEAT_TIMEOUT', 60))
+        # Workers must outlive their drain timeout, or they are killed before parking runs
+        self.shutdown_timeout = shutdown_timeout or float(os.getenv('CR_SHUTDOWN_TIMEOUT', 0)) or default_shutdown_timeout()
+        drain_timeout = float(os.getenv('CR_DRAIN_TIMEOUT', 30))
+        if self.shutdown_timeout <= drain_timeout:
+            log.warning("Shutdown timeout %.0fs is not longer than CR_DRAIN_TIMEOUT (%.0fs); "
+                        "workers may be killed before parking their runs.", self.shutdown_timeout, drain_timeout)
+        # Worker slot i serves /ready and /live on CR_READINESS_PORT + i (passed to the
+        # target as readiness_port), so every worker's warm-up can be probed
+        readiness_port = os.getenv('CR_READINESS_PORT')
+        self.readiness_base = int(readiness_port) if readiness_port else None
+        self._ctx = multiprocessing.get_context(start_method)
+        self._running = True
+
+        self._processes: Dict[int, multiprocessing.Process] = {}
+        self._heartbeats: Dict[int, object] = {}
+        self._worker_ids: Dict[int, str] = {}
+        # Crash-loop protection: per-slot restart delay, doubled on fast failures
+        self._restart_delay: Dict[int, float] = {}
+        self._started_at: Dict[int, float] = {}
+        self._restart_at: Dict[int, float] = {}
+        self.restarts = 0
+
+    def _spawn(self, slot: int):
+        worker_id = f"{socket.gethostname()}-w{slot}-{uuid.uuid4().hex[:8]}"
+        heartbeat = self._ctx.Value('d', time.time())
+        process = self._ctx.Process(
+            target=self.target,
+            args=(worker_id, self.worker_shares[slot], heartbeat),
+            kwargs={} if self.readiness_base is None else {"readiness_port": self.readiness_base + slot},
+            name=f"cortex-worker-{slot}",
+            daemon=False,
+        )
+        process.start()
+        self._processes[slot] = process
+        self._heartbeats[slot] = heartbeat
+        self._worker_ids[slot] = worker_id
+        self._started_at[slot] = time.time()
+        log.info("Worker %s started (pid %d, %d threads).", worker_id, process.pid, self.worker_shares[slot])
+
+    def start(self):
+        for slot in range(self.num_processes):
+            self._spawn(slot)
+
+    def _schedule_restart(self, slot: int, reason: str):
+        uptime = time.time() - self._started_at.get(slot, 0)
+        delay = self._restart_delay.get(slot, 0.0)
+        # Workers that die quickly back off exponentially; a healthy run resets the delay
+        delay = min(max(delay * 2, 1.0), 30.0) if uptime < 10 else 0.0
+        self._restart_delay[slot] = delay
+        self._restart_at[slot] = time.time() + delay
+        log.warning("Worker %s %s. Restarting in %.0fs.", self._worker_ids[slot], reason, delay)
+
+    def check_workers(self):
+        """Restart dead or unresponsive workers. Called periodically from run()."""
+        now = time.time()
+        for slot, process in list(self._processes.items()):
+            if slot in self._restart_at:
+                if now >= self._restart_at[slot]:
+                    del self._restart_at[slot]
+                    self.restarts += 1
+                    self._spawn(slot)
+                continue
+
+            if not process.is_alive():
+                self._schedule_restart(slot, f"exited with code {process.exitcode}")
+            elif now - self._heartbeats[slot].value > self.heartbeat_timeout:
+                process.kill()
+                process.join(timeout=5)
+                self._schedule_restart(slot, "stopped heartbeating")
+
+    def _shutdown_handler(self, signum, frame):
+        log.info("Shutdown signal received. Stopping workers...")
+        self._running = False
+
+    def run(self, poll_interval: float = 1.0):
+        signal.signal(signal.SIGINT, self._shutdown_handler)
+        signal.signal(signal.SIGTERM, self._shutdown_handler)
+        self.start()
+        while self._running:
+            self.check_workers()
+            time.sleep(poll_interval)
+        self.shutdown()
+
+    def shutdown(self):
+        """SIGTERM every worker, wait for graceful exit, then kill stragglers"""
+        for process in self._processes.values():
+            if process.is_alive():
+                process.terminate()
+
+        deadline = time.time() + self.shutdown_timeout
+        for process in self._processes.values():
+            process.join(timeout=max(0.0, deadline - time.time()))
+
+        for slot, process in self._processes.items():
+            if process.is_alive():
+                log.warning("Worker %s did not stop in time. Killing.", self._worker_ids[slot])
+                process.kill()
+                process.join()
+        log.info("All workers stopped.")
+
+def main():
+    print("="*60)
+    print("   Cortex Agent Runtime - Worker Supervisor")
+    print("="*60)
+    supervisor = Supervisor()
+    log.info("Starting %d worker processes (%d threads total).",
+             supervisor.num_processes, sum(supervisor.worker_shares))
+    supervisor.run()
+
+if __name__ == "__main__":
+    main()
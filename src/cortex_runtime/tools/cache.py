@@ -0,0 +1,192 @@
+from typing import Any, Callable, Dict, Hashable, Optional
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from cortex_runtime.db.blobs import BlobRef
+
+# key_func(**tool_kwargs) -> hashable key
+KeyFunc = Callable[..., Hashable]
+
+_MISSING = object()
+
+def cacheable(ttl: Optional[float] = None, key_func: Optional[KeyFunc] = None, max_size: int = 1024):
+    """
+    Mark a tool function as pure so ToolRegistry.register memoizes it, e.g. for
+    tools passed to ExecutionEngine(tools={...}).
+    """
+    def mark(func: Callable) -> Callable:
+        func.__tool_cache__ = {"ttl": ttl, "key_func": key_func, "max_size": max_size}
+        return func
+    return mark
+
+def _canonical(value: Any) -> Any:
+    # Offloaded outputs are keyed by their content hash, never materialized
+    if isinstance(value, BlobRef):
+        return {"blob_ref": value.handle}
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return value
+
+def default_key(kwargs: Dict[str, Any]) -> str:
+    """
+    Stable key for tool arguments: canonical JSON, hashed. Raises TypeError for
+    arguments without a canonical JSON form (objects, arrays, ...): their repr can
+    be lossy, so two different inputs could share a key.
+    """
+    raw = json.dumps(_canonical(kwargs), sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class DiskCache:
+    """
+    Local SQLite store behind the in-memory tool caches, so results survive
+    restarts. Shared by all tools of a registry; values are pickled.
+    """
+    def __init__(self, directory: str):
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(Path(directory) / "tool_cache.sqlite"), check_same_thread=False)
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS tool_cache (tool TEXT, key TEXT, value BLOB, expires_at REAL, PRIMARY KEY (tool, key))"
+            )
+            self._conn.commit()
+
+    def get(self, tool: str, key: str) -> Any:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM tool_cache WHERE tool = ? AND key = ?", (tool, key)
+            ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return _MISSING
+        return pickle.loads(row[0]), row[1]
+
+    def put(self, tool: str, key: str, value: Any, expires_at: Optional[float]):
+        try:
+            blob = pickle.dumps(value)
+        except Exception:
+            return  # Not picklable: kept in memory only
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO tool_cache VALUES (?, ?, ?, ?)", (tool, key, blob, expires_at))
+            self._conn.commit()
+
+    def clear(self, tool: Optional[str] = None):
+        with self._lock:
+            if tool is None:
+                self._conn.execute("DELETE FROM tool_cache")
+            else:
+                self._conn.execute("DELETE FROM tool_cache WHERE tool = ?", (tool,))
+            self._conn.commit()
+
+class ToolCache:
+    """
+    Bounded LRU of one tool's results with an optional TTL, shared across worker
+    threads. Concurrent misses on the same key wait for a single call instead of
+    all running the tool. Errors are never cached.
+    """
+    def __init__(self, name: str, max_size: int = 1024, ttl: Optional[float] = None,
+                 key_func: Optional[KeyFunc] = None, disk: Optional[DiskCache] = None):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.key_func = key_func
+        self.disk = disk
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (value, expires_at)
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self._entries[key]
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def _store(self, key: Hashable, value: Any, expires_at: Optional[float]):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_or_call(self, key: Hashable, call: Callable[[], Any]) -> Any:
+        with self._lock:
+            value = self._lookup(key)
+            if value is not _MISSING:
+                self.hits += 1
+                return value
+            pending = self._inflight.get(key)
+            if pending is None:
+                pending = self._inflight[key] = Future()
+                owner = True
+            else:
+                owner = False
+                self.hits += 1
+
+        if not owner:
+            return pending.result()
+
+        try:
+            stored = self.disk.get(self.name, str(key)) if self.disk is not None else _MISSING
+            from_disk = stored is not _MISSING
+            if from_disk:
+                value, expires_at = stored
+            else:
+                value = call()
+                expires_at = time.time() + self.ttl if self.ttl is not None else None
+                if self.disk is not None:
+                    self.disk.put(self.name, str(key), value, expires_at)
+        except BaseException as e:
+            with self._lock:
+                self.misses += 1
+                del self._inflight[key]
+            pending.set_exception(e)
+            raise
+
+        with self._lock:
+            if from_disk:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self._store(key, value, expires_at)
+            del self._inflight[key]
+        pending.set_result(value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.disk is not None:
+            self.disk.clear(self.name)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+def disk_from_env() -> Optional[DiskCache]:
+    """Local persistence when CR_TOOL_CACHE_DIR is set"""
+    directory = os.getenv('CR_TOOL_CACHE_DIR')
+    return DiskCache(directory) if directory else None
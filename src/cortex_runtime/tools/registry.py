@@ -1,13 +1,42 @@
-from typing import Dict, Callable, Any, Optional
+from typing import Dict, Callable, Any, List, Optional
 import inspect
+from cortex_runtime.db.blobs import resolve
+from cortex_runtime.tools.cache import DiskCache, KeyFunc, ToolCache, default_key, disk_from_env
 
 class ToolRegistry:
-    def __init__(self):
+    def __init__(self, disk_cache: Optional[DiskCache] = None):
         self._tools: Dict[str, Callable] = {}
+        self._params: Dict[str, List[str]] = {}
+        self._caches: Dict[str, ToolCache] = {}
+        self._disk_cache = disk_cache if disk_cache is not None else disk_from_env()
 
-    def register(self, name: str, func: Callable):
-        """Register a python function as a tool"""
+    def register(self, name: str, func: Callable, cacheable: bool = False, ttl: Optional[float] = None,
+                 key_func: Optional[KeyFunc] = None, max_size: int = 1024):
+        """
+        Register a python function as a tool.
+        Pure tools can be registered with cacheable=True (or decorated with
+        tools.cache.cacheable) so repeat calls with the same arguments are served
+        from a bounded LRU for ttl seconds (forever if None). key_func(**kwargs)
+        overrides the default key, a hash of the arguments; without a key_func, calls
+        with non-JSON arguments are not cached.
+        """
         self._tools[name] = func
+        # Signature introspection once per tool, not once per call
+        sig = inspect.signature(func)
+        self._params[name] = [p.name for p in sig.parameters.values() if p.kind in (inspect.Parameter.POSITIONAL_OR_KEYWORD, inspect.Parameter.KEYWORD_ONLY)]
+
+        options = getattr(func, "__tool_cache__", None)
+        if cacheable or options:
+            options = options or {}
+            self._caches[name] = ToolCache(
+                name,
+                max_size=options.get("max_size", max_size),
+                ttl=options.get("ttl", ttl),
+                key_func=options.get("key_func", key_func),
+                disk=self._disk_cache
+            )
+        else:
+            self._caches.pop(name, None)
 
     def get_tool(self, name: str) -> Optional[Callable]:
         return self._tools.get(name)
@@ -21,15 +50,55 @@ class ToolRegistry:
         if not func:
             raise ValueError(f"Tool '{name}' not found in registry.")
 
-        # Simple signature introspection to match args
-        sig = inspect.signature(func)
-        
-        # If function takes **kwargs or a single Dict, pass raw input
-        # Otherwise, try to unpack
+        # Pass kwargs that match the signature
+        valid_params = self._params[name]
         try:
-             # Basic implementation: pass kwargs that match signature
-             valid_params = [p.name for p in sig.parameters.values() if p.kind in (inspect.Parameter.POSITIONAL_OR_KEYWORD, inspect.Parameter.KEYWORD_ONLY)]
              filtered_input = {k: v for k, v in input_data.items() if k in valid_params}
-             return func(**filtered_input)
+             cache = self._caches.get(name)
+             if cache is None:
+                 # Offloaded outputs are only materialized for the params the tool actually takes
+                 return func(**{k: resolve(v) for k, v in filtered_input.items()})
+
+             # The default key uses blob handles, so cache hits never read offloaded outputs
+             resolved = None
+             if cache.key_func is not None:
+                 resolved = {k: resolve(v) for k, v in filtered_input.items()}
+                 key = cache.key_func(**resolved)
+             else:
+                 try:
+                     key = default_key(filtered_input)
+                 except (TypeError, ValueError):
+                     # No canonical key for these arguments (and no key_func): run uncached
+                     return func(**{k: resolve(v) for k, v in filtered_input.items()})
+
+             def call():
+                 return func(**(resolved if resolved is not None else {k: resolve(v) for k, v in filtered_input.items()}))
+             return cache.get_or_call(key, call)
         except Exception as e:
             raise RuntimeError(f"Error executing tool '{name}': {e}")
+
+    def warm_up(self) -> Dict[str, str]:
+        """
+        Run each tool's optional warm_up() hook (open clients, load reference data)
+        before the first run needs it. Returns "ok" or the error per tool with a hook.
+        """
+        results = {}
+        for name, func in self._tools.items():
+            hook = getattr(func, "warm_up", None)
+            if not callable(hook):
+                continue
+            try:
+                hook()
+                results[name] = "ok"
+            except Exception as e:
+                results[name] = f"{type(e).__name__}: {e}"
+        return results
+
+    def cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Hit-rate metrics per cacheable tool"""
+        return {name: cache.stats() for name, cache in self._caches.items()}
+
+    def clear_cache(self, name: Optional[str] = None):
+        for tool_name, cache in self._caches.items():
+            if name is None or tool_name == name:
+                cache.clear()
@@ -0,0 +1,77 @@
+import pytest
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+pytest.importorskip("pyarrow")
+
+from cortex_runtime.analytics.export import ParquetExporter
+from cortex_runtime.analytics import stats
+from cortex_runtime.db.state import StateManager
+
+def seed(state_manager):
+    for run_id, agent in [("r1", "invoice"), ("r2", "invoice"), ("r3", "support")]:
+        state_manager.mock_add_run({
+            "run_id": run_id, "agent_name": agent, "status": "COMPLETED",
+            "input": {}, "created_at": datetime(2026, 10, 1, 12)
+        })
+    steps = [
+        ("r1", "extract", "llama", 100, 200.0),
+        ("r1", "summarize", "mistral", 50, 400.0),
+        ("r2", "extract", "llama", 300, 600.0),
+        ("r3", "answer", "llama", 10, 50.0),
+    ]
+    for i, (run_id, name, model, tokens, latency) in enumerate(steps):
+        state_manager.log_step(run_id, {
+            "step_index": i, "step_name": name, "status": "SUCCESS", "output": "x",
+            "model": model, "tokens_used": tokens, "latency_ms": latency
+        })
+
+def test_export_partitions_by_date_and_agent(tmp_path):
+    state_manager = StateManager(session=None)
+    seed(state_manager)
+    exporter = ParquetExporter(state_manager, str(tmp_path))
+
+    step_files = exporter.export_steps()
+    run_files = exporter.export_runs()
+
+    assert len(step_files) == 2 # one per agent (all logged today)
+    assert any("agent_name=invoice" in f for f in step_files)
+    assert len(run_files) == 2
+    assert all("date=2026-10-01" in f for f in run_files)
+
+    steps = stats.load(str(tmp_path), "steps")
+    assert steps.num_rows == 4
+    assert set(steps["agent_name"].to_pylist()) == {"invoice", "support"}
+
+def test_step_stats_aggregates(tmp_path):
+    state_manager = StateManager(session=None)
+    seed(state_manager)
+    ParquetExporter(state_manager, str(tmp_path)).export_steps()
+
+    steps = stats.load(str(tmp_path), "steps")
+    result = stats.step_stats(steps, by=["agent_name", "step_name"],
+                              cost_per_1k_tokens={"llama": 1.0, "mistral": 2.0}).to_pylist()
+
+    extract = next(r for r in result if r["agent_name"] == "invoice" and r["step_name"] == "extract")
+    assert extract["latency_ms_count"] == 2
+    assert extract["latency_ms_mean"] == pytest.approx(400.0)
+    assert extract["latency_ms_max"] == 600.0
+    assert extract["tokens_used_sum"] == 400
+    assert extract["cost_sum"] == pytest.approx(0.4)
+
+    summarize = next(r for r in result if r["step_name"] == "summarize")
+    assert summarize["cost_sum"] == pytest.approx(0.1)
+
+def test_run_status_counts(tmp_path):
+    state_manager = StateManager(session=None)
+    seed(state_manager)
+    ParquetExporter(state_manager, str(tmp_path)).export_runs()
+
+    counts = stats.run_status_counts(stats.load(str(tmp_path), "runs")).to_pylist()
+    assert counts == [
+        {"agent_name": "invoice", "status": "COMPLETED", "run_id_count": 2},
+        {"agent_name": "support", "status": "COMPLETED", "run_id_count": 1},
+    ]
@@ -0,0 +1,177 @@
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from cortex_runtime.core.batch import BatchRunner
+from cortex_runtime.core.engine import ExecutionEngine
+from cortex_runtime.core.adapter import CortexProvider, LLMResult
+from cortex_runtime.db.blobs import LocalBlobStore
+from cortex_runtime.db.state import StateManager
+from cortex_runtime.models.agent import AgentConfig
+
+class BatchProvider:
+    """Deterministic provider that counts set-based and single calls"""
+    def __init__(self):
+        self.batch_calls = 0
+        self.single_calls = 0
+
+    def _result(self, prompt, model):
+        return LLMResult(text=f"{model}:{prompt}", tokens_used=len(prompt.split()), latency_ms=1)
+
+    def generate(self, prompt, model, config):
+        self.single_calls += 1
+        return self._result(prompt, model)
+
+    def generate_batch(self, prompts, model, config):
+        self.batch_calls += 1
+        return [self._result(p, model) for p in prompts]
+
+def validate_math(total: int, lines: list) -> str:
+    return "OK" if sum(lines) == total else "MISMATCH"
+
+AGENT = AgentConfig(name="invoice_agent", model="m", steps=[
+    {"name": "validate_math", "type": "TOOL_USE", "tool_name": "validate_math",
+     "stop_if": "validate_math != 'OK'", "stop_status": "FAILED"},
+    {"name": "classify", "instruction": "Classify invoice {{ invoice_id }}"},
+    {"name": "summary", "instruction": "Summarize {{ classify }}", "when": "total > 100"}
+])
+
+def invoices(n):
+    return [{"invoice_id": f"inv-{i}", "total": i * 10, "lines": [i * 10] if i % 4 else [1]} for i in range(n)]
+
+def test_batch_matches_per_run_semantics():
+    rows = invoices(40)
+
+    # Per-run reference
+    ref_state = StateManager(session=None)
+    engine = ExecutionEngine(ref_state, BatchProvider(), tools={"validate_math": validate_math})
+    for i, row in enumerate(rows):
+        ref_state.mock_add_run({"run_id": f"r{i}", "agent_name": "invoice_agent", "status": "PENDING",
+                                "mock_config": AGENT, "input": row})
+        engine.execute_run(ref_state._mock_runs[f"r{i}"])
+
+    state_manager = StateManager(session=None)
+    provider = BatchProvider()
+    runner = BatchRunner(state_manager, provider, engine.tool_registry, chunk_size=16)
+    results = runner.run(AGENT, rows, run_ids=[f"r{i}" for i in range(len(rows))])
+
+    def trace(state):
+        return sorted((s['run_id'], s['step_index'], s['status'], s['output']) for s in state._mock_steps)
+
+    assert trace(state_manager) == trace(ref_state)
+    assert [r["status"] for r in results] == [ref_state._mock_runs[f"r{i}"]["status"] for i in range(len(rows))]
+    assert {rid: run["status"] for rid, run in state_manager._mock_runs.items()} == \
+        {rid: run["status"] for rid, run in ref_state._mock_runs.items()}
+    # 30 rows pass validation and 22 of them need a summary: ceil(n / 16) set-based calls per step
+    assert provider.single_calls == 0
+    assert provider.batch_calls == 2 + 2
+    assert results[13]["outputs"]["summary"] == "m:Summarize m:Classify invoice inv-13"
+
+def test_failed_chunk_fails_only_its_runs():
+    class FlakyProvider(BatchProvider):
+        def generate_batch(self, prompts, model, config):
+            if any("inv-0" in p for p in prompts):
+                raise ConnectionError("warehouse hiccup")
+            return super().generate_batch(prompts, model, config)
+
+    agent = AgentConfig(name="simple", model="m", steps=[{"name": "classify", "instruction": "Classify {{ invoice_id }}"}])
+    state_manager = StateManager(session=None)
+    results = BatchRunner(state_manager, FlakyProvider(), chunk_size=5).run(agent, invoices(10))
+    assert [r["status"] for r in results] == ["FAILED"] * 5 + ["COMPLETED"] * 5
+    assert len(state_manager._mock_steps) == 5
+    # Failed runs carry their error class, like engine runs (recovery filters on it)
+    assert state_manager._mock_runs[results[0]["run_id"]]["error_message"] == "ConnectionError: warehouse hiccup"
+    assert state_manager._mock_runs[results[9]["run_id"]]["error_message"] is None
+
+def test_batch_from_engine_routes_breaks_and_offloads(tmp_path):
+    class RoutedProvider(BatchProvider):
+        def generate_batch(self, prompts, model, config):
+            if model == "primary":
+                raise ConnectionError("primary down")
+            return [LLMResult(text="x" * 2000, tokens_used=1, latency_ms=1) for _ in prompts]
+
+    state_manager = StateManager(session=None)
+    engine = ExecutionEngine(state_manager, RoutedProvider(), blob_store=LocalBlobStore(str(tmp_path)))
+    engine.blob_threshold = 1024
+    agent = AgentConfig(name="routed", model="primary", steps=[{"name": "draft", "instruction": "Draft {{ invoice_id }}"}],
+                        routing={"models": [{"model": "primary"}, {"model": "backup"}]})
+
+    results = BatchRunner.from_engine(engine, chunk_size=5).run(agent, invoices(10))
+
+    assert [r["status"] for r in results] == ["COMPLETED"] * 10
+    assert {s["model"] for s in state_manager._mock_steps} == {"backup"}
+    assert all("blob_ref" in s["output"] for s in state_manager._mock_steps)
+    assert str(results[0]["outputs"]["draft"]) == "x" * 2000
+    assert engine.get_metrics()["breakers"]["model:primary"]["consecutive_failures"] >= 1
+
+class FilteredTable:
+    """Snowpark-style DataFrame recording what was pushed down"""
+    def __init__(self, rows):
+        self.rows = rows
+        self.pushed = []
+
+    def filter(self, expr):
+        self.pushed.append(("filter", expr))
+        return self
+
+    def select(self, *columns):
+        self.pushed.append(("select", columns))
+        return self
+
+    def collect(self):
+        return [type("Row", (), {"as_dict": lambda self, row=row: row})() for row in self.rows]
+
+def test_batch_pushes_filters_into_the_query():
+    # Upper-case, as Snowpark returns unquoted column names
+    table = FilteredTable([{"INVOICE_ID": "inv-1"}])
+    agent = AgentConfig(name="simple", model="m", steps=[{"name": "classify", "instruction": "Classify {{ invoice_id }}"}])
+
+    results = BatchRunner(StateManager(session=None), BatchProvider()).run(
+        agent, table, where="total > 100", columns=["invoice_id"])
+
+    assert table.pushed == [("filter", "total > 100"), ("select", ("invoice_id",))]
+    assert len(results) == 1
+    assert results[0]["outputs"]["classify"] == "m:Classify inv-1"
+    with pytest.raises(ValueError):
+        BatchRunner(StateManager(session=None), BatchProvider()).run(agent, invoices(2), where="total > 100")
+
+class FakeFrame:
+    def __init__(self, session, data):
+        self.session = session
+        self.data = data
+
+    def select(self, *columns):
+        self.session.queries += 1
+        return self
+
+    def collect(self):
+        return [{"IDX": idx, "COMPLETION": f"done {prompt}"} for idx, prompt in self.data]
+
+class FakeSession:
+    def __init__(self):
+        self.queries = 0
+
+    def create_dataframe(self, data, schema):
+        return FakeFrame(self, data)
+
+    def sql(self, query, params=None):
+        self.queries += 1
+        return FakeFrame(self, [(0, params[1])])
+
+def test_cortex_generate_batch_is_one_query():
+    pytest.importorskip("snowflake.snowpark.functions")
+    session = FakeSession()
+    results = CortexProvider(session).generate_batch(["a b", "c"], "llama3.1-70b", {})
+    assert session.queries == 1
+    assert [r.text for r in results] == ["done a b", "done c"]
+    assert results[0].tokens_used == 2 + 3
+
+def test_cortex_generate_matches_generate_batch():
+    pytest.importorskip("snowflake.snowpark.functions")
+    session = FakeSession()
+    provider = CortexProvider(session)
+    single = provider.generate("a b", "llama3.1-70b", {})
+    batched = provider.generate_batch(["a b"], "llama3.1-70b", {})[0]
+    assert (single.text, single.tokens_used, single.model) == (batched.text, batched.tokens_used, batched.model)
@@ -0,0 +1,62 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from cortex_runtime.core.engine import ExecutionEngine
+from cortex_runtime.db.blobs import LocalBlobStore, BlobRef, offload
+from cortex_runtime.db.state import StateManager
+from cortex_runtime.core.adapter import LLMResult
+from cortex_runtime.models.agent import AgentConfig
+
+class LargeOutputProvider:
+    def generate(self, prompt, model, config):
+        return LLMResult(text="x" * 5000, tokens_used=1, latency_ms=0)
+
+def document_length(extract: str) -> int:
+    return len(extract)
+
+def test_local_blob_store_roundtrip(tmp_path):
+    store = LocalBlobStore(str(tmp_path))
+    handle = store.put("hello blob")
+
+    assert store.put("hello blob") == handle # content addressed, stored once
+    assert store.get(handle) == "hello blob"
+
+    assert offload(store, "small", threshold=100) == "small"
+    ref = offload(store, "y" * 200, threshold=100)
+    assert isinstance(ref, BlobRef)
+    assert ref.size == 200
+    assert ref.read() == "y" * 200
+
+def test_engine_offloads_large_outputs(tmp_path):
+    state_manager = StateManager(session=None)
+    engine = ExecutionEngine(
+        state_manager,
+        LargeOutputProvider(),
+        tools={"document_length": document_length},
+        blob_store=LocalBlobStore(str(tmp_path))
+    )
+    engine.blob_threshold = 1024
+
+    config = AgentConfig(name="doc_agent", model="test", steps=[
+        {"name": "extract", "instruction": "extract the document"},
+        {"name": "measure", "type": "TOOL_USE", "tool_name": "document_length"}
+    ])
+    state_manager.mock_add_run({
+        "run_id": "blob_run",
+        "agent_name": "doc_agent",
+        "status": "PENDING",
+        "mock_config": config,
+        "input": {}
+    })
+
+    engine.execute_run(state_manager._mock_runs["blob_run"])
+
+    steps = state_manager._mock_steps
+    assert state_manager._mock_runs["blob_run"]["status"] == "COMPLETED"
+    # The large output is logged by reference
+    assert steps[0]['output']['size'] == 5000
+    assert "blob_ref" in steps[0]['output']
+    # The tool received the materialized text
+    assert steps[1]['output'] == "5000"
@@ -0,0 +1,80 @@
+import sys
+import time
+import threading
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from cortex_runtime.core.engine import ExecutionEngine
+from cortex_runtime.db.state import StateManager
+from cortex_runtime.core.adapter import LLMResult
+from cortex_runtime.models.agent import AgentConfig
+
+class SlowProvider:
+    """Blocks until released, like a stuck Cortex call"""
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+
+    def generate(self, prompt, model, config):
+        self.started.set()
+        self.release.wait(10)
+        return LLMResult(text="late", tokens_used=0, latency_ms=0)
+
+def make_engine(provider, steps, **config_kwargs):
+    state_manager = StateManager(session=None)
+    engine = ExecutionEngine(state_manager, provider, max_workers=2)
+    config = AgentConfig(name="slow_agent", model="test", steps=steps, **config_kwargs)
+    state_manager.mock_add_run({
+        "run_id": "slow_run",
+        "agent_name": "slow_agent",
+        "status": "PENDING",
+        "mock_config": config,
+        "input": {}
+    })
+    return engine, state_manager
+
+def test_step_timeout_fails_run():
+    provider = SlowProvider()
+    engine, state_manager = make_engine(provider, [
+        {"name": "s1", "instruction": "hang", "timeout_seconds": 0.2}
+    ])
+
+    start = time.time()
+    engine.execute_run(state_manager._mock_runs["slow_run"])
+    provider.release.set()
+
+    assert time.time() - start < 5
+    assert state_manager._mock_runs["slow_run"]["status"] == "FAILED"
+
+def test_cancel_interrupts_inflight_call():
+    provider = SlowProvider()
+    engine, state_manager = make_engine(provider, [
+        {"name": "s1", "instruction": "hang"},
+        {"name": "s2", "instruction": "never runs"}
+    ])
+
+    engine.submit_run(state_manager._mock_runs["slow_run"])
+    assert provider.started.wait(5)
+    assert engine.cancel_run("slow_run")
+
+    assert engine.wait_for_run("slow_run", timeout=5) == "CANCELLED"
+    assert len(state_manager._mock_steps) == 0
+    provider.release.set()
+
+def test_shutdown_drain_parks_unfinished_runs():
+    provider = SlowProvider()
+    engine, state_manager = make_engine(provider, [
+        {"name": "s1", "instruction": "hang"}
+    ])
+    engine.drain_timeout = 0.1
+
+    engine.submit_run(state_manager._mock_runs["slow_run"])
+    assert provider.started.wait(5)
+
+    # Loop exits immediately and drains
+    engine._running = False
+    engine.run_agent_loop()
+    provider.release.set()
+
+    assert state_manager._mock_runs["slow_run"]["status"] == "PENDING"
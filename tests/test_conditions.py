@@ -0,0 +1,118 @@
+import pytest
+import sys
+from pathlib import Path
+from pydantic import ValidationError
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from cortex_runtime.core.conditions import evaluate, ConditionError, compile_condition
+from cortex_runtime.core.engine import ExecutionEngine
+from cortex_runtime.core.replay import ReplayEngine
+from cortex_runtime.core.adapter import LLMResult
+from cortex_runtime.db.state import StateManager
+from cortex_runtime.models.agent import AgentConfig, StepConfig
+
+class CountingProvider:
+    def __init__(self):
+        self.prompts = []
+
+    def generate(self, prompt, model, config):
+        self.prompts.append(prompt)
+        return LLMResult(text=f"summary of {len(self.prompts)}", tokens_used=5, latency_ms=1)
+
+def validate_math(total: int, lines: list) -> str:
+    return "OK" if sum(lines) == total else "MISMATCH"
+
+INVOICE_AGENT = AgentConfig(name="invoice_agent", model="m", steps=[
+    {"name": "validate_math", "type": "TOOL_USE", "tool_name": "validate_math",
+     "stop_if": "validate_math != 'OK'", "stop_status": "FAILED"},
+    {"name": "classify", "instruction": "classify"},
+    {"name": "generate_summary", "instruction": "summarize", "when": "total > 1000"}
+])
+
+def run(engine, state_manager, run_id, run_input, config=INVOICE_AGENT, **extra):
+    state_manager.mock_add_run(dict({"run_id": run_id, "agent_name": config.name, "status": "PENDING",
+                                     "mock_config": config, "input": run_input}, **extra))
+    engine.execute_run(state_manager._mock_runs[run_id])
+    return state_manager._mock_runs[run_id]["status"]
+
+def steps_of(state_manager, run_id):
+    return [(s['step_name'], s['status']) for s in state_manager._mock_steps if s['run_id'] == run_id]
+
+def test_expressions():
+    context = {"total": 1200, "status": "Invalid total", "parsed": '{"ok": false, "items": [1, 2]}'}
+    assert evaluate("total > 1000 and 'invalid' in status.lower()", context)
+    assert evaluate("not json(parsed)['ok'] and len(json(parsed)['items']) == 2", context)
+    assert evaluate("missing_step is None", context)
+    assert not evaluate("json(parsed)['nope']", context)
+    assert compile_condition("total > 1") is compile_condition("total > 1")
+
+@pytest.mark.parametrize("expression", [
+    "__import__('os').system('true')",
+    "total.__class__",
+    "open('x')",
+    "[x for x in total]",
+    "lambda: 1",
+    "total >",
+])
+def test_unsafe_or_invalid_expressions_rejected(expression):
+    with pytest.raises(ConditionError):
+        compile_condition(expression)
+
+def test_bad_guard_rejected_at_definition_load():
+    with pytest.raises(ValidationError):
+        StepConfig(name="s", when="__import__('os')")
+
+@pytest.mark.parametrize("status", ["PENDING", "RUNNING", "CANCELLED", "completed"])
+def test_stop_status_must_be_terminal(status):
+    # Anything else would leave a stopped run claimable or in an undefined state
+    with pytest.raises(ValidationError):
+        StepConfig(name="s", stop_if="True", stop_status=status)
+
+def test_skips_and_early_exit():
+    state_manager = StateManager(session=None)
+    provider = CountingProvider()
+    engine = ExecutionEngine(state_manager, provider, tools={"validate_math": validate_math})
+
+    assert run(engine, state_manager, "small", {"total": 30, "lines": [10, 20]}) == "COMPLETED"
+    assert steps_of(state_manager, "small") == [
+        ("validate_math", "SUCCESS"), ("classify", "SUCCESS"), ("generate_summary", "SKIPPED")
+    ]
+
+    # A failed validation short-circuits the run before any LLM call
+    assert run(engine, state_manager, "broken", {"total": 5000, "lines": [1]}) == "FAILED"
+    assert steps_of(state_manager, "broken") == [("validate_math", "SUCCESS")]
+
+    assert run(engine, state_manager, "large", {"total": 3000, "lines": [1000, 2000]}) == "COMPLETED"
+    assert steps_of(state_manager, "large")[-1] == ("generate_summary", "SUCCESS")
+    assert provider.prompts == ["classify", "classify", "summarize"]
+
+def test_resume_restores_context_for_guards():
+    state_manager = StateManager(session=None)
+    provider = CountingProvider()
+    engine = ExecutionEngine(state_manager, provider, tools={"validate_math": validate_math})
+    config = AgentConfig(name="resume_agent", model="m", steps=[
+        {"name": "check", "type": "TOOL_USE", "tool_name": "validate_math"},
+        {"name": "flagged", "instruction": "flag", "when": "check == 'MISMATCH'"},
+        {"name": "summary", "instruction": "summarize", "when": "check == 'OK'"}
+    ])
+    # First two steps were logged before the worker stopped
+    state_manager.log_step("resumed", {"step_index": 0, "step_name": "check", "status": "SUCCESS", "output": "OK"})
+    state_manager.log_step("resumed", {"step_index": 1, "step_name": "flagged", "status": "SKIPPED", "output": None})
+
+    assert run(engine, state_manager, "resumed", {"total": 1, "lines": [1]}, config, completed_steps=2) == "COMPLETED"
+    assert provider.prompts == ["summarize"]
+
+def test_replay_reevaluates_guards():
+    state_manager = StateManager(session=None)
+    engine = ExecutionEngine(state_manager, CountingProvider(), tools={"validate_math": validate_math})
+    run(engine, state_manager, "hist", {"total": 30, "lines": [10, 20]})
+
+    replay = ReplayEngine(state_manager)
+    assert replay.replay_run("hist")["diverged"] is False
+
+    lowered = INVOICE_AGENT.model_copy(deep=True)
+    lowered.steps[2].when = "total > 10"
+    result = replay.replay_run("hist", agent_config=lowered)
+    assert result["diverged"] is True
+    assert [s["source"] for s in result["steps"]] == ["recorded", "recorded", "missing"]
@@ -0,0 +1,70 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from cortex_runtime.core.context import ContextAssembler, allocate, truncate
+from cortex_runtime.core.engine import ExecutionEngine
+from cortex_runtime.core.adapter import LLMResult, estimate_tokens
+from cortex_runtime.db.state import StateManager
+from cortex_runtime.models.agent import AgentConfig, StepConfig
+
+class RecordingProvider:
+    def __init__(self, words_per_output: int = 500):
+        self.prompts = []
+        self.words = words_per_output
+
+    def generate(self, prompt, model, config):
+        self.prompts.append(prompt)
+        return LLMResult(text=" ".join(["word"] * self.words), tokens_used=estimate_tokens(prompt), latency_ms=1)
+
+def test_allocate_keeps_small_items_whole():
+    assert allocate([10, 500, 1000], 300) == [10, 145, 145]
+    assert allocate([10, 20], 100) == [10, 20]
+
+def test_truncate_marks_cut():
+    assert truncate("a b c d e", 3) == "a b ...[truncated]"
+    assert truncate("a b", 3) == "a b"
+
+def test_placeholders_and_context_steps():
+    assembler = ContextAssembler(default_budget=100)
+    step = StepConfig(name="answer", instruction="Answer {{ question }} using the notes.", context_steps=["notes"])
+    context = {"question": "why?", "notes": "short notes", "unused": "x " * 1000}
+    assembled = assembler.assemble(step, context, ["notes", "unused"])
+    assert assembled.prompt == "Answer why? using the notes.\n\nContext:\n[notes]\nshort notes"
+    assert assembled.tokens_saved == 0
+
+def test_plain_instruction_unchanged():
+    step = StepConfig(name="plain", instruction="Just do it")
+    assert ContextAssembler(default_budget=1).assemble(step, {"a": "b " * 50}, ["a"]).prompt == "Just do it"
+
+def test_summarizer_hook_used_over_budget():
+    calls = []
+
+    def summarize(text, max_tokens):
+        calls.append(max_tokens)
+        return "summary"
+
+    assembler = ContextAssembler(default_budget=10, summarizer=summarize)
+    step = StepConfig(name="s", instruction="Go", context_steps=["*"])
+    assembled = assembler.assemble(step, {"a": "w " * 100}, ["a"])
+    assert calls == [10]
+    assert assembled.prompt.endswith("[a]\nsummary")
+    assert assembled.tokens_saved == 99
+
+def test_prompt_size_bounded_across_long_agent():
+    state_manager = StateManager(session=None)
+    provider = RecordingProvider()
+    engine = ExecutionEngine(state_manager, provider)
+    steps = [{"name": f"step_{i}", "instruction": f"Continue {i}", "context_steps": ["*"]} for i in range(12)]
+    config = AgentConfig(name="long_agent", model="m", steps=steps, context_token_budget=800)
+    state_manager.mock_add_run({"run_id": "long", "agent_name": "long_agent", "status": "PENDING", "mock_config": config})
+    engine.execute_run(state_manager._mock_runs["long"])
+
+    assert state_manager._mock_runs["long"]["status"] == "COMPLETED"
+    sizes = [estimate_tokens(p) for p in provider.prompts]
+    # Every prompt stays within budget + instruction + per-output headers, however many steps came before
+    assert max(sizes) < 800 + 50
+    logged = [s for s in state_manager._mock_steps if s["run_id"] == "long"]
+    assert logged[1]["tokens_saved"] == 0
+    assert logged[-1]["tokens_saved"] == 11 * 500 - 800
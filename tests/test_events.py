@@ -0,0 +1,101 @@
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Ensure src is in path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from cortex_runtime.core.engine import ExecutionEngine
+from cortex_runtime.core.events import RunEventBus, WebhookNotifier
+from cortex_runtime.db.state import StateManager
+from cortex_runtime.core.adapter import MockProvider
+from cortex_runtime.models.agent import AgentConfig
+
+def test_run_future_resolves_on_completion():
+    state_manager = StateManager(session=None)
+    engine = ExecutionEngine(state_manager, MockProvider())
+
+    config = AgentConfig(name="test_agent", model="mock", steps=[
+        {"name": "s1", "instruction": "hello"}
+    ])
+    state_manager.mock_add_run({
+        "run_id": "evt_run",
+        "agent_name": "test_agent",
+        "status": "PENDING",
+        "mock_config": config,
+        "input": {}
+    })
+
+    transitions = []
+    engine.on_run_event(lambda run_id, status: transitions.append((run_id, status)))
+    future = engine.run_future("evt_run")
+
+    pending = state_manager.fetch_pending_runs()
+    engine.submit_run(pending[0])
+
+    assert future.result(timeout=5) == 'COMPLETED'
+    assert engine.wait_for_run("evt_run", timeout=1) == 'COMPLETED'
+    assert transitions == [("evt_run", "RUNNING"), ("evt_run", "COMPLETED")]
+
+def test_event_bus_late_waiter_and_resume():
+    bus = RunEventBus()
+    bus.publish("r1", "FAILED")
+
+    # Waiters registered after the terminal event resolve immediately
+    assert bus.wait_for("r1").result(timeout=0) == "FAILED"
+
+    # A resumed run must be waited on again
+    bus.publish("r1", "PENDING")
+    future = bus.wait_for("r1")
+    assert not future.done()
+    bus.publish("r1", "COMPLETED")
+    assert future.result(timeout=0) == "COMPLETED"
+
+def test_subscriber_errors_are_isolated():
+    bus = RunEventBus()
+    seen = []
+
+    def broken(run_id, status):
+        raise RuntimeError("boom")
+
+    bus.subscribe(broken)
+    unsubscribe = bus.subscribe(lambda run_id, status: seen.append(status))
+    bus.publish("r1", "RUNNING")
+    unsubscribe()
+    bus.publish("r1", "COMPLETED")
+
+    assert seen == ["RUNNING"]
+
+def test_webhook_posts_off_the_publishing_thread():
+    received = []
+
+    class SlowEndpoint(BaseHTTPRequestHandler):
+        def do_POST(self):
+            time.sleep(0.3)
+            received.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowEndpoint)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        notifier = WebhookNotifier(f"http://127.0.0.1:{server.server_address[1]}/hook")
+        bus = RunEventBus()
+        bus.subscribe(notifier)
+
+        start = time.time()
+        bus.publish("r1", "RUNNING")  # not a notified status
+        bus.publish("r1", "COMPLETED")
+        assert time.time() - start < 0.2  # the worker didn't wait for the endpoint
+
+        notifier.close(timeout=5)
+        assert received == [{"run_id": "r1", "status": "COMPLETED"}]
+    finally:
+        server.shutdown()
+        server.server_close()
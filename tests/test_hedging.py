@@ -0,0 +1,113 @@
+import pytest
+import sys
+import time
+import threading
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from cortex_runtime.core.engine import ExecutionEngine
+from cortex_runtime.core.adapter import HedgedProvider, LLMResult
+from cortex_runtime.db.state import StateManager
+from cortex_runtime.models.agent import AgentConfig
+
+class TailLatencyProvider:
+    """The first call after arming is slow; everything else is fast"""
+    def __init__(self):
+        self.slow_next = False
+        self.lock = threading.Lock()
+        self.models = []
+
+    def generate(self, prompt, model, config):
+        with self.lock:
+            slow, self.slow_next = self.slow_next, False
+            self.models.append(model)
+        if slow:
+            config["cancel_event"].wait(0.5)
+            return LLMResult(text="slow", tokens_used=5, latency_ms=500)
+        time.sleep(0.01)
+        return LLMResult(text="fast", tokens_used=5, latency_ms=10)
+
+def warm(hedger, n):
+    for _ in range(n):
+        hedger.generate("p", "m", {})
+
+def test_no_hedging_before_enough_samples():
+    provider = TailLatencyProvider()
+    hedger = HedgedProvider(provider, min_samples=5)
+    provider.slow_next = True
+
+    assert hedger.generate("p", "m", {}).text == "slow"
+    assert hedger.metrics()["hedges_fired"] == 0
+
+def test_hedge_fires_and_wins_on_slow_call():
+    provider = TailLatencyProvider()
+    hedger = HedgedProvider(provider, hedge_model="backup", min_samples=5, max_hedge_ratio=0.5)
+    warm(hedger, 5)
+
+    provider.slow_next = True
+    start = time.time()
+    result = hedger.generate("p", "m", {})
+
+    assert result.text == "fast"
+    assert result.model == "backup" # logged as served by the hedge model
+    assert time.time() - start < 0.4 # did not wait for the slow primary
+    assert "backup" in provider.models
+    metrics = hedger.metrics()
+    assert metrics["hedges_fired"] == 1
+    assert metrics["hedges_won"] == 1
+
+def test_close_releases_hedge_threads():
+    hedger = HedgedProvider(TailLatencyProvider())
+    hedger.close()
+    with pytest.raises(RuntimeError):
+        hedger.generate("p", "m", {})
+
+def test_hedge_budget_caps_duplicates():
+    provider = TailLatencyProvider()
+    hedger = HedgedProvider(provider, min_samples=5, max_hedge_ratio=0.0)
+    warm(hedger, 5)
+
+    provider.slow_next = True
+    assert hedger.generate("p", "m", {}).text == "slow"
+    assert hedger.metrics()["hedges_fired"] == 0
+
+def test_engine_hedging_is_opt_in_per_step():
+    state_manager = StateManager(session=None)
+    engine = ExecutionEngine(state_manager, TailLatencyProvider())
+
+    config = AgentConfig(name="hedged_agent", model="m", hedging={"min_samples": 1}, steps=[
+        {"name": "s1", "instruction": "hedged"},
+        {"name": "s2", "instruction": "not hedged", "hedge": False}
+    ])
+    state_manager.mock_add_run({
+        "run_id": "hedge_run",
+        "agent_name": "hedged_agent",
+        "status": "PENDING",
+        "mock_config": config,
+        "input": {}
+    })
+
+    engine.execute_run(state_manager._mock_runs["hedge_run"])
+
+    assert state_manager._mock_runs["hedge_run"]["status"] == "COMPLETED"
+    assert engine.hedge_metrics()["hedged_agent"]["calls"] == 1
+
+def test_queue_time_is_not_primary_latency():
+    provider = TailLatencyProvider()
+    hedger = HedgedProvider(provider, min_samples=100, max_workers=1)
+    # Occupy the only thread so the next call queues behind it
+    blocker = hedger._executor.submit(time.sleep, 0.3)
+    hedger.generate("p", "m", {})
+    blocker.result()
+    deadline = time.time() + 1
+    while hedger.stats.samples < 1 and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert hedger.stats.percentile(50) < 200
+
+def test_engine_sizes_hedge_threads_to_workers(monkeypatch):
+    monkeypatch.delenv("CR_MAX_WORKERS", raising=False)
+    engine = ExecutionEngine(StateManager(session=None), TailLatencyProvider(), max_workers=24)
+    config = AgentConfig(name="hedged_agent", model="m", hedging={}, steps=[{"name": "s1", "instruction": "hi"}])
+    assert engine.hedged_provider_for(config)._executor._max_workers == 48
@@ -0,0 +1,71 @@
+import pytest
+import sys
+import json
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from cortex_runtime.core import logs
+from cortex_runtime.core.engine import ExecutionEngine
+from cortex_runtime.core.adapter import MockProvider
+from cortex_runtime.db.state import StateManager
+from cortex_runtime.models.agent import AgentConfig
+
+@pytest.fixture
+def json_logs(capsys):
+    logs.configure(fmt="json", level="INFO", component_levels={}, sample_rate=1.0, force=True)
+
+    def read():
+        logs.shutdown()  # flush the background writer
+        return [json.loads(line) for line in capsys.readouterr().out.splitlines() if line.startswith("{")]
+
+    yield read
+    logs.configure(force=True)
+
+def echo_tool(input: str) -> str:
+    logs.get_logger("tools").info("tool called")
+    return input
+
+def test_run_and_step_correlation(json_logs):
+    state_manager = StateManager(session=None)
+    engine = ExecutionEngine(state_manager, MockProvider(), tools={"echo_tool": echo_tool})
+    config = AgentConfig(name="log_agent", model="m", steps=[
+        {"name": "think", "instruction": "think"},
+        {"name": "echo", "type": "TOOL_USE", "tool_name": "echo_tool"}
+    ])
+    state_manager.mock_add_run({"run_id": "run_log_1", "agent_name": "log_agent", "status": "PENDING",
+                                "mock_config": config, "input": {"input": "hi"}})
+    engine.execute_run(state_manager._mock_runs["run_log_1"])
+
+    records = json_logs()
+    run_records = [r for r in records if r.get("run_id") == "run_log_1"]
+    assert any(r["component"] == "runtime" and "Executing Run" in r["msg"] for r in run_records)
+    assert any(r["component"] == "db" for r in run_records)
+    # The tool runs on the call executor and still carries the run and step IDs
+    tool_record = next(r for r in records if r["component"] == "tools")
+    assert tool_record["run_id"] == "run_log_1"
+    assert tool_record["step"] == "echo"
+
+def test_component_levels_and_sampling(capsys):
+    logs.configure(fmt="json", level="INFO", component_levels={"db": "WARNING"}, sample_rate=0.0, force=True)
+    try:
+        logs.get_logger("db").info("db info")
+        logs.get_logger("db").warning("db warning")
+        runtime = logs.get_logger("runtime")
+        runtime.info("per step", extra={"sampled": True})
+        runtime.info("run started")
+        runtime.warning("step slow", extra={"sampled": True})
+        logs.shutdown()
+        messages = [json.loads(line)["msg"] for line in capsys.readouterr().out.splitlines()]
+    finally:
+        logs.get_logger("db").setLevel("NOTSET")
+        logs.configure(force=True)
+
+    assert messages == ["db warning", "run started", "step slow"]
+
+def test_bind_resets_after_block():
+    with logs.bind(run_id="r1", step="s1"):
+        with logs.bind(step="s2"):
+            assert (logs._run_id.get(), logs._step.get()) == ("r1", "s2")
+        assert logs._step.get() == "s1"
+    assert (logs._run_id.get(), logs._step.get()) == (None, None)
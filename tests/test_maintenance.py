@@ -0,0 +1,121 @@
+import pytest
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from cortex_runtime.db.maintenance import Maintenance
+from cortex_runtime.db.state import StateManager
+
+NOW = datetime.utcnow()
+
+def seed(state_manager):
+    runs = [
+        ("old_done", "COMPLETED", 90), ("old_failed", "FAILED", 45),
+        ("recent_done", "COMPLETED", 1), ("old_running", "RUNNING", 90), ("old_pending", "PENDING", 90),
+    ]
+    for run_id, status, age in runs:
+        state_manager.mock_add_run({
+            "run_id": run_id, "agent_name": "invoice", "status": status, "input": {"id": run_id},
+            "created_at": NOW - timedelta(days=age), "updated_at": NOW - timedelta(days=age)
+        })
+        state_manager.log_step(run_id, {"step_index": 0, "step_name": "extract", "status": "SUCCESS", "output": run_id})
+
+def test_archives_only_finished_runs_past_retention():
+    state_manager = StateManager(session=None)
+    seed(state_manager)
+
+    result = Maintenance(state_manager, retention_days=30, target="table", batch_size=1).run_once()
+
+    assert result["archived"] == 2
+    assert set(state_manager._mock_archive["runs"]) == {"old_done", "old_failed"}
+    assert set(state_manager._mock_runs) == {"recent_done", "old_running", "old_pending"}
+    assert {s["run_id"] for s in state_manager._mock_steps} == {"recent_done", "old_running", "old_pending"}
+    assert {s["run_id"] for s in state_manager._mock_archive["steps"]} == {"old_done", "old_failed"}
+
+def test_parquet_target_exports_then_purges(tmp_path):
+    pytest.importorskip("pyarrow")
+    import pyarrow.dataset as ds
+
+    state_manager = StateManager(session=None)
+    seed(state_manager)
+
+    result = Maintenance(state_manager, retention_days=30, target="parquet", out_dir=str(tmp_path)).run_once()
+
+    assert result["archived"] == 2
+    assert state_manager._mock_archive["runs"] == {}
+    assert "old_done" not in state_manager._mock_runs
+    steps = ds.dataset(tmp_path / "archive" / "steps", format="parquet", partitioning="hive").to_table().to_pylist()
+    assert sorted(s["output"] for s in steps) == ['"old_done"', '"old_failed"']
+
+class RecordingSession:
+    def __init__(self, fail_on=None):
+        self.statements = []
+        self.fail_on = fail_on
+
+    def sql(self, query, params=None):
+        self.statements.append(" ".join(query.split()))
+        if self.fail_on and self.fail_on in query:
+            raise RuntimeError("boom")
+        return self
+
+    def collect(self):
+        return []
+
+def test_move_is_transactional():
+    session = RecordingSession(fail_on="DELETE FROM agent_runs")
+    state_manager = StateManager(session)
+
+    assert state_manager.archive_runs(["a", "b"]) == 0
+    assert session.statements[0] == "BEGIN"
+    assert session.statements[1].startswith("INSERT INTO agent_steps_archive")
+    assert session.statements[-1] == "ROLLBACK"
+
+def test_apply_clustering():
+    session = RecordingSession()
+    statements = Maintenance(StateManager(session)).apply_clustering()
+    assert "ALTER TABLE agent_runs CLUSTER BY (status, created_at)" in session.statements
+    assert session.statements == statements
+
+def test_parquet_read_failure_purges_nothing(tmp_path):
+    pytest.importorskip("pyarrow")
+
+    class FlakyState(StateManager):
+        def fetch_steps(self, run_ids, chunk_size=1000, strict=False):
+            if strict:
+                raise ConnectionError("warehouse hiccup")
+            return super().fetch_steps(run_ids, chunk_size)
+
+    state_manager = FlakyState(session=None)
+    seed(state_manager)
+
+    result = Maintenance(state_manager, retention_days=30, target="parquet", out_dir=str(tmp_path)).run_once()
+
+    assert result["archived"] == 0
+    assert {"old_done", "old_failed"} <= set(state_manager._mock_runs)
+    assert len(state_manager._mock_steps) == 5
+
+def test_parquet_purges_only_verified_runs(tmp_path):
+    pytest.importorskip("pyarrow")
+
+    class LossyState(StateManager):
+        def fetch_runs(self, run_ids, chunk_size=1000, strict=False):
+            runs = super().fetch_runs(run_ids, chunk_size, strict)
+            runs.pop("old_failed", None)  # e.g. a row that could not be read back
+            return runs
+
+    state_manager = LossyState(session=None)
+    seed(state_manager)
+
+    result = Maintenance(state_manager, retention_days=30, target="parquet", out_dir=str(tmp_path)).run_once()
+
+    assert result["archived"] == 1
+    assert "old_done" not in state_manager._mock_runs
+    assert "old_failed" in state_manager._mock_runs
+
+def test_retention_cutoff_is_server_side():
+    session = RecordingSession()
+    StateManager(session).finished_run_ids(older_than_days=30, limit=10)
+    query = session.statements[0]
+    assert "updated_at < TIMEADD('second', -?, CURRENT_TIMESTAMP())" in query
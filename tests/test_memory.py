@@ -0,0 +1,93 @@
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+np = pytest.importorskip("numpy")
+
+from cortex_runtime.core.engine import ExecutionEngine
+from cortex_runtime.core.adapter import MockProvider
+from cortex_runtime.db.memory import AgentMemory, LSHIndex, VectorIndex
+from cortex_runtime.db.state import StateManager
+
+def test_vector_index_search():
+    index = VectorIndex()
+    index.add("north", [0.0, 1.0])
+    index.add("east", [1.0, 0.0])
+    index.add("north_east", [1.0, 1.0])
+
+    hits = index.search([0.1, 1.0], k=2)
+    assert [key for key, _ in hits] == ["north", "north_east"]
+    assert hits[0][1] == pytest.approx(0.995, abs=1e-3)
+
+    # Re-adding a key overwrites its vector
+    index.add("north", [-1.0, 0.0])
+    assert index.search([0.1, 1.0], k=1)[0][0] == "north_east"
+    assert len(index) == 3
+
+def test_lsh_index_matches_brute_force_for_near_duplicates():
+    rng = np.random.default_rng(7)
+    vectors = rng.standard_normal((500, 32))
+    brute, lsh = VectorIndex(), LSHIndex(n_bits=8, n_tables=8)
+    for i, v in enumerate(vectors):
+        brute.add(str(i), v)
+        lsh.add(str(i), v)
+
+    query = vectors[42] + 0.01 * rng.standard_normal(32)
+    assert lsh.search(query, k=1)[0][0] == brute.search(query, k=1)[0][0] == "42"
+
+def test_agent_memory_batches_and_reads_through():
+    state_manager = StateManager(session=None)
+    memory = AgentMemory(state_manager, "support_agent", cache_size=2, batch_size=2)
+
+    memory.put("run_1", "customer", {"name": "Acme"}, embedding=[1.0, 0.0])
+    assert state_manager._mock_memory == {} # buffered
+    memory.put("run_1", "product", "widgets", embedding=[0.0, 1.0])
+    assert len(state_manager._mock_memory) == 2 # flushed as one batch
+
+    memory.put("run_1", "region", "EMEA")
+    memory.flush()
+    # "customer" fell out of the LRU cache and is read back from the store
+    assert memory.get("customer") == {"name": "Acme"}
+    assert memory.get("missing", "default") == "default"
+
+    hits = memory.search([0.9, 0.1], k=1)
+    assert hits[0]["key"] == "customer"
+    assert hits[0]["value"] == {"name": "Acme"}
+
+def test_engine_memory_loads_existing_entries():
+    state_manager = StateManager(session=None)
+    state_manager.save_memory("run_0", "fact", "snow is cold", agent_id="kb_agent", embedding=[0.5, 0.5])
+
+    engine = ExecutionEngine(state_manager, MockProvider())
+    memory = engine.get_memory("kb_agent")
+
+    assert engine.get_memory("kb_agent") is memory
+    assert memory.search([1.0, 1.0], k=1)[0]["value"] == "snow is cold"
+
+def test_agent_memory_reads_buffered_entries_evicted_from_cache():
+    state_manager = StateManager(session=None)
+    memory = AgentMemory(state_manager, "support_agent", cache_size=2, batch_size=50)
+
+    for key in ("a", "b", "c"):
+        memory.put("run_1", key, key.upper())
+
+    # "a" left the LRU cache but is only in the write buffer
+    assert state_manager._mock_memory == {}
+    assert memory.get("a") == "A"
+
+def test_agent_memory_keeps_batch_when_save_fails():
+    state_manager = StateManager(session=None)
+    memory = AgentMemory(state_manager, "support_agent", batch_size=50)
+    memory.put("run_1", "customer", "Acme")
+
+    saved = state_manager.save_memories
+    state_manager.save_memories = lambda entries: False
+    assert memory.flush() is False
+    assert memory.get("customer") == "Acme"
+
+    state_manager.save_memories = saved
+    assert memory.flush() is True
+    assert state_manager._mock_memory[("support_agent", "customer")]["value"] == "Acme"
+    assert memory.flush() is True # nothing left to write
@@ -0,0 +1,70 @@
+import sys
+import json
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from cortex_runtime.core.engine import ExecutionEngine
+from cortex_runtime.core.profiling import Profiler
+from cortex_runtime.core.adapter import MockProvider
+from cortex_runtime.db.state import StateManager
+from cortex_runtime.models.agent import AgentConfig
+
+def busy_tool(n: int) -> int:
+    deadline = time.time() + 0.05
+    total = 0
+    while time.time() < deadline:
+        total += sum(range(n))
+    return total
+
+def run_agent(engine, state_manager, run_id):
+    config = AgentConfig(name="busy_agent", model="m", steps=[
+        {"name": "think", "instruction": "think"},
+        {"name": "crunch", "type": "TOOL_USE", "tool_name": "busy_tool"}
+    ])
+    state_manager.mock_add_run({
+        "run_id": run_id,
+        "agent_name": "busy_agent",
+        "status": "PENDING",
+        "mock_config": config,
+        "input": {"n": 100}
+    })
+    engine.execute_run(state_manager._mock_runs[run_id])
+
+def make_engine(tmp_path, mode):
+    state_manager = StateManager(session=None)
+    engine = ExecutionEngine(state_manager, MockProvider(), tools={"busy_tool": busy_tool})
+    engine.profiler = Profiler(output_dir=str(tmp_path), mode=mode)
+    return engine, state_manager
+
+def test_profiling_is_off_by_default(tmp_path):
+    engine, state_manager = make_engine(tmp_path, "cprofile")
+    run_agent(engine, state_manager, "plain_run")
+
+    assert list(tmp_path.iterdir()) == []
+    assert Profiler.current() is None
+
+def test_cprofile_per_agent(tmp_path):
+    engine, state_manager = make_engine(tmp_path, "cprofile")
+    engine.profiler.enable_agent("busy_agent")
+    run_agent(engine, state_manager, "profiled_run")
+
+    assert (tmp_path / "busy_agent-profiled_run.pstats").exists()
+    sections = json.loads((tmp_path / "busy_agent-profiled_run.sections.json").read_text())
+    assert sections["step"]["count"] == 2
+    assert sections["tool"]["count"] == 1
+    assert sections["tool"]["total_ms"] >= 40
+    assert "state" in sections and "provider" in sections
+
+def test_sampling_profiler_per_run(tmp_path):
+    engine, state_manager = make_engine(tmp_path, "sample")
+    engine.profiler.enable_run("sampled_run")
+    run_agent(engine, state_manager, "sampled_run")
+    run_agent(engine, state_manager, "other_run")
+
+    folded = (tmp_path / "busy_agent-sampled_run.folded").read_text()
+    # Stacks from the tool's call thread are captured in collapsed format
+    assert "busy_tool" in folded
+    assert folded.splitlines()[0].rsplit(" ", 1)[1].isdigit()
+    assert not (tmp_path / "busy_agent-other_run.folded").exists()
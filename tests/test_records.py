@@ -0,0 +1,82 @@
+import pickle
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from cortex_runtime.core.adapter import MockProvider
+from cortex_runtime.core.engine import ExecutionEngine
+from cortex_runtime.db.state import StateManager
+from cortex_runtime.models.agent import AgentConfig
+from cortex_runtime.models.records import RunRecord, StepLogEntry, StepResult
+
+def test_records_read_like_dicts():
+    entry = StepLogEntry("r1", 0, "extract", "SUCCESS", output="x", tokens_used=3)
+    assert entry["step_name"] == "extract"
+    assert entry.get("tokens_used") == 3
+    assert entry.get("missing", "default") == "default"
+    assert "output" in entry and "missing" not in entry
+    assert dict(entry, agent_name="a")["agent_name"] == "a"
+    assert not hasattr(entry, "__dict__")
+
+    run = RunRecord("r1", "agent", {"a": 1}, "RUNNING", completed_steps=2)
+    assert run.get("completed_steps", 0) == 2 and "mock_config" not in run
+    assert pickle.loads(pickle.dumps(run)) == run
+    assert StepResult("out").to_dict() == {"text": "out", "tokens_used": 0, "latency_ms": 0.0, "model": None}
+
+def test_mock_retention_evicts_whole_finished_runs(monkeypatch):
+    monkeypatch.setenv("CR_MOCK_STEP_RETENTION", "3")
+    state_manager = StateManager(session=None)
+    engine = ExecutionEngine(state_manager, MockProvider())
+    config = AgentConfig(name="agent", model="m", steps=[{"name": "s1", "instruction": "a"}, {"name": "s2", "instruction": "b"}])
+    for i in range(3):
+        state_manager.mock_add_run({"run_id": f"r{i}", "agent_name": "agent", "status": "PENDING",
+                                    "mock_config": config, "input": {}})
+        engine.execute_run(state_manager._mock_runs[f"r{i}"])
+
+    # Older runs go with all their steps and their checkpoint, never one step at a time
+    assert [(s["run_id"], s["step_name"]) for s in state_manager._mock_steps] == [("r2", "s1"), ("r2", "s2")]
+    assert all(isinstance(s, StepLogEntry) and s["executed_at"] is not None for s in state_manager._mock_steps)
+    assert list(state_manager._mock_runs) == ["r2"] and list(state_manager._mock_checkpoints) == ["r2"]
+
+def test_mock_retention_keeps_live_runs_whole(monkeypatch):
+    monkeypatch.setenv("CR_MOCK_STEP_RETENTION", "2")
+    state_manager = StateManager(session=None)
+    state_manager.mock_add_run({"run_id": "old", "agent_name": "agent", "status": "PENDING", "input": {}})
+    state_manager.log_step("old", {"step_index": 0, "step_name": "s0", "status": "SUCCESS"})
+    state_manager.update_run_status("old", "COMPLETED")
+    state_manager.mock_add_run({"run_id": "r1", "agent_name": "agent", "status": "PENDING", "input": {}})
+    state_manager.log_steps([{"run_id": "r1", "step_index": i, "step_name": f"s{i}", "status": "SUCCESS"} for i in range(3)])
+    state_manager.log_step("r1", {"step_index": 3, "step_name": "s3", "status": "FAILED"})
+
+    assert "old" not in state_manager._mock_runs
+    # The live run is over the limit but intact, so its checkpoint matches its history on resume
+    assert len(state_manager.fetch_steps(["r1"])["r1"]) == 4
+    assert state_manager.fetch_pending_runs(limit=1)[0]["completed_steps"] == 3
+
+class ClaimSession:
+    def __init__(self):
+        self.statements = []
+
+    def sql(self, query, params=None):
+        self.statements.append((query, params))
+        return self
+
+    def collect(self):
+        return [{"RUN_ID": "r1", "AGENT_NAME": "agent", "INPUT": '{"a": 1}', "STATUS": "RUNNING", "COMPLETED_STEPS": 2}]
+
+def test_claim_returns_run_records():
+    runs = StateManager(ClaimSession()).fetch_pending_runs(limit=5)
+    assert runs == [RunRecord("r1", "agent", {"a": 1}, "RUNNING", 2)]
+    assert runs[0]["input"] == {"a": 1}
+
+def test_claim_selects_by_per_poll_token():
+    session = ClaimSession()
+    state_manager = StateManager(session, worker_id="w1")
+    state_manager.fetch_pending_runs(limit=5)
+    state_manager.fetch_pending_runs(limit=5)
+    (update, (first,)), (select, (read_back,)), (_, (second,)), _ = session.statements
+    assert "claimed_by = ?" in update and "claimed_by = ?" in select
+    # Read back by exact token, not by a recent updated_at window
+    assert "updated_at >=" not in select
+    assert read_back == first and first.startswith("w1:") and second != first
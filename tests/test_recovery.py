@@ -0,0 +1,152 @@
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from cortex_runtime.core.adapter import LLMResult
+from cortex_runtime.core.engine import ExecutionEngine
+from cortex_runtime.core.recovery import RecoveryManager, main
+from cortex_runtime.db.state import StateManager
+from cortex_runtime.models.agent import AgentConfig
+
+class OutageProvider:
+    """Fails every call while down"""
+    def __init__(self):
+        self.down = True
+        self.prompts = []
+
+    def generate(self, prompt, model, config):
+        if self.down:
+            raise ConnectionError("provider unavailable")
+        self.prompts.append(prompt)
+        return LLMResult(text=f"done {prompt}", tokens_used=1, latency_ms=1)
+
+def lookup(order_id: str) -> str:
+    return f"order {order_id}"
+
+AGENT = AgentConfig(name="orders", model="m", steps=[
+    {"name": "lookup", "type": "TOOL_USE", "tool_name": "lookup"},
+    {"name": "answer", "instruction": "answer"},
+])
+
+def add_run(state_manager, run_id, status="PENDING", agent="orders", age=0, **extra):
+    at = datetime.utcnow() - timedelta(seconds=age)
+    state_manager.mock_add_run(dict({"run_id": run_id, "agent_name": agent, "status": status, "mock_config": AGENT,
+                                     "input": {"order_id": run_id}, "created_at": at, "updated_at": at}, **extra))
+
+def test_failed_runs_resume_from_checkpoint(monkeypatch):
+    monkeypatch.setenv("CR_BREAKER_FAILURES", "100")  # keep the model circuit closed through the outage
+    state_manager = StateManager(session=None)
+    provider = OutageProvider()
+    engine = ExecutionEngine(state_manager, provider, tools={"lookup": lookup})
+    for i in range(5):
+        add_run(state_manager, f"r{i}")
+    for run in state_manager.fetch_pending_runs(limit=5):
+        engine.execute_run(run)
+
+    failed = state_manager._mock_runs["r0"]
+    assert failed["status"] == "FAILED"
+    assert failed["error_message"].startswith("ConnectionError:")
+
+    recovery = RecoveryManager(state_manager, wave_size=2, wave_interval=0)
+    assert recovery.recover(error_class="TimeoutError")["selected"] == 0
+    summary = recovery.recover(agent_name="orders", error_class="ConnectionError")
+    assert (summary["selected"], summary["requeued"], summary["waves"]) == (5, 5, 3)
+    assert {r["status"] for r in state_manager._mock_runs.values()} == {"PENDING"}
+    assert state_manager._mock_runs["r0"]["error_message"] is None
+
+    provider.down = False
+    for run in state_manager.fetch_pending_runs(limit=5):
+        assert run["completed_steps"] == 1
+        engine.execute_run(run)
+    assert {r["status"] for r in state_manager._mock_runs.values()} == {"COMPLETED"}
+    # Only the failed step was re-run; the tool step was not repeated
+    assert provider.prompts == ["answer"] * 5
+    assert sum(1 for s in state_manager._mock_steps if s["step_name"] == "lookup") == 5
+
+def test_filters_and_stalled_runs():
+    state_manager = StateManager(session=None)
+    add_run(state_manager, "failed_old", "FAILED", age=7200)
+    add_run(state_manager, "failed_other", "FAILED", agent="billing")
+    add_run(state_manager, "cancelled", "CANCELLED")
+    add_run(state_manager, "stalled", "RUNNING", age=7200)
+    add_run(state_manager, "busy", "RUNNING", age=7200)
+    add_run(state_manager, "fresh", "RUNNING")
+    state_manager.log_step("busy", {"step_index": 0, "step_name": "lookup", "status": "SUCCESS", "output": "x"})
+
+    recovery = RecoveryManager(state_manager, wave_interval=0)
+    assert recovery.select(agent_name="orders") == ["failed_old"]
+    assert recovery.select(since=datetime.utcnow() - timedelta(hours=1)) == ["failed_other"]
+    assert recovery.select(statuses=["CANCELLED"]) == ["cancelled"]
+    assert recovery.select(statuses=[], stalled_for=3600) == ["stalled"]
+
+    # The UPDATE re-checks the filter: a run that moved on after selection is left alone
+    run_ids = recovery.select(statuses=["FAILED"])
+    state_manager._mock_runs["failed_old"]["status"] = "COMPLETED"
+    assert state_manager.requeue_runs(run_ids, ["FAILED"]) == 1
+
+def test_waves_wait_for_pending_backlog():
+    state_manager = StateManager(session=None)
+    for i in range(3):
+        add_run(state_manager, f"queued{i}")
+    for i in range(4):
+        add_run(state_manager, f"failed{i}", "FAILED")
+
+    def drain():
+        for i in range(3):
+            state_manager._mock_runs[f"queued{i}"]["status"] = "COMPLETED"
+    threading.Timer(0.1, drain).start()
+
+    start = time.time()
+    summary = RecoveryManager(state_manager, wave_size=4, wave_interval=0.02, max_pending=3).recover()
+    assert summary["requeued"] == 4
+    assert time.time() - start >= 0.1
+
+class RecordingSession:
+    def __init__(self):
+        self.statements = []
+
+    def sql(self, query, params=None):
+        self.statements.append((" ".join(query.split()), params))
+        self.last = query
+        return self
+
+    def collect(self):
+        return [(2,)] if self.last.lstrip().startswith("UPDATE") else []
+
+def test_requeue_is_one_guarded_update_per_chunk():
+    session = RecordingSession()
+    state_manager = StateManager(session)
+    assert state_manager.requeue_runs(["a", "b", "c"], ["FAILED"], stalled_for=3600, chunk_size=2) == 4
+    assert len(session.statements) == 2
+    query, params = session.statements[0]
+    assert query.startswith("UPDATE agent_runs r SET status = 'PENDING'")
+    assert "r.status IN (?)" in query and "NOT EXISTS" in query
+    # The stall cutoff is server-side (session timezone), never a client timestamp
+    assert "r.updated_at < TIMEADD('second', -?, CURRENT_TIMESTAMP())" in query
+    assert "s.created_at >= TIMEADD('second', -?, CURRENT_TIMESTAMP())" in query
+    assert params == ["a", "b", "FAILED", 3600.0, 3600.0]
+
+def test_upgrade_migration_adds_requeued_columns():
+    # requeue_runs resets these, so databases upgraded from an older setup need them too
+    upgrade = (Path(__file__).parent.parent / "schemas" / "02_upgrade.sql").read_text()
+    for column in ("claimed_by", "error_message"):
+        assert f"ALTER TABLE AGENT_RUNS ADD COLUMN IF NOT EXISTS {column} STRING;" in upgrade
+        assert f"ALTER TABLE IF EXISTS AGENT_RUNS_ARCHIVE ADD COLUMN IF NOT EXISTS {column} STRING;" in upgrade
+
+def test_stalled_selection_uses_server_clock():
+    session = RecordingSession()
+    StateManager(session).recoverable_run_ids([], stalled_for=600, agent_name="orders")
+    query, params = session.statements[0]
+    assert "TIMEADD('second', -?, CURRENT_TIMESTAMP())" in query
+    assert not any(isinstance(p, datetime) for p in params)
+    assert params == [600.0, 600.0, "orders"]
+
+def test_cli_dry_run(monkeypatch, capsys):
+    monkeypatch.setattr("cortex_runtime.db.client.DBClient.connect", lambda self: None)
+    summary = main(["--agent", "orders", "--status", "FAILED", "--since", "2026-10-01T00:00:00", "--dry-run"])
+    assert summary["selected"] == 0
+    assert "Selected 0 runs" in capsys.readouterr().out
@@ -0,0 +1,129 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from cortex_runtime.core.engine import ExecutionEngine
+from cortex_runtime.core.replay import ReplayEngine
+from cortex_runtime.core.adapter import LLMResult
+from cortex_runtime.db.blobs import LocalBlobStore
+from cortex_runtime.db.state import StateManager
+from cortex_runtime.models.agent import AgentConfig
+
+class CountingProvider:
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, prompt, model, config):
+        self.calls += 1
+        return LLMResult(text=f"answer {self.calls}", tokens_used=3, latency_ms=1)
+
+def double(amount: int) -> int:
+    return amount * 2
+
+def triple(amount: int) -> int:
+    return amount * 3
+
+CONFIG = AgentConfig(name="calc_agent", model="m", steps=[
+    {"name": "think", "instruction": "think about it"},
+    {"name": "calc", "type": "TOOL_USE", "tool_name": "calc"}
+])
+
+def record_runs(n: int):
+    state_manager = StateManager(session=None)
+    engine = ExecutionEngine(state_manager, CountingProvider(), tools={"calc": double})
+    for i in range(n):
+        run_id = f"hist_{i}"
+        state_manager.mock_add_run({
+            "run_id": run_id,
+            "agent_name": "calc_agent",
+            "status": "PENDING",
+            "mock_config": CONFIG,
+            "input": {"amount": i}
+        })
+        engine.execute_run(state_manager._mock_runs[run_id])
+    return state_manager
+
+def test_replay_uses_recorded_llm_outputs():
+    state_manager = record_runs(1)
+    provider = CountingProvider()
+    replay = ReplayEngine(state_manager, provider=provider)
+
+    result = replay.replay_run("hist_0")
+
+    assert provider.calls == 0
+    assert result["diverged"] is False
+    assert [s["source"] for s in result["steps"]] == ["recorded", "recorded"]
+    assert result["steps"][0]["replayed"] == "answer 1"
+
+def test_replay_many_diffs_changed_tools():
+    state_manager = record_runs(20)
+    replay = ReplayEngine(state_manager, tool_registry=None)
+    replay.tool_registry.register("calc", triple)
+
+    results = replay.replay_many([f"hist_{i}" for i in range(20)], execute_tools=True)
+    summary = ReplayEngine.summarize(results)
+
+    # amount=0 gives the same answer with either tool
+    assert summary["runs"] == 20
+    assert summary["diverged"] == 19
+    assert summary["changed_by_step"] == {"calc": 19}
+
+def test_replay_against_new_definition_reports_missing_steps():
+    state_manager = record_runs(1)
+    new_config = AgentConfig(name="calc_agent", model="m", steps=CONFIG.steps + [
+        {"name": "summarize", "instruction": "summarize"}
+    ])
+
+    result = ReplayEngine(state_manager).replay_run("hist_0", agent_config=new_config)
+    assert result["steps"][2]["source"] == "missing"
+    assert result["diverged"] is True
+
+    # With a fallback provider only the new step is generated live
+    provider = CountingProvider()
+    result = ReplayEngine(state_manager, provider=provider).replay_run("hist_0", agent_config=new_config)
+    assert result["steps"][2]["source"] == "provider"
+    assert provider.calls == 1
+
+class PromptProvider:
+    def __init__(self, text=""):
+        self.text = text
+        self.prompts = []
+
+    def generate(self, prompt, model, config):
+        self.prompts.append(prompt)
+        return LLMResult(text=self.text, tokens_used=1, latency_ms=1)
+
+def test_replay_materializes_offloaded_outputs(tmp_path):
+    store = LocalBlobStore(str(tmp_path))
+    state_manager = StateManager(session=None)
+    engine = ExecutionEngine(state_manager, PromptProvider("x" * 5000), tools={"length": lambda doc: len(doc)},
+                             blob_store=store)
+    engine.blob_threshold = 1024
+    config = AgentConfig(name="doc_agent", model="m", steps=[
+        {"name": "doc", "instruction": "write"},
+        {"name": "length", "type": "TOOL_USE", "tool_name": "length", "when": "doc != ''"}
+    ])
+    state_manager.mock_add_run({"run_id": "doc_run", "agent_name": "doc_agent", "status": "PENDING",
+                                "mock_config": config, "input": {}})
+    engine.execute_run(state_manager._mock_runs["doc_run"])
+    assert "blob_ref" in state_manager._mock_steps[0]["output"]
+
+    replay = ReplayEngine(state_manager, blob_store=store)
+    replay.tool_registry.register("length", lambda doc: len(doc))
+    result = replay.replay_run("doc_run", execute_tools=True)
+
+    # The tool reads the full text and the recording compares by content, not by handle
+    assert result["diverged"] is False
+    assert result["steps"][0]["replayed"] == "x" * 5000
+    assert result["steps"][1]["replayed"] == "5000"
+
+def test_replay_fallback_uses_assembled_prompt():
+    state_manager = record_runs(1)
+    new_config = AgentConfig(name="calc_agent", model="m", steps=CONFIG.steps + [
+        {"name": "summarize", "instruction": "summarize {{ think }}"}
+    ])
+    provider = PromptProvider()
+
+    ReplayEngine(state_manager, provider=provider).replay_run("hist_0", agent_config=new_config)
+    assert provider.prompts == ["summarize answer 1"]
@@ -0,0 +1,202 @@
+import pytest
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from cortex_runtime.core.resilience import CircuitBreaker, CircuitOpen, Resilience, BulkheadFull, OPEN, HALF_OPEN, CLOSED
+from cortex_runtime.core.engine import ExecutionEngine
+from cortex_runtime.core.recovery import RecoveryManager
+from cortex_runtime.core.adapter import LLMResult, MockProvider
+from cortex_runtime.db.state import StateManager
+from cortex_runtime.models.agent import AgentConfig, StepConfig
+from cortex_runtime.models.records import StepLogEntry
+
+def test_breaker_opens_probes_and_closes():
+    breaker = CircuitBreaker("model:m", failure_threshold=2, reset_timeout=0.1)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            with breaker:
+                raise RuntimeError("down")
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpen):
+        with breaker:
+            pass
+
+    time.sleep(0.15)
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()  # only one probe at a time
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    time.sleep(0.15)
+    with breaker:
+        pass
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["rejected"] == 2
+
+def test_failing_tool_trips_breaker():
+    calls = []
+
+    def flaky_tool():
+        calls.append(1)
+        raise ConnectionError("tool backend down")
+
+    engine = ExecutionEngine(StateManager(session=None), MockProvider(), tools={"flaky_tool": flaky_tool})
+    engine.resilience = Resilience(failure_threshold=3, reset_timeout=60)
+    step = StepConfig(name="call", type="TOOL_USE", tool_name="flaky_tool")
+    outputs = [engine.run_single_step(step, {}, "m").text for _ in range(5)]
+
+    assert len(calls) == 3
+    assert "is open" in outputs[-1]
+    assert engine.get_metrics()["breakers"]["tool:flaky_tool"]["state"] == OPEN
+
+def test_bulkhead_holds_slots_for_abandoned_calls():
+    release = threading.Event()
+
+    def stuck_tool():
+        release.wait(5)
+        return "late"
+
+    state_manager = StateManager(session=None)
+    engine = ExecutionEngine(state_manager, MockProvider(), tools={"stuck_tool": stuck_tool})
+    engine.resilience = Resilience(failure_threshold=10, bulkhead_size=1)
+    config = AgentConfig(name="stuck_agent", model="m", steps=[
+        {"name": "call", "type": "TOOL_USE", "tool_name": "stuck_tool", "timeout_seconds": 0.2}
+    ])
+    for run_id in ("stuck_1", "stuck_2"):
+        state_manager.mock_add_run({"run_id": run_id, "agent_name": "stuck_agent", "status": "PENDING", "mock_config": config})
+
+    # The first call times out but its thread is still running, so it keeps the only slot
+    engine.execute_run(state_manager._mock_runs["stuck_1"])
+    assert state_manager._mock_runs["stuck_1"]["status"] == "FAILED"
+    assert engine.get_metrics()["bulkheads"]["tool:stuck_tool"]["in_use"] == 1
+
+    with pytest.raises(BulkheadFull):
+        with engine.resilience.guard("tool:stuck_tool"):
+            pass
+
+    release.set()
+    time.sleep(0.1)
+    assert engine.get_metrics()["bulkheads"]["tool:stuck_tool"]["in_use"] == 0
+
+class DownSession:
+    def __init__(self):
+        self.calls = 0
+
+    def sql(self, *args, **kwargs):
+        self.calls += 1
+        raise ConnectionError("warehouse unavailable")
+
+def test_state_manager_fails_fast_when_warehouse_is_down():
+    session = DownSession()
+    state_manager = StateManager(session, resilience=Resilience(failure_threshold=2, reset_timeout=60))
+    for _ in range(5):
+        assert state_manager.fetch_pending_runs() == []
+    assert session.calls == 2
+
+    # Writes trip their own breaker independently of claims
+    state_manager.update_run_status("r1", "COMPLETED")
+    assert state_manager.resilience.breaker("db:claim").state == OPEN
+    assert state_manager.resilience.breaker("db:write").state == CLOSED
+
+def test_default_bulkhead_matches_the_workers(monkeypatch):
+    monkeypatch.delenv("CR_BULKHEAD_SIZE", raising=False)
+    monkeypatch.delenv("CR_MAX_WORKERS", raising=False)
+    engine = ExecutionEngine(StateManager(session=None), MockProvider(), max_workers=8)
+    assert engine.resilience.bulkhead_size == 8
+
+@pytest.mark.parametrize("bulkhead_size", [None, 2])
+def test_slow_healthy_model_queues_instead_of_failing(monkeypatch, bulkhead_size):
+    monkeypatch.delenv("CR_BULKHEAD_SIZE", raising=False)
+    monkeypatch.delenv("CR_BULKHEAD_WAIT", raising=False)
+    monkeypatch.delenv("CR_MAX_WORKERS", raising=False)
+
+    class SlowProvider:
+        def generate(self, prompt, model, config):
+            time.sleep(0.3)
+            return LLMResult(text="ok", tokens_used=1, latency_ms=300)
+
+    state_manager = StateManager(session=None)
+    engine = ExecutionEngine(state_manager, SlowProvider(), max_workers=4)
+    if bulkhead_size:
+        # Fewer slots than workers: the extra calls wait for a slot while the model is healthy
+        engine.resilience = Resilience(bulkhead_size=bulkhead_size)
+    config = AgentConfig(name="slow_agent", model="m", steps=[{"name": "s1", "instruction": "go"}])
+    run_ids = [f"slow_{i}" for i in range(4)]
+    for run_id in run_ids:
+        state_manager.mock_add_run({"run_id": run_id, "agent_name": "slow_agent", "status": "PENDING", "mock_config": config})
+
+    for run in state_manager.fetch_pending_runs(limit=4):
+        engine.submit_run(run)
+    assert [engine.wait_for_run(run_id, timeout=5) for run_id in run_ids] == ["COMPLETED"] * 4
+    assert engine.get_metrics()["bulkheads"]["model:m"]["rejected"] == 0
+
+class WriteOutageState(StateManager):
+    """Mock store whose db:write breaker is open"""
+    def log_step(self, run_id, step_data):
+        raise CircuitOpen("db:write", 30)
+
+def test_run_stops_when_state_writes_fail_fast():
+    class CountingProvider:
+        calls = 0
+
+        def generate(self, prompt, model, config):
+            CountingProvider.calls += 1
+            return LLMResult(text="ok", tokens_used=1, latency_ms=1)
+
+    state_manager = WriteOutageState(session=None)
+    engine = ExecutionEngine(state_manager, CountingProvider())
+    config = AgentConfig(name="outage_agent", model="m", steps=[
+        {"name": f"s{i}", "instruction": "go"} for i in range(3)
+    ])
+    state_manager.mock_add_run({"run_id": "outage_run", "agent_name": "outage_agent", "status": "PENDING", "mock_config": config})
+
+    engine.execute_run(state_manager._mock_runs["outage_run"])
+
+    # No further model calls once a result can't be recorded; the run is left for stalled-run recovery
+    assert CountingProvider.calls == 1
+    assert state_manager._mock_runs["outage_run"]["status"] == "RUNNING"
+
+def test_breakers_follow_the_model_that_served_the_call():
+    class ScriptedProvider:
+        def generate(self, prompt, model, config):
+            if model == "primary":
+                raise ConnectionError("primary down")
+            return LLMResult(text=f"from {model}", tokens_used=1, latency_ms=1)
+
+    state_manager = StateManager(session=None)
+    engine = ExecutionEngine(state_manager, ScriptedProvider())
+    config = AgentConfig(name="routed_agent", model="declared", steps=[{"name": "s1", "instruction": "go"}],
+                         routing={"models": [{"model": "primary"}, {"model": "backup"}]})
+    state_manager.mock_add_run({"run_id": "routed", "agent_name": "routed_agent", "status": "PENDING", "mock_config": config})
+
+    engine.execute_run(state_manager._mock_runs["routed"])
+
+    breakers = engine.get_metrics()["breakers"]
+    assert breakers["model:primary"]["consecutive_failures"] == 1
+    assert breakers["model:backup"]["consecutive_failures"] == 0
+    assert "model:declared" not in breakers
+
+def test_bulk_writes_raise_while_writes_fail_fast():
+    session = DownSession()
+    state_manager = StateManager(session, resilience=Resilience(failure_threshold=1, reset_timeout=60))
+    state_manager.resilience.breaker("db:write").record_failure()
+
+    with pytest.raises(CircuitOpen):
+        state_manager.log_steps([StepLogEntry("r1", 0, "s1", "SUCCESS")])
+    with pytest.raises(CircuitOpen):
+        state_manager.create_runs([{"run_id": "r1", "agent_name": "agent", "input": {}}])
+    with pytest.raises(CircuitOpen):
+        state_manager.update_runs_status(["r1"], "COMPLETED")
+    with pytest.raises(CircuitOpen):
+        state_manager.requeue_runs(["r1"], ["FAILED"])
+    assert session.calls == 0
+
+    # Recovery stops its waves instead of reporting requeues that never happened
+    state_manager.recoverable_run_ids = lambda **kwargs: ["r1", "r2"]
+    summary = RecoveryManager(state_manager, wave_size=1, wave_interval=0).recover()
+    assert summary["selected"] == 2 and summary["requeued"] == 0 and summary["waves"] == 0
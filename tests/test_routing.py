@@ -0,0 +1,122 @@
+import pytest
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from cortex_runtime.core.engine import ExecutionEngine
+from cortex_runtime.core.adapter import LLMResult, ModelRoute, RoutingProvider
+from cortex_runtime.db.state import StateManager
+from cortex_runtime.models.agent import AgentConfig
+
+class ScriptedProvider:
+    """Per-model behaviour: a delay in seconds, or an exception to raise"""
+    def __init__(self, behaviour):
+        self.behaviour = behaviour
+        self.calls = []
+
+    def generate(self, prompt, model, config):
+        self.calls.append(model)
+        action = self.behaviour.get(model, 0)
+        if isinstance(action, Exception):
+            raise action
+        time.sleep(action)
+        return LLMResult(text=f"from {model}", tokens_used=1, latency_ms=action * 1000)
+
+def test_router_falls_back_on_errors():
+    provider = ScriptedProvider({"broken": RuntimeError("overloaded")})
+    router = RoutingProvider([ModelRoute(provider, "broken"), ModelRoute(provider, "healthy")])
+
+    result = router.generate("hi", "ignored", {})
+    assert result.text == "from healthy"
+    assert result.model == "healthy"
+    assert router.stats()["broken"]["error_rate"] == 1.0
+
+def test_router_falls_back_on_timeout():
+    provider = ScriptedProvider({"slow": 1.0})
+    router = RoutingProvider([ModelRoute(provider, "slow"), ModelRoute(provider, "fast")], timeout_ms=50)
+
+    assert router.generate("hi", "ignored", {}).model == "fast"
+
+def test_router_timeout_starts_when_the_call_runs():
+    provider = ScriptedProvider({"steady": 0.12})
+    router = RoutingProvider([ModelRoute(provider, "steady")], timeout_ms=200, max_workers=1)
+
+    # The second call waits for the single thread; that wait isn't charged to the model
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        results = list(pool.map(lambda _: router.generate("hi", "ignored", {}), range(2)))
+    router.close()
+
+    assert [r.model for r in results] == ["steady", "steady"]
+    assert router.stats()["steady"]["error_rate"] == 0.0
+
+def test_router_honours_requested_model():
+    provider = ScriptedProvider({})
+    router = RoutingProvider([ModelRoute(provider, "a"), ModelRoute(provider, "b")], default_model="a")
+
+    # e.g. a hedge_model: served by that model, not re-routed
+    assert router.generate("hi", "b", {}).model == "b"
+    assert router.generate("hi", "outside", {}).model == "outside"
+    assert provider.calls == ["b", "outside"]
+
+def test_fastest_and_cheapest_policies():
+    provider = ScriptedProvider({})
+    big = ModelRoute(provider, "big", cost_per_1k_tokens=10.0)
+    small = ModelRoute(provider, "small", cost_per_1k_tokens=1.0)
+    for _ in range(10):
+        big.stats.record(100)
+        small.stats.record(400)
+
+    fastest = RoutingProvider([small, big], policy="fastest")
+    assert [r.model for r in fastest.rank()] == ["big", "small"]
+
+    cheap = RoutingProvider([big, small], policy="cheapest_within_sla", sla_ms=500)
+    assert [r.model for r in cheap.rank()] == ["small", "big"]
+
+    # Once the cheap model breaks the SLA, the faster one wins
+    tight = RoutingProvider([big, small], policy="cheapest_within_sla", sla_ms=200)
+    assert [r.model for r in tight.rank()] == ["big", "small"]
+
+def test_engine_logs_routed_model():
+    state_manager = StateManager(session=None)
+    provider = ScriptedProvider({"primary": RuntimeError("down")})
+    engine = ExecutionEngine(state_manager, provider)
+
+    config = AgentConfig(name="routed_agent", model="primary", steps=[
+        {"name": "s1", "instruction": "hello"}
+    ], routing={"models": [{"model": "primary"}, {"model": "backup"}]})
+    state_manager.mock_add_run({
+        "run_id": "routed_run",
+        "agent_name": "routed_agent",
+        "status": "PENDING",
+        "mock_config": config,
+        "input": {}
+    })
+
+    engine.execute_run(state_manager._mock_runs["routed_run"])
+
+    assert state_manager._mock_runs["routed_run"]["status"] == "COMPLETED"
+    assert state_manager._mock_steps[0]["model"] == "backup"
+    assert engine.provider_for(config) is engine.provider_for(config)
+
+def test_unknown_policy_is_rejected_at_load():
+    with pytest.raises(ValueError):
+        AgentConfig(name="typo_agent", model="primary", steps=[{"name": "s1", "instruction": "hi"}],
+                    routing={"models": [{"model": "primary"}], "policy": "cheapest"})
+
+def test_provider_setup_error_fails_the_run(monkeypatch):
+    state_manager = StateManager(session=None)
+    engine = ExecutionEngine(state_manager, ScriptedProvider({}))
+    config = AgentConfig(name="broken_agent", model="primary", steps=[{"name": "s1", "instruction": "hi"}])
+    state_manager.mock_add_run({"run_id": "broken_run", "agent_name": "broken_agent", "status": "PENDING", "mock_config": config})
+
+    def broken(agent_config):
+        raise ValueError("bad routing setup")
+    monkeypatch.setattr(engine, "provider_for", broken)
+
+    done = engine.run_future("broken_run")
+    engine.execute_run(state_manager._mock_runs["broken_run"])
+    assert state_manager._mock_runs["broken_run"]["status"] == "FAILED"
+    assert done.result(timeout=1) == "FAILED"
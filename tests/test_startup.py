@@ -0,0 +1,41 @@
+import os
+import sys
+import subprocess
+from pathlib import Path
+
+SRC = str(Path(__file__).parent.parent / "src")
+
+# Generous ceiling for CI machines; a regression to eager Snowpark imports costs ~1s on its own
+IMPORT_BUDGET_MS = float(os.getenv('CR_IMPORT_BUDGET_MS', 1000))
+
+def run_python(code: str, *flags: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONPATH=SRC)
+    return subprocess.run([sys.executable, *flags, "-c", code], capture_output=True, text=True, env=env, check=True)
+
+def import_times(module: str) -> dict:
+    """Cumulative import time (microseconds) per module, from -X importtime"""
+    result = run_python(f"import {module}", "-X", "importtime")
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative.strip())
+    return times
+
+def test_runtime_import_does_not_load_snowpark():
+    result = run_python(
+        "import sys\n"
+        "import cortex_runtime.main, cortex_runtime.supervisor\n"
+        "print(sorted(m for m in sys.modules if m.startswith(('snowflake.', 'numpy', 'urllib.request'))))"
+    )
+    assert result.stdout.strip() == "[]"
+
+def test_runtime_import_time_budget():
+    times = import_times("cortex_runtime.main")
+    total_ms = times["cortex_runtime.main"] / 1000
+    print(f"\n[Benchmark] import cortex_runtime.main: {total_ms:.1f}ms")
+    for name in ("cortex_runtime.core.engine", "cortex_runtime.core.adapter", "cortex_runtime.db.state"):
+        print(f"[Benchmark]   {name}: {times.get(name, 0) / 1000:.1f}ms")
+    assert total_ms < IMPORT_BUDGET_MS
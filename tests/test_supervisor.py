@@ -0,0 +1,77 @@
+import pytest
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from cortex_runtime.core.adapter import MockProvider
+from cortex_runtime.core.engine import ExecutionEngine
+from cortex_runtime.db.state import StateManager
+from cortex_runtime.supervisor import PARK_MARGIN, Supervisor, split_workers
+
+def exiting_worker(worker_id, max_workers, heartbeat):
+    # Simulates a worker that crashes right after starting
+    sys.exit(1)
+
+def idle_worker(worker_id, max_workers, heartbeat):
+    while True:
+        heartbeat.value = time.time()
+        time.sleep(0.05)
+
+def test_split_workers():
+    assert split_workers(10, 3) == [4, 3, 3]
+    assert split_workers(2, 4) == [1, 1, 1, 1]
+    assert sum(split_workers(64, 8)) == 64
+
+@pytest.mark.parametrize("drain", ["30", "90"])
+def test_shutdown_grace_outlasts_engine_drain(monkeypatch, drain):
+    monkeypatch.delenv("CR_SHUTDOWN_TIMEOUT", raising=False)
+    monkeypatch.setenv("CR_DRAIN_TIMEOUT", drain)
+    engine = ExecutionEngine(StateManager(session=None), MockProvider())
+    supervisor = Supervisor(num_processes=1, total_workers=1)
+
+    # Workers get to finish draining and park their runs before they are killed
+    assert supervisor.shutdown_timeout == engine.drain_timeout + PARK_MARGIN
+    assert supervisor.shutdown_timeout > engine.drain_timeout
+
+def test_supervisor_restarts_crashed_workers():
+    supervisor = Supervisor(num_processes=2, total_workers=4, target=exiting_worker, start_method="fork")
+    supervisor.start()
+    try:
+        deadline = time.time() + 10
+        while supervisor.restarts < 2 and time.time() < deadline:
+            supervisor.check_workers()
+            time.sleep(0.1)
+        assert supervisor.restarts >= 2
+    finally:
+        supervisor.shutdown()
+
+def test_supervisor_graceful_shutdown():
+    supervisor = Supervisor(num_processes=2, total_workers=4, target=idle_worker,
+                            shutdown_timeout=5, start_method="fork")
+    supervisor.start()
+    supervisor.check_workers()
+    assert supervisor.restarts == 0
+    supervisor.shutdown()
+    assert all(not p.is_alive() for p in supervisor._processes.values())
+
+def test_each_worker_gets_its_own_readiness_port(monkeypatch):
+    spawned = []
+
+    class RecordingProcess:
+        pid = 0
+
+        def __init__(self, target, args, kwargs, name, daemon):
+            spawned.append(kwargs)
+
+        def start(self):
+            pass
+
+    monkeypatch.setenv("CR_READINESS_PORT", "8080")
+    supervisor = Supervisor(num_processes=3, total_workers=3, target=idle_worker)
+    monkeypatch.setattr(supervisor._ctx, "Process", RecordingProcess)
+    supervisor.start()
+    supervisor._spawn(1)  # a restarted slot keeps its port
+
+    assert [kwargs["readiness_port"] for kwargs in spawned] == [8080, 8081, 8082, 8081]
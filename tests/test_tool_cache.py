@@ -0,0 +1,178 @@
+import pytest
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from cortex_runtime.core.engine import ExecutionEngine
+from cortex_runtime.core.adapter import MockProvider
+from cortex_runtime.db.blobs import BlobRef, LocalBlobStore
+from cortex_runtime.db.state import StateManager
+from cortex_runtime.models.agent import AgentConfig
+from cortex_runtime.tools.cache import cacheable
+from cortex_runtime.tools.registry import ToolRegistry
+
+class CountingTool:
+    def __init__(self, delay=0.0):
+        self.calls = 0
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    def __call__(self, total: int, lines: list) -> str:
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return "OK" if sum(lines) == total else "MISMATCH"
+
+def test_repeat_calls_served_from_cache():
+    tool = CountingTool()
+    registry = ToolRegistry()
+    registry.register("validate_math", tool, cacheable=True)
+
+    for _ in range(3):
+        assert registry.execute("validate_math", {"total": 3, "lines": [1, 2], "unrelated": "x"}) == "OK"
+    assert registry.execute("validate_math", {"total": 4, "lines": [1, 2]}) == "MISMATCH"
+
+    assert tool.calls == 2
+    assert registry.cache_stats()["validate_math"] == {
+        "hits": 2, "misses": 2, "evictions": 0, "size": 2, "max_size": 1024, "hit_rate": 0.5
+    }
+
+def test_uncached_tools_always_run():
+    tool = CountingTool()
+    registry = ToolRegistry()
+    registry.register("validate_math", tool)
+    registry.execute("validate_math", {"total": 3, "lines": [1, 2]})
+    registry.execute("validate_math", {"total": 3, "lines": [1, 2]})
+    assert tool.calls == 2
+    assert registry.cache_stats() == {}
+
+def test_lru_bound_and_ttl():
+    tool = CountingTool()
+    registry = ToolRegistry()
+    registry.register("validate_math", tool, cacheable=True, max_size=2, ttl=0.05)
+
+    for total in (1, 2, 3):
+        registry.execute("validate_math", {"total": total, "lines": [1]})
+    registry.execute("validate_math", {"total": 1, "lines": [1]})  # evicted -> runs again
+    assert tool.calls == 4
+    assert registry.cache_stats()["validate_math"]["evictions"] == 2
+
+    time.sleep(0.06)
+    registry.execute("validate_math", {"total": 1, "lines": [1]})  # expired -> runs again
+    assert tool.calls == 5
+
+def test_concurrent_misses_run_once():
+    tool = CountingTool(delay=0.05)
+    registry = ToolRegistry()
+    registry.register("validate_math", tool, cacheable=True)
+
+    threads = [threading.Thread(target=registry.execute, args=("validate_math", {"total": 1, "lines": [1]}))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert tool.calls == 1
+
+def test_errors_are_not_cached():
+    attempts = []
+
+    def flaky(x: int) -> int:
+        attempts.append(x)
+        if len(attempts) == 1:
+            raise ValueError("transient")
+        return x
+
+    registry = ToolRegistry()
+    registry.register("flaky", flaky, cacheable=True)
+    with pytest.raises(RuntimeError):
+        registry.execute("flaky", {"x": 1})
+    assert registry.execute("flaky", {"x": 1}) == 1
+    assert registry.execute("flaky", {"x": 1}) == 1
+    assert len(attempts) == 2
+
+def test_key_func_and_blob_handles(tmp_path):
+    reads = []
+
+    class CountingStore(LocalBlobStore):
+        def get(self, handle):
+            reads.append(handle)
+            return super().get(handle)
+
+    store = CountingStore(str(tmp_path))
+    text = "customer record " * 100
+    ref = BlobRef(store, store.put(text), len(text))
+
+    @cacheable()
+    def word_count(document: str) -> int:
+        return len(document.split())
+
+    registry = ToolRegistry()
+    registry.register("word_count", word_count)
+    assert registry.execute("word_count", {"document": ref}) == 200
+    assert registry.execute("word_count", {"document": BlobRef(store, ref.handle, ref.size)}) == 200
+    assert len(reads) == 1  # the hit is keyed by handle, the blob is never re-read
+
+    lookups = []
+
+    def lookup(code: str) -> str:
+        lookups.append(code)
+        return code.upper()
+
+    registry.register("lookup", lookup, cacheable=True, key_func=lambda code: code.strip().lower())
+    registry.execute("lookup", {"code": "eur"})
+    registry.execute("lookup", {"code": " EUR "})
+    assert lookups == ["eur"]
+
+def test_persisted_across_registries(tmp_path, monkeypatch):
+    monkeypatch.setenv("CR_TOOL_CACHE_DIR", str(tmp_path))
+    first, second = CountingTool(), CountingTool()
+
+    registry = ToolRegistry()
+    registry.register("validate_math", first, cacheable=True)
+    registry.execute("validate_math", {"total": 3, "lines": [1, 2]})
+
+    restarted = ToolRegistry()
+    restarted.register("validate_math", second, cacheable=True)
+    assert restarted.execute("validate_math", {"total": 3, "lines": [1, 2]}) == "OK"
+    assert (first.calls, second.calls) == (1, 0)
+
+def test_engine_runs_share_the_cache():
+    tool = CountingTool()
+    state_manager = StateManager(session=None)
+    engine = ExecutionEngine(state_manager, MockProvider(), tools={"validate_math": cacheable()(tool)})
+    config = AgentConfig(name="invoice_agent", model="m", steps=[
+        {"name": "validate_math", "type": "TOOL_USE", "tool_name": "validate_math"}
+    ])
+    for i in range(5):
+        state_manager.mock_add_run({"run_id": f"r{i}", "agent_name": "invoice_agent", "status": "PENDING",
+                                    "mock_config": config, "input": {"total": 3, "lines": [1, 2]}})
+        engine.execute_run(state_manager._mock_runs[f"r{i}"])
+
+    assert tool.calls == 1
+    assert engine.get_metrics()["tool_cache"]["validate_math"]["hits"] == 4
+
+def test_non_json_arguments_are_not_cached():
+    class Opaque:
+        def __init__(self, value):
+            self.value = value
+
+    calls = []
+
+    def describe(item) -> int:
+        calls.append(item)
+        return item.value
+
+    registry = ToolRegistry()
+    registry.register("describe", describe, cacheable=True)
+    # Default reprs (or truncated ones) must never make different inputs share a result
+    assert [registry.execute("describe", {"item": Opaque(v)}) for v in (1, 2, 2)] == [1, 2, 2]
+    assert len(calls) == 3
+    assert registry.cache_stats()["describe"]["size"] == 0
+
+    registry.register("describe", describe, cacheable=True, key_func=lambda item: item.value)
+    assert [registry.execute("describe", {"item": Opaque(v)}) for v in (1, 1)] == [1, 1]
+    assert len(calls) == 4
@@ -0,0 +1,136 @@
+import json
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from cortex_runtime.core.adapter import LLMResult
+from cortex_runtime.core.engine import ExecutionEngine
+from cortex_runtime.core.readiness import ReadinessServer
+from cortex_runtime.db.state import StateManager
+
+DEFINITION = {"agent": {
+    "name": "invoice_agent", "model": "llama3.1-70b",
+    "routing": {"models": [{"model": "llama3.1-70b"}, {"model": "mistral-large"}]},
+    "steps": [{"name": "classify", "instruction": "Classify {{ invoice_id }}", "when": "total > 0"}]
+}}
+
+class RecordingProvider:
+    def __init__(self):
+        self.calls = []
+
+    def generate(self, prompt, model, config):
+        self.calls.append((prompt, model))
+        return LLMResult(text=f"{model} ok", tokens_used=1, latency_ms=1)
+
+class CountingState(StateManager):
+    def __init__(self):
+        super().__init__(session=None)
+        self.definition_fetches = 0
+        self.claims = 0
+
+    def fetch_agent_definition(self, agent_name):
+        self.definition_fetches += 1
+        return super().fetch_agent_definition(agent_name)
+
+    def fetch_pending_runs(self, limit=10):
+        self.claims += 1
+        return super().fetch_pending_runs(limit)
+
+def test_warm_up_preloads_definitions_tools_and_models():
+    state_manager = CountingState()
+    state_manager.mock_add_definition("invoice_agent", DEFINITION)
+    state_manager.mock_add_definition("broken_agent", {"name": "broken_agent", "model": "m",
+                                                       "steps": [{"name": "s", "when": "__import__('os')"}]})
+    provider = RecordingProvider()
+
+    def lookup(code: str) -> str:
+        return code
+    lookup.warm_up = lambda: None
+
+    def broken(x: int) -> int:
+        return x
+    def fail():
+        raise ConnectionError("reference db down")
+    broken.warm_up = fail
+
+    engine = ExecutionEngine(state_manager, provider, tools={"lookup": lookup, "broken": broken})
+    assert not engine.ready.is_set()
+    report = engine.warm_up()
+
+    assert engine.ready.is_set() and engine.get_metrics()["ready"]
+    assert report["session"] is True
+    assert report["definitions"] == ["invoice_agent"]
+    assert "broken_agent" in report["invalid_definitions"]
+    assert report["tools"] == {"lookup": "ok", "broken": "ConnectionError: reference db down"}
+    assert set(report["probes"]) == {"llama3.1-70b", "mistral-large"}
+    assert sorted(model for _, model in provider.calls) == ["llama3.1-70b", "mistral-large"]
+
+    # Runs use the compiled definition without fetching or parsing it again
+    state_manager.mock_add_run({"run_id": "r1", "agent_name": "invoice_agent", "status": "PENDING",
+                                "input": {"invoice_id": "inv-1", "total": 10}})
+    engine.execute_run(state_manager._mock_runs["r1"])
+    assert state_manager._mock_runs["r1"]["status"] == "COMPLETED"
+    assert state_manager.definition_fetches == 0
+
+def test_definitions_load_on_demand_and_expire():
+    state_manager = CountingState()
+    state_manager.mock_add_definition("invoice_agent", DEFINITION)
+    engine = ExecutionEngine(state_manager, RecordingProvider())
+
+    first = engine.agent_config_for("invoice_agent")
+    assert engine.agent_config_for("invoice_agent") is first
+    assert state_manager.definition_fetches == 1
+
+    engine.definition_ttl = 0
+    assert engine.agent_config_for("invoice_agent") is not first
+    assert state_manager.definition_fetches == 2
+
+def test_probes_can_be_disabled(monkeypatch):
+    monkeypatch.setenv("CR_WARMUP_PROBE", "0")
+    state_manager = StateManager(session=None)
+    state_manager.mock_add_definition("invoice_agent", DEFINITION)
+    provider = RecordingProvider()
+    assert "probes" not in ExecutionEngine(state_manager, provider).warm_up()
+    assert provider.calls == []
+
+def get(url):
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+def test_loop_claims_nothing_until_ready():
+    gate = threading.Event()
+
+    class SlowWarmState(CountingState):
+        def ping(self):
+            gate.wait(5)
+            return True
+
+    state_manager = SlowWarmState()
+    engine = ExecutionEngine(state_manager, RecordingProvider())
+    server = ReadinessServer(engine, 0, host="127.0.0.1").start()
+    try:
+        loop = threading.Thread(target=engine.run_agent_loop, daemon=True)
+        loop.start()
+        time.sleep(0.2)
+        assert state_manager.claims == 0
+        assert get(f"http://127.0.0.1:{server.port}/ready")[0] == 503
+        assert get(f"http://127.0.0.1:{server.port}/live")[0] == 200
+
+        gate.set()
+        assert engine.ready.wait(5)
+        status, body = get(f"http://127.0.0.1:{server.port}/ready")
+        assert status == 200 and body["warmup"]["session"] is True
+
+        engine._running = False
+        loop.join(10)
+        assert state_manager.claims >= 1
+    finally:
+        server.stop()